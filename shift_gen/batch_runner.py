@@ -0,0 +1,181 @@
+import argparse
+import datetime
+import importlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from shift_stream import stream_shifts_to_csv
+
+GENERATOR_MODULES = ['shift_generator', 'shift_generator2']
+
+
+def load_manifest(manifest_file):
+    """
+    店舗ごとの設定を読み込む
+
+    マニフェストは {"stores": [{"name", "data_file", "start_date", "end_date", "generator"}]} 形式の JSON。
+    data_file はマニフェストからの相対パスでもよい。generator は省略時 shift_generator2。
+
+    :param manifest_file: マニフェストのパス
+    :return: 店舗ごとの設定のリスト
+    """
+    with open(manifest_file, encoding='utf-8') as file:
+        manifest = json.load(file)
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    stores = []
+    for store in manifest['stores']:
+        stores.append({
+            'name': store['name'],
+            'data_file': os.path.join(base_dir, store['data_file']),
+            'generator': store.get('generator', 'shift_generator2'),
+            'start_date': datetime.date.fromisoformat(store['start_date']),
+            'end_date': datetime.date.fromisoformat(store['end_date']),
+        })
+    return stores
+
+
+def _warm_up():
+    # pandas・holidays・シフト生成モジュールの読み込みはワーカーごとに最初の1回だけ
+    for module in GENERATOR_MODULES:
+        importlib.import_module(module)
+
+
+def run_store(store, output_dir):
+    """
+    1店舗分のシフトを生成して output_dir に書き出す（ワーカープロセスで実行）
+
+    失敗しても例外は投げず、結果の辞書に status='error' として返す。
+
+    :return: 店舗名・状態・所要時間などの辞書
+    """
+    result = {'store': store['name'], 'status': 'ok'}
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(store['generator'])
+        generator = module.ShiftGenerator(store['data_file'])
+        loaded = time.perf_counter()
+        result['days'] = stream_shifts_to_csv(
+            generator, store['start_date'], store['end_date'],
+            os.path.join(output_dir, f"{store['name']}_shifts.csv"),
+            os.path.join(output_dir, f"{store['name']}_shortages.csv"))
+        result['load_seconds'] = loaded - started
+        result['generate_seconds'] = time.perf_counter() - loaded
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _new_executor(max_workers):
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_up)
+
+
+def _failure(store, error):
+    return {'store': store['name'], 'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+
+
+def run_isolated(store, output_dir):
+    '''
+    1店舗だけを専用のワーカープロセスで実行する。プロセスが落ちた場合はこの店舗の失敗として返す
+    '''
+    with _new_executor(1) as executor:
+        try:
+            return executor.submit(run_store, store, output_dir).result()
+        except Exception as e:
+            return _failure(store, e)
+
+
+def run_batch(stores, output_dir, max_workers=None, executor=None):
+    """
+    複数店舗のシフト生成をプロセスプールで実行し、終わった店舗から summary.jsonl に書き出す
+
+    同時に投入する店舗はプロセス数までにする。ワーカープロセスが落ちるとプール全体が使えなくなり、
+    実行中だった店舗はすべて BrokenProcessPool で失敗するので、プールを作り直して残りの店舗を続ける。
+    落ちたときに実行中だった店舗は1店舗ずつ run_isolated で実行し直し、落ちた店舗だけを失敗として記録する。
+
+    :param stores: load_manifest の戻り値
+    :param output_dir: 出力先ディレクトリ
+    :param max_workers: プロセス数（省略時はCPU数）
+    :param executor: 使い回す ProcessPoolExecutor（省略時は新しく作る。落ちた場合は新しく作ったものに替える）
+    :return: 店舗ごとの結果のリスト（終わった順）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    own_executor = executor is None
+    if own_executor:
+        executor = _new_executor(max_workers)
+    window = max_workers or os.cpu_count() or 1
+
+    results = []
+    queue = list(stores)
+    suspects = []  # プールが落ちたときに実行中だった店舗
+    try:
+        with open(os.path.join(output_dir, 'summary.jsonl'), 'w', encoding='utf-8') as summary:
+            def record(result):
+                results.append(result)
+                summary.write(json.dumps(result, ensure_ascii=False) + '\n')
+                summary.flush()
+
+            while queue or suspects:
+                for store in suspects:
+                    record(run_isolated(store, output_dir))
+                suspects = []
+
+                running = {}
+                broken = False
+                while (queue or running) and not broken:
+                    while queue and len(running) < window:
+                        try:
+                            future = executor.submit(run_store, queue[0], output_dir)
+                        except BrokenProcessPool:
+                            broken = True
+                            break
+                        running[future] = queue.pop(0)
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        store = running.pop(future)
+                        try:
+                            record(future.result())
+                        except BrokenProcessPool:
+                            suspects.append(store)
+                            broken = True
+                        except Exception as e:
+                            record(_failure(store, e))
+
+                if broken:
+                    # 残りの実行中の店舗も巻き込まれて失敗するので、結果を待たずにやり直す対象にする
+                    suspects.extend(running.values())
+                    if own_executor:
+                        executor.shutdown()
+                    executor = _new_executor(max_workers)
+                    own_executor = True
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='複数店舗のシフトをまとめて生成する')
+    parser.add_argument('manifest', help='店舗の一覧を書いた JSON ファイル')
+    parser.add_argument('output_dir', help='結果を書き出すディレクトリ')
+    parser.add_argument('--workers', type=int, default=None, help='プロセス数')
+    args = parser.parse_args()
+
+    results = run_batch(load_manifest(args.manifest), args.output_dir, args.workers)
+    for result in results:
+        if result['status'] == 'ok':
+            print(f"{result['store']}: {result['days']}日分 ({result['seconds']:.2f}秒)")
+        else:
+            print(f"{result['store']}: 失敗 {result['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import sqlite3
+import os
+import json
+import hashlib
+import pickle
 from ortools.sat.python import cp_model
 from datetime import datetime, timedelta
 import tensorflow as tf
 import numpy as np
 import holidays
+from shift_calendar import get_calendar
+from shift_cache import LRUCache
+from shift_feasibility import analyze_day
 
 def read_data_from_sqlite(db_file):
     conn = sqlite3.connect(db_file)
@@ -49,19 +56,122 @@ class Shift:
         self.start_time = start_time
         self.end_time = end_time
 
+def get_history_range(db_file):
+    # 過去のシフトがある最初と最後の日付（なければ None, None）
+    conn = sqlite3.connect(db_file)
+    try:
+        first, last = conn.execute(
+            "SELECT MIN(desired_date), MAX(desired_date) FROM shifts WHERE clock_in IS NOT NULL AND clock_out IS NOT NULL"
+        ).fetchone()
+    finally:
+        conn.close()
+    if first is None:
+        return None, None
+    return datetime.strptime(first, '%Y-%m-%d').date(), datetime.strptime(last, '%Y-%m-%d').date()
+
+def iter_historical_days(db_file, start_date=None, end_date=None, chunk_days=28):
+    # 過去のシフトを日付順に chunk_days 日分ずつ読み込み、1日ずつ (日付, [Shift]) を返す
+    # 全期間をメモリに載せないので、何年分あっても使うメモリは chunk_days 日分で済む
+    if start_date is None or end_date is None:
+        first, last = get_history_range(db_file)
+        if first is None:
+            return
+        start_date = start_date or first
+        end_date = end_date or last
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    try:
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            cursor.execute("""
+            SELECT desired_date, employee_id, name, skills, clock_in, clock_out
+            FROM shifts
+            WHERE clock_in IS NOT NULL AND clock_out IS NOT NULL
+              AND desired_date BETWEEN ? AND ?
+            ORDER BY desired_date
+            """, (chunk_start.isoformat(), chunk_end.isoformat()))
+
+            current_date, day_shifts = None, []
+            for desired_date, employee_id, name, skills, clock_in, clock_out in cursor.fetchall():
+                if desired_date != current_date:
+                    if day_shifts:
+                        yield datetime.strptime(current_date, '%Y-%m-%d').date(), day_shifts
+                    current_date, day_shifts = desired_date, []
+                employee = Employee(id=employee_id, name=name, skills=skills.split(',') if skills else [],
+                                    desired_date=None, clock_in=None, clock_out=None)
+                day_shifts.append(Shift(
+                    employee=employee,
+                    start_time=datetime.strptime(clock_in, '%H:%M').time(),
+                    end_time=datetime.strptime(clock_out, '%H:%M').time()
+                ))
+            if day_shifts:
+                yield datetime.strptime(current_date, '%Y-%m-%d').date(), day_shifts
+            chunk_start = chunk_end + timedelta(days=1)
+    finally:
+        conn.close()
+
 class ShiftAI:
-    def __init__(self, employees, shifts, constraints, historical_data):
+    # model_type='shared' で使う (従業員, シフト) ごとの特徴量の数
+    # 従業員: レジ・冷蔵・品出し・希望の有無・希望開始・希望終了 / 日付: 曜日・祝日 / シフト: 開始・終了・希望との重なり
+    PAIR_FEATURES = 11
+
+    def __init__(self, employees, shifts, constraints, historical_data, db_file=None, train_range=None, validation_range=None, train=True, model_type='roster',
+                 solution_cache_size=1024, solution_cache_file=None):
+        # db_file を指定した場合は historical_data を使わず、SQLite から少しずつ読み込んで学習する
+        # train_range / validation_range は (開始日, 終了日)。None の場合は全期間・検証なし
+        # train=False の場合は学習しない（refresh_model で保存済みの重みを使う場合など）
+        # model_type='roster' は従業員数に合わせた入出力のモデル、
+        # 'shared' は (従業員, 日付, シフト) の特徴量から割り当て確率を出す共通のモデル。
+        # 'shared' は従業員数に依存しないので、採用・退職で学習し直す必要がなく、他の店舗でも使える
+        # solution_cache_file を指定すると、generate_shifts の結果のキャッシュをファイルから読み込む（保存は save_solution_cache）
+        if model_type not in ('roster', 'shared'):
+            raise ValueError(f"model_type は 'roster' か 'shared' です: {model_type}")
+        self.model_type = model_type
         self.employees = employees
         self.shifts = shifts
         self.constraints = constraints
         self.historical_data = historical_data
         self.jp_holidays = holidays.JP()
+        self.calendar = None
+        self.cp_template = None
+        self.solution_cache = LRUCache(solution_cache_size)
+        self.solution_cache_file = solution_cache_file
+        if solution_cache_file and os.path.exists(solution_cache_file):
+            self.load_solution_cache(solution_cache_file)
+        self.model_digest = None
         self.model = self.build_ml_model()
-        self.train_model()
+        if not train:
+            pass
+        elif db_file is not None:
+            self.train_model_streaming(db_file, train_range, validation_range)
+        else:
+            self.train_model()
+
+    def input_size(self):
+        # prepare_input_data の長さ（従業員ごとに5項目 + 曜日・祝日）
+        if self.model_type == 'shared':
+            return self.PAIR_FEATURES
+        return len(self.employees) * 5 + 2
+
+    def output_size(self):
+        if self.model_type == 'shared':
+            return 1
+        return len(self.shifts) * len(self.employees)
 
     def build_ml_model(self):
+        if self.model_type == 'shared':
+            # 全ての (従業員, シフト) で同じ重みを使うので、モデルの大きさは従業員数によらない
+            model = tf.keras.Sequential([
+                tf.keras.layers.Dense(32, activation='relu', input_shape=(self.input_size(),)),
+                tf.keras.layers.Dense(32, activation='relu'),
+                tf.keras.layers.Dense(1, activation='sigmoid')
+            ])
+            model.compile(optimizer='adam', loss='binary_crossentropy')
+            return model
         model = tf.keras.Sequential([
-            tf.keras.layers.Dense(128, activation='relu', input_shape=(len(self.employees) * 5 + 7,)),
+            tf.keras.layers.Dense(128, activation='relu', input_shape=(self.input_size(),)),
             tf.keras.layers.Dense(256, activation='relu'),
             tf.keras.layers.Dense(len(self.shifts) * len(self.employees), activation='sigmoid')
         ])
@@ -70,12 +180,130 @@ class ShiftAI:
 
     def train_model(self):
         X, y = self.prepare_training_data()
+        if self.model_type == 'shared':
+            X, y = X.reshape(-1, self.input_size()), y.reshape(-1)
         self.model.fit(X, y, epochs=100, batch_size=32, validation_split=0.2)
+        self.model_digest = None
+
+    def make_dataset(self, db_file, date_range=None, batch_size=32, chunk_days=28, shuffle_buffer=0):
+        # SQLite から日付順に読み込みながら特徴量に変換する tf.data のパイプライン
+        start_date, end_date = date_range if date_range else (None, None)
+        output_size = len(self.shifts) * len(self.employees)
+
+        if self.model_type == 'shared':
+            # 1日分の (従業員, シフト) の行をまとめて読み込み、行単位に分けてからバッチにする
+            def generate():
+                for date, shifts in iter_historical_days(db_file, start_date, end_date, chunk_days):
+                    yield self.prepare_pair_features(date), self.encode_shifts(shifts).astype(np.float32)
+
+            dataset = tf.data.Dataset.from_generator(generate, output_signature=(
+                tf.TensorSpec(shape=(output_size, self.input_size()), dtype=tf.float32),
+                tf.TensorSpec(shape=(output_size,), dtype=tf.float32),
+            )).unbatch()
+            if shuffle_buffer:
+                dataset = dataset.shuffle(shuffle_buffer * output_size)
+            return dataset.batch(batch_size * output_size).prefetch(tf.data.AUTOTUNE)
+
+        def generate():
+            for date, shifts in iter_historical_days(db_file, start_date, end_date, chunk_days):
+                yield self.prepare_input_data(date).astype(np.float32), self.encode_shifts(shifts).astype(np.float32)
+
+        dataset = tf.data.Dataset.from_generator(generate, output_signature=(
+            tf.TensorSpec(shape=(self.input_size(),), dtype=tf.float32),
+            tf.TensorSpec(shape=(output_size,), dtype=tf.float32),
+        ))
+        if shuffle_buffer:
+            dataset = dataset.shuffle(shuffle_buffer)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    def train_model_streaming(self, db_file, train_range=None, validation_range=None, epochs=100, batch_size=32):
+        # 検証データはメモリ上の割合ではなく日付の範囲で指定する
+        train_dataset = self.make_dataset(db_file, train_range, batch_size, shuffle_buffer=batch_size * 4)
+        validation_dataset = self.make_dataset(db_file, validation_range, batch_size) if validation_range else None
+        history = self.model.fit(train_dataset, epochs=epochs, validation_data=validation_dataset)
+        self.model_digest = None
+        return history
+
+    WEIGHTS_FILE = 'shift_ai.weights.h5'
+    CHECKPOINT_FILE = 'shift_ai_checkpoint.json'
+
+    def save_checkpoint(self, checkpoint_dir, last_trained_date, val_loss, baseline_val_loss, fit_through_date=None):
+        # 重みと「どの日まで学習したか」「基準の検証損失」を保存する
+        # fit_through_date は実際に重みの更新に使った最後の日（検証用に残した日は含まない。省略時は last_trained_date）
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.model.save_weights(os.path.join(checkpoint_dir, self.WEIGHTS_FILE))
+        with open(os.path.join(checkpoint_dir, self.CHECKPOINT_FILE), 'w', encoding='utf-8') as file:
+            json.dump({
+                'last_trained_date': last_trained_date.isoformat(),
+                'fit_through_date': (fit_through_date or last_trained_date).isoformat(),
+                'val_loss': val_loss,
+                'baseline_val_loss': baseline_val_loss,
+                'model_type': self.model_type,
+                'input_size': self.input_size(),
+                'output_size': self.output_size(),
+            }, file)
+
+    def load_checkpoint(self, checkpoint_dir):
+        # 保存済みの重みを読み込む。なければ、またはモデルの形が変わっていれば None
+        # （'roster' は従業員数・シフト数が変わると使えない。'shared' は従業員数によらず使える）
+        meta_file = os.path.join(checkpoint_dir, self.CHECKPOINT_FILE)
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file, encoding='utf-8') as file:
+            meta = json.load(file)
+        if (meta.get('model_type', 'roster') != self.model_type or meta['input_size'] != self.input_size()
+                or meta['output_size'] != self.output_size()):
+            return None
+        self.model.load_weights(os.path.join(checkpoint_dir, self.WEIGHTS_FILE))
+        self.model_digest = None
+        meta['last_trained_date'] = datetime.strptime(meta['last_trained_date'], '%Y-%m-%d').date()
+        meta['fit_through_date'] = datetime.strptime(meta.get('fit_through_date', meta['last_trained_date'].isoformat()),
+                                                     '%Y-%m-%d').date()
+        return meta
+
+    def evaluate_range(self, db_file, date_range, batch_size=32):
+        result = self.model.evaluate(self.make_dataset(db_file, date_range, batch_size), verbose=0)
+        return float(result[0] if isinstance(result, list) else result)
+
+    def refresh_model(self, db_file, checkpoint_dir, fine_tune_epochs=3, validation_days=7, drift_tolerance=0.2, full_epochs=100):
+        # 前回保存した重みから、前回以降に追加された日だけで追加学習する
+        # 直近 validation_days 日は検証用に残して学習には使わない（次回、検証の期間が進んだら学習に回す）
+        # 直近 validation_days 日の検証損失が基準より drift_tolerance 以上悪化した場合や、
+        # 保存済みの重みが使えない場合（初回・従業員の増減）だけ全期間で学習し直す
+        first, last = get_history_range(db_file)
+        if last is None:
+            return {'mode': 'no_data'}
+        validation_range = (max(first, last - timedelta(days=validation_days - 1)), last)
+
+        meta = self.load_checkpoint(checkpoint_dir)
+        if meta is not None and meta['last_trained_date'] >= last:
+            return {'mode': 'up_to_date', 'val_loss': meta['val_loss']}
+
+        # 検証の期間を学習済みの重みが見ていれば（検証用に残す前の形式の保存など）、追加学習では測れないので学習し直す
+        if meta is not None and meta['fit_through_date'] < validation_range[0]:
+            new_range = (meta['fit_through_date'] + timedelta(days=1), validation_range[0] - timedelta(days=1))
+            fine_tuned_days = max(0, (new_range[1] - new_range[0]).days + 1)
+            if fine_tuned_days:
+                self.model.fit(self.make_dataset(db_file, new_range), epochs=fine_tune_epochs, verbose=0)
+                self.model_digest = None
+            val_loss = self.evaluate_range(db_file, validation_range)
+            if val_loss <= meta['baseline_val_loss'] * (1 + drift_tolerance):
+                self.save_checkpoint(checkpoint_dir, last, val_loss, meta['baseline_val_loss'],
+                                     max(meta['fit_through_date'], new_range[1]))
+                return {'mode': 'fine_tune', 'val_loss': val_loss, 'days': fine_tuned_days}
+
+        # 全期間で初期状態から学習し直す
+        self.model = self.build_ml_model()
+        train_range = (first, validation_range[0] - timedelta(days=1)) if validation_range[0] > first else (first, last)
+        self.train_model_streaming(db_file, train_range, validation_range, epochs=full_epochs)
+        val_loss = self.evaluate_range(db_file, validation_range)
+        self.save_checkpoint(checkpoint_dir, last, val_loss, val_loss, train_range[1])
+        return {'mode': 'full', 'val_loss': val_loss}
 
     def prepare_training_data(self):
         X, y = [], []
         for date, shifts in self.historical_data.items():
-            X.append(self.prepare_input_data(date))
+            X.append(self.prepare_pair_features(date) if self.model_type == 'shared' else self.prepare_input_data(date))
             y.append(self.encode_shifts(shifts))
         return np.array(X), np.array(y)
 
@@ -89,9 +317,45 @@ class ShiftAI:
                 1 if date in employee.preferences else 0,
                 employee.preferences.get(date, (datetime.min.time(), datetime.min.time()))[0].hour if date in employee.preferences else 0
             ])
-        data.extend([date.weekday()] + [int(date in self.jp_holidays)])
+        calendar = self.get_calendar(date)
+        data.extend([calendar.get_weekday(date)] + [int(calendar.is_holiday(date))])
         return np.array(data)
 
+    def prepare_pair_features(self, date):
+        # model_type='shared' の入力。(従業員数 * シフト数, PAIR_FEATURES) の配列で、
+        # 行の順番は encode_shifts / decode_predictions と同じ（従業員ごとにシフトを並べる）
+        def hours(t):
+            return (t.hour + t.minute / 60) / 24
+
+        people = np.zeros((len(self.employees), 6), dtype=np.float32)
+        for i, employee in enumerate(self.employees):
+            people[i, :3] = (employee.register_skill, employee.refrigeration_skill, employee.stocking_skill)
+            if date in employee.preferences:
+                desired_start, desired_end = employee.preferences[date]
+                people[i, 3:] = (1, hours(desired_start), hours(desired_end))
+        templates = np.array([(hours(start), hours(end)) for start, end in self.shifts], dtype=np.float32)
+
+        # 希望時間とシフトの重なり（シフトの長さに対する割合）
+        overlap = np.minimum(people[:, None, 5], templates[None, :, 1]) - np.maximum(people[:, None, 4], templates[None, :, 0])
+        overlap = np.clip(overlap, 0, None) / (templates[None, :, 1] - templates[None, :, 0])
+        overlap *= people[:, None, 3]
+
+        calendar = self.get_calendar(date)
+        n_employees, n_shifts = len(self.employees), len(self.shifts)
+        features = np.empty((n_employees, n_shifts, self.PAIR_FEATURES), dtype=np.float32)
+        features[:, :, :6] = people[:, None, :]
+        features[:, :, 6] = calendar.get_weekday(date) / 6
+        features[:, :, 7] = int(calendar.is_holiday(date))
+        features[:, :, 8:10] = templates[None, :, :]
+        features[:, :, 10] = overlap
+        return features.reshape(n_employees * n_shifts, self.PAIR_FEATURES)
+
+    def get_calendar(self, date):
+        # 日付を含む年のカレンダーを使い回す（日付ごとに holidays を引かない）
+        if self.calendar is None or not self.calendar.covers(date):
+            self.calendar = get_calendar(date, date)
+        return self.calendar
+
     def encode_shifts(self, shifts):
         encoded = np.zeros(len(self.shifts) * len(self.employees))
         for i, employee in enumerate(self.employees):
@@ -100,11 +364,61 @@ class ShiftAI:
                     encoded[i * len(self.shifts) + j] = 1
         return encoded
 
-    def generate_shifts(self, date):
+    def predict_assignments(self, date):
+        # (従業員, シフト) ごとの割り当て確率を encode_shifts と同じ並びで返す
+        if self.model_type == 'shared':
+            # 全従業員分を1回のバッチで評価する
+            features = self.prepare_pair_features(date)
+            return self.model.predict(features, batch_size=len(features), verbose=0).reshape(-1)
         input_data = self.prepare_input_data(date)
-        predictions = self.model.predict(input_data.reshape(1, -1))[0]
-        initial_shifts = self.decode_predictions(predictions)
-        return self.optimize_shifts(date, initial_shifts)
+        return self.model.predict(input_data.reshape(1, -1))[0]
+
+    def generate_shifts(self, date):
+        # 入力が同じ日（曜日・祝日・希望が同じ日）はキャッシュした結果を返す
+        key = self.solution_key(date)
+        solution = self.solution_cache.get(key)
+        if solution is None:
+            predictions = self.predict_assignments(date)
+            initial_shifts = self.decode_predictions(predictions)
+            solution = self.optimize_shifts(date, initial_shifts)
+            self.solution_cache.put(key, solution)
+        # 呼び出し側が書き換えてもキャッシュに影響しないようにコピーを返す
+        return {emp_id: dict(assignment) for emp_id, assignment in solution.items()}
+
+    def get_model_digest(self):
+        # 学習済みの重みのハッシュ。学習し直すと変わるので、古いモデルの結果をキャッシュから返さない
+        if self.model_digest is None:
+            digest = hashlib.sha256()
+            for weights in self.model.get_weights():
+                digest.update(np.ascontiguousarray(weights).tobytes())
+            self.model_digest = digest.hexdigest()
+        return self.model_digest
+
+    def solution_key(self, date):
+        # prepare_input_data の特徴量・シフト・制約・モデルから作るキー。日付そのものは含めない
+        # 特徴量には希望の開始時刻（時）しかないので、希望時間は分単位で別に加える
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(self.prepare_input_data(date), dtype=np.float64).tobytes())
+        digest.update(repr([(e.id, e.preferences.get(date)) for e in self.employees]).encode('utf-8'))
+        digest.update(repr(self.shifts).encode('utf-8'))
+        digest.update(json.dumps(self.constraints, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(self.model_type.encode('utf-8'))
+        digest.update(self.get_model_digest().encode('utf-8'))
+        return digest.hexdigest()
+
+    def save_solution_cache(self, file_path=None):
+        file_path = file_path or self.solution_cache_file
+        with open(file_path, 'wb') as file:
+            pickle.dump(list(self.solution_cache.data.items()), file)
+
+    def load_solution_cache(self, file_path):
+        # 古いものから順に入れるので、LRU の順番もそのまま戻る
+        with open(file_path, 'rb') as file:
+            for key, solution in pickle.load(file):
+                self.solution_cache.put(key, solution)
+
+    def solution_cache_stats(self):
+        return self.solution_cache.stats()
 
     def decode_predictions(self, predictions):
         shifts = {}
@@ -114,15 +428,56 @@ class ShiftAI:
                 shifts[employee.id][shift] = predictions[i * len(self.shifts) + j] > 0.5
         return shifts
 
+    def get_cp_template(self):
+        # 変数と制約は従業員とシフトの組み合わせが同じ間は使い回す。
+        # 日付ごとに変わるのは目的関数と、必要人数・レジ係の制約の範囲だけなので、それだけを書き換える
+        key = (tuple(e.id for e in self.employees), tuple(self.shifts))
+        if self.cp_template is None or self.cp_template['key'] != key:
+            model = cp_model.CpModel()
+            shifts = {}
+            for e in self.employees:
+                for s in self.shifts:
+                    shifts[(e.id, s)] = model.NewBoolVar(f'shift_e{e.id}_s{s[0].strftime("%H%M")}')
+            staffing, total_staffing, register_cover = self.add_constraints(model, shifts, None)
+            self.cp_template = {'key': key, 'model': model, 'shifts': shifts,
+                                'staffing': {s: constraint.Index() for s, constraint in staffing.items()},
+                                'total_staffing': total_staffing.Index(),
+                                'register_cover': register_cover.Index() if register_cover is not None else None}
+        return self.cp_template
+
+    def get_required_staff(self, date):
+        # constraints に busy_required_staff があれば、混雑日（土日祝）はその人数にする
+        if 'busy_required_staff' in self.constraints and self.get_calendar(date).is_busy(date):
+            return self.constraints['busy_required_staff']
+        return self.constraints['required_staff']
+
+    def check_feasibility(self, date):
+        # 必要人数とレジ係をどこまで満たせるかを最大流で求める（FeasibilityReport）
+        # CP-SAT のモデルと同じく、誰でもどのシフトにも入れて、1人1シフトまでとする
+        required_staff = self.get_required_staff(date)
+        everyone = {e.id for e in self.employees}
+        return analyze_day({s: everyone for s in self.shifts}, {s: required_staff for s in self.shifts}, 1,
+                           {e.id: set(e.skills) for e in self.employees}, {(s, 'レジ'): 1 for s in self.shifts})
+
     def optimize_shifts(self, date, initial_shifts):
-        model = cp_model.CpModel()
-        
-        shifts = {}
-        for e in self.employees:
-            for s in self.shifts:
-                shifts[(e.id, s)] = model.NewBoolVar(f'shift_e{e.id}_s{s[0].strftime("%H%M")}')
+        template = self.get_cp_template()
+        model = template['model']
+        shifts = template['shifts']
 
-        self.add_constraints(model, shifts, date)
+        # 各シフトは必要人数以下にし、全シフトの合計を事前チェックの最大流（入れられる最大の人数）以上にする。
+        # 人数が足りている日は合計が必要人数の合計になるので、どのシフトも必要人数ちょうどになる。
+        # 足りない日にシフトごとの人数を決め打ちしないので、どのシフトを減らすかは希望の数で選べる。
+        # レジ係も同じく、レジ係のいるシフトの数を最大流の値以上にする
+        required_staff = self.get_required_staff(date)
+        report = self.check_feasibility(date)
+        proto = model.Proto()
+        for s, index in template['staffing'].items():
+            proto.constraints[index].linear.domain[1] = required_staff
+        proto.constraints[template['total_staffing']].linear.domain[0] = \
+            sum(report.required.values()) - report.total_shortage
+        if template['register_cover'] is not None:
+            proto.constraints[template['register_cover']].linear.domain[0] = \
+                len(self.shifts) - report.total_skill_shortages['レジ']
 
         preference_vars = []
         for e in self.employees:
@@ -143,17 +498,30 @@ class ShiftAI:
             return self.heuristic_adjustment(initial_shifts, date)
 
     def add_constraints(self, model, shifts, date):
-        # 各シフトの必要人数を満たす制約
+        # 各シフトの必要人数を満たす制約（日付ごとに範囲を書き換えられるよう、制約を返す）
+        # date が None の場合（テンプレート）は required_staff で作っておく
+        # シフトごとは必要人数以下、全シフトの合計は必要人数の合計（optimize_shifts が下限を書き換える）
+        required_staff = self.constraints['required_staff'] if date is None else self.get_required_staff(date)
+        staffing = {}
         for s in self.shifts:
-            model.Add(sum(shifts[(e.id, s)] for e in self.employees) == self.constraints['required_staff'])
+            staffing[s] = model.Add(sum(shifts[(e.id, s)] for e in self.employees) <= required_staff)
+        total_staffing = model.Add(sum(shifts.values()) >= required_staff * len(self.shifts))
 
         # 各従業員は最大1シフトまで
         for e in self.employees:
             model.Add(sum(shifts[(e.id, s)] for s in self.shifts) <= 1)
 
         # スキルに基づく制約（例：各シフトに少なくとも1人のレジ係）
-        for s in self.shifts:
-            model.Add(sum(shifts[(e.id, s)] for e in self.employees if e.register_skill) >= 1)
+        # has_register はそのシフトにレジ係がいるときだけ 1 にできる。全シフトにいるように has_register の合計を置く
+        # レジ係が1人もいない場合は満たせないので制約を置かない（check_feasibility でも 0 人になる）
+        register_cover = None
+        if any(e.register_skill for e in self.employees):
+            has_register = {}
+            for s in self.shifts:
+                has_register[s] = model.NewBoolVar(f'register_s{s[0].strftime("%H%M")}')
+                model.Add(has_register[s] <= sum(shifts[(e.id, s)] for e in self.employees if e.register_skill))
+            register_cover = model.Add(sum(has_register.values()) >= len(self.shifts))
+        return staffing, total_staffing, register_cover
 
     def heuristic_adjustment(self, shifts, date):
         # 簡単なヒューリスティック調整の例
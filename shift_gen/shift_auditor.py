@@ -0,0 +1,200 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+OFF = -1  # 休みの日の start / end
+
+# check_shift_extension・can_assign_shift・check_minimum_rest と同じ上限
+DAILY_MAX_HOURS = 10
+DAILY_LIMIT_HOURS = 8
+WEEKLY_LIMIT_HOURS = 40
+STREAK_LIMITS = (5, 6)
+MIN_REST_HOURS = 11
+
+VIOLATION_COLUMNS = ['employee_id', 'date', 'rule', 'value', 'limit', 'message']
+
+
+class ScheduleArrays:
+    """
+    シフト表を 従業員×日付 の配列にまとめたもの
+
+    start / end はその日の最初の出勤・最後の退勤（0時からの分、休みは OFF）、
+    work はその日の勤務時間の合計（分、休憩を含む。check_shift_extension と同じ数え方）。
+    日付をまたぐシフトは end に 24時間を足して持つ。
+    """
+
+    def __init__(self, employee_ids, start_date, start, end, work, names=None):
+        self.employee_ids = np.asarray(employee_ids)
+        self.names = names
+        self.start_date = start_date
+        self.start = start
+        self.end = end
+        self.work = work
+
+    @property
+    def dates(self):
+        return [self.start_date + datetime.timedelta(days=i) for i in range(self.start.shape[1])]
+
+    @classmethod
+    def from_intervals(cls, employee_ids, ordinals, start_minutes, end_minutes, names=None):
+        """
+        (従業員ID, 日付の序数, 開始分, 終了分) の配列から作る。同じ従業員・日付の行はまとめる
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        start_minutes = np.asarray(start_minutes, dtype=np.int32)
+        end_minutes = np.asarray(end_minutes, dtype=np.int32)
+        end_minutes = np.where(end_minutes <= start_minutes, end_minutes + MINUTES_PER_DAY, end_minutes)
+        ids, rows = np.unique(np.asarray(employee_ids), return_inverse=True)
+        first = int(ordinals.min()) if len(ordinals) else datetime.date.today().toordinal()
+        days = int(ordinals.max()) - first + 1 if len(ordinals) else 0
+        columns = ordinals - first
+
+        shape = (len(ids), days)
+        work = np.zeros(shape, dtype=np.int32)
+        np.add.at(work, (rows, columns), end_minutes - start_minutes)
+        start = np.full(shape, np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(start, (rows, columns), start_minutes)
+        end = np.full(shape, OFF, dtype=np.int32)
+        np.maximum.at(end, (rows, columns), end_minutes)
+        start[end == OFF] = OFF
+        return cls(ids, datetime.date.fromordinal(first), start, end, work, names)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        get_assignment_rows・ScheduleStore.read_assignments の形式の行から作る
+        """
+        if not rows:
+            return cls.from_intervals([], [], [], [])
+        dates, emp_ids, _, _, starts, ends, _ = zip(*rows)
+        return cls.from_intervals(emp_ids, [date.toordinal() for date in dates], starts, ends)
+
+    @classmethod
+    def from_wide_csv(cls, file_path):
+        """
+        shift.csv 形式（従業員ID,name,skills,日付...、セルは H:MM-HH:MM か 休み）のシフト表を読み込む
+
+        1日に離れた勤務が2つ以上あるセル（H:MM-HH:MM/H:MM-HH:MM、shift_export の出力）は勤務ごとに読む。
+        """
+        df = pd.read_csv(file_path, encoding='utf-8-sig', dtype=str)
+        date_columns = []
+        ordinals = []
+        for column in df.columns[3:]:
+            try:
+                ordinals.append(datetime.datetime.strptime(column.strip(), '%Y/%m/%d').date().toordinal())
+                date_columns.append(column)
+            except ValueError:
+                continue  # 行末のカンマでできる空の列など
+
+        # セルの番号（行 * 列数 + 列）を index に残したまま / で区切った勤務ごとに分ける
+        cells = pd.Series(df[date_columns].to_numpy().ravel()).str.split('/').explode()
+        parts = cells.str.extract(r'^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$').to_numpy(dtype=float)
+        worked = ~np.isnan(parts[:, 0])
+        positions = cells.index.to_numpy()[worked]
+        rows = positions // len(date_columns)
+        days = np.asarray(ordinals)[positions % len(date_columns)]
+        parts = parts[worked].astype(np.int32)
+        employee_ids = pd.to_numeric(df['従業員ID']).to_numpy()
+        schedule = cls.from_intervals(employee_ids[rows], days, parts[:, 0] * 60 + parts[:, 1], parts[:, 2] * 60 + parts[:, 3])
+        names = dict(zip(employee_ids, df['name']))
+        schedule.names = [names[emp_id] for emp_id in schedule.employee_ids]
+        return schedule
+
+
+def streak_lengths(worked):
+    """
+    連続勤務の日数を日付ごとに求める
+
+    :param worked: 従業員×日付 の bool 配列
+    :return: その日までの連続日数、その日を含む連続勤務全体の日数（休みの日は 0）
+    """
+    days = worked.shape[1]
+    index = np.broadcast_to(np.arange(days), worked.shape)
+    last_off = np.maximum.accumulate(np.where(worked, -1, index), axis=1)
+    next_off = np.minimum.accumulate(np.where(worked, days, index)[:, ::-1], axis=1)[:, ::-1]
+    so_far = np.where(worked, index - last_off, 0)
+    run = np.where(worked, next_off - last_off - 1, 0)
+    return so_far, run
+
+
+def audit_schedule(schedule, daily_max_hours=DAILY_MAX_HOURS, daily_limit_hours=DAILY_LIMIT_HOURS,
+                   weekly_limit_hours=WEEKLY_LIMIT_HOURS, streak_limits=STREAK_LIMITS, min_rest_hours=MIN_REST_HOURS):
+    """
+    シフト表全体の労働時間の規則違反を調べる
+
+    1日の労働時間（10時間・8時間）、週の労働時間（月曜始まり）、連続勤務日数、シフト間の休息を
+    従業員×日付 の配列に対してまとめて判定する。
+
+    :param schedule: ScheduleArrays
+    :return: 違反の DataFrame（employee_id, date, rule, value, limit, message）。
+             value と limit は時間の規則は時間、連続勤務は日数。週の違反の date はその週の月曜日
+    """
+    work = schedule.work
+    worked = schedule.end != OFF
+    first = schedule.start_date.toordinal()
+    found = []
+
+    def collect(rule, mask, values, limit, message, ordinals=None):
+        rows, columns = np.nonzero(mask)
+        if len(rows) == 0:
+            return
+        day_ordinals = (first + columns) if ordinals is None else ordinals[columns]
+        found.append(pd.DataFrame({
+            'employee_id': schedule.employee_ids[rows],
+            'ordinal': day_ordinals,
+            'rule': rule,
+            'value': values[rows, columns],
+            'limit': limit,
+            'message': message,
+        }))
+
+    hours = work / 60
+    collect('daily_max', work > daily_max_hours * 60, hours, daily_max_hours,
+            f"1日の労働時間が{daily_max_hours}時間を超えます")
+    collect('daily_limit', work > daily_limit_hours * 60, hours, daily_limit_hours,
+            f"1日の労働時間が{daily_limit_hours}時間を超えます")
+
+    # 週の合計は月曜日の位置で区切って reduceat で求める
+    if work.shape[1]:
+        week_starts = np.flatnonzero((np.arange(work.shape[1]) + first - 1) % 7 == 0)
+        boundaries = np.unique(np.concatenate([[0], week_starts]))
+        weekly = np.add.reduceat(work, boundaries, axis=1) / 60
+        mondays = first + boundaries - (first + boundaries - 1) % 7
+        collect('weekly_limit', weekly > weekly_limit_hours, weekly, weekly_limit_hours,
+                f"週間労働時間が{weekly_limit_hours}時間を超えます", mondays)
+
+    # 連続勤務は上限を超えた最初の日に、その連続勤務全体の日数で1件にする
+    so_far, run = streak_lengths(worked)
+    for limit in streak_limits:
+        collect(f'streak_{limit}', so_far == limit + 1, run, limit, f"連続勤務日数が{limit}日を超えます")
+
+    # 前日の最後の退勤から当日の最初の出勤まで
+    rest = (schedule.start[:, 1:] + MINUTES_PER_DAY - schedule.end[:, :-1]) / 60
+    short_rest = np.zeros(worked.shape, dtype=bool)
+    short_rest[:, 1:] = worked[:, 1:] & worked[:, :-1] & (rest < min_rest_hours)
+    rest_values = np.zeros(worked.shape)
+    rest_values[:, 1:] = rest
+    collect('min_rest', short_rest, rest_values, min_rest_hours, f"前のシフトとの間隔が{min_rest_hours}時間未満です")
+
+    if not found:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    violations = pd.concat(found, ignore_index=True)
+    ordinals = violations.pop('ordinal')
+    violations.insert(1, 'date', [datetime.date.fromordinal(int(o)) for o in ordinals])
+    return violations.sort_values(['employee_id', 'date', 'rule'], kind='stable').reset_index(drop=True)
+
+
+def audit_assignments(generator, assignments):
+    """
+    generate_shifts の結果（{日付: その日のシフト}）を get_assignment_rows で行にして調べる
+
+    :param generator: get_assignment_rows を持つシフト生成クラスのインスタンス
+    :param assignments: generate_shifts の戻り値の1つ目（ShiftResult.assignments など）
+    :return: audit_schedule の戻り値
+    """
+    rows = []
+    for date, day_shifts in assignments.items():
+        rows.extend(generator.get_assignment_rows(date, day_shifts))
+    return audit_schedule(ScheduleArrays.from_rows(rows))
@@ -0,0 +1,78 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+# 入力やシフトが変わるたびに振り直すバージョン番号。プロセス内で重複しないので、
+# copy_for_scenario で作ったコピー同士でキャッシュを共有しても取り違えない
+_versions = itertools.count(1)
+
+
+def new_version():
+    return next(_versions)
+
+
+class LRUCache:
+    """
+    サイズの上限つきのキャッシュ。上限を超えたら最も長く使われていないものから捨てる
+
+    hits / misses で命中数と失敗数を数える。
+    copy_for_scenario のコピー同士で共有し、ShiftService のスレッドから同時に使われるので、操作はロックの中で行う。
+    get_or_compute の計算はロックの外で行う（同じキーを同時に計算した場合は後から入れた値が残る）。
+    """
+
+    _missing = object()
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.data.get(key, self._missing)
+            if value is self._missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, self._missing)
+        if value is self._missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def discard_if(self, predicate):
+        # predicate(キー) が真になるものを捨てる
+        with self.lock:
+            for key in [key for key in self.data if predicate(key)]:
+                del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,96 @@
+import datetime
+import functools
+import os
+
+import holidays
+import numpy as np
+
+
+class CalendarContext:
+    """
+    期間中の日付ごとの曜日・祝日・混雑日（土日祝）・週番号をまとめた配列
+
+    日付は date.toordinal() - base で配列の添字になる。
+    週番号は期間の最初の日を含む週（月曜始まり）を0とした通し番号で、ISO 週番号（date.isocalendar() の週）ではない。
+    同じ週番号の日は同じ月曜始まりの週に入るので、週ごとの集計のキーに使える。
+    """
+
+    def __init__(self, start_date, end_date, weekday, holiday):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.base = start_date.toordinal()
+        self.weekday = np.asarray(weekday, dtype=np.int8)
+        self.holiday = np.asarray(holiday, dtype=bool)
+        self.busy = self.holiday | (self.weekday >= 5)
+        first_monday = self.base - int(self.weekday[0])
+        self.week_index = ((np.arange(len(self.weekday)) + self.base - first_monday) // 7).astype(np.int32)
+
+    @classmethod
+    def build(cls, start_date, end_date):
+        """
+        holidays.JP を1回だけ引いて期間分の配列を作る
+        """
+        days = (end_date - start_date).days + 1
+        ordinals = np.arange(start_date.toordinal(), start_date.toordinal() + days)
+        # 0001-01-01 (序数1) は月曜日
+        weekday = (ordinals - 1) % 7
+        jp_holidays = holidays.JP(years=range(start_date.year, end_date.year + 1))
+        holiday = np.isin(ordinals, [date.toordinal() for date in jp_holidays.keys()])
+        return cls(start_date, end_date, weekday, holiday)
+
+    def covers(self, date):
+        return self.start_date <= date <= self.end_date
+
+    def index(self, date):
+        return date.toordinal() - self.base
+
+    def get_weekday(self, date):
+        return int(self.weekday[self.index(date)])
+
+    def is_holiday(self, date):
+        return bool(self.holiday[self.index(date)])
+
+    def is_busy(self, date):
+        return bool(self.busy[self.index(date)])
+
+    def get_week_index(self, date):
+        # 期間内の通し番号（ISO 週番号ではない）
+        return int(self.week_index[self.index(date)])
+
+    def save(self, file_path):
+        np.savez(file_path, start=self.start_date.toordinal(), end=self.end_date.toordinal(),
+                 weekday=self.weekday, holiday=self.holiday)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            return cls(datetime.date.fromordinal(int(data['start'])), datetime.date.fromordinal(int(data['end'])),
+                       data['weekday'], data['holiday'])
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_calendar(start_year, end_year, cache_dir):
+    if cache_dir:
+        file_path = os.path.join(cache_dir, f'calendar_{start_year}_{end_year}_holidays{holidays.__version__}.npz')
+        if os.path.exists(file_path):
+            return CalendarContext.load(file_path)
+    calendar = CalendarContext.build(datetime.date(start_year, 1, 1), datetime.date(end_year, 12, 31))
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        calendar.save(file_path)
+    return calendar
+
+
+def get_calendar(start_date, end_date, cache_dir=None):
+    """
+    start_date から end_date までを含む年単位の CalendarContext を返す
+
+    同じ年の範囲ならプロセス内で使い回し、cache_dir を指定した場合はファイルにも保存して
+    次回以降の実行でも使い回す。
+
+    :param start_date: 期間の開始日
+    :param end_date: 期間の終了日
+    :param cache_dir: キャッシュを保存するディレクトリ（省略可）
+    :return: CalendarContext
+    """
+    return _cached_calendar(start_date.year, end_date.year, cache_dir)
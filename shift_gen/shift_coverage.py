@@ -0,0 +1,259 @@
+from functools import lru_cache
+
+BUCKET_MINUTES = 15
+BREAK_MARGIN_MINUTES = 60  # シフト開始直後・終了直前には休憩を入れない
+SEARCH_NODES = 2000  # 目標人数ごとの探索で試す配置の数の上限
+
+
+def coverage_profile(intervals, day_start, day_end, bucket=BUCKET_MINUTES):
+    """
+    勤務時間の区間から、bucket 分ごとの人数を求める
+
+    開始で+1、終了で-1 するイベントを時刻順に累積する（差分配列による走査）。
+
+    :param intervals: (開始分, 終了分) のリスト
+    :param day_start: 集計する時間帯の開始（0時からの分）
+    :param day_end: 集計する時間帯の終了（0時からの分）
+    :return: 区間ごとの人数のリスト
+    """
+    size = -(-(day_end - day_start) // bucket)
+    diff = [0] * (size + 1)
+    for start, end in intervals:
+        first = max(0, (start - day_start) // bucket)
+        last = min(size, -(-(end - day_start) // bucket))
+        if first < last:
+            diff[first] += 1
+            diff[last] -= 1
+    profile = []
+    current = 0
+    for i in range(size):
+        current += diff[i]
+        profile.append(current)
+    return profile
+
+
+def break_positions(shifts, day_start, size, bucket=BUCKET_MINUTES, margin=BREAK_MARGIN_MINUTES):
+    """
+    各従業員の休憩を置ける位置（区間の番号）を求める
+
+    :return: (キー, 休憩の区間数, 置ける位置のリスト) のリスト（休憩のないシフトは含まない）
+    """
+    breaks = []
+    for key, start, end, break_minutes in shifts:
+        if break_minutes <= 0:
+            continue
+        length = -(-break_minutes // bucket)
+        first = (start - day_start) // bucket
+        last = -(-(end - day_start) // bucket) - length
+        lo = first + margin // bucket
+        hi = last - margin // bucket
+        if hi < lo:
+            # 余裕がない短いシフトはシフトの中央に置く
+            lo = hi = max(first, (first + last) // 2)
+        lo = max(0, lo)
+        hi = min(size - length, hi)
+        if lo <= hi:
+            breaks.append((key, length, list(range(lo, hi + 1))))
+    return breaks
+
+
+def place_breaks_greedy(breaks, profile):
+    """
+    休憩の長い（配置の自由度が低い）ものから順に、その時点で休憩中の時間帯の最少人数が最も多くなる位置に置く
+
+    :param breaks: break_positions の戻り値
+    :param profile: 区間ごとの人数（休憩を置いた分だけ減らす）
+    :return: {キー: 休憩開始の区間の番号}
+    """
+    positions = {}
+    for key, length, candidates in sorted(breaks, key=lambda item: (-item[1], len(item[2]))):
+        best = None
+        for position in candidates:
+            covered = profile[position:position + length]
+            candidate = (min(covered), sum(covered))
+            if best is None or candidate > best[0]:
+                best = (candidate, position)
+        position = best[1]
+        for i in range(position, position + length):
+            profile[i] -= 1
+        positions[key] = position
+    return positions
+
+
+def search_breaks(breaks, capacity, max_nodes=SEARCH_NODES):
+    """
+    区間ごとに同時に休憩できる人数（capacity）を超えないように、全員の休憩を置く位置を探す
+
+    置ける位置が最も少ない休憩から順に決めるバックトラック。
+    確実に置けない場合は、探索の前に区間ごとの休憩の量と capacity の合計を比べて打ち切る。
+
+    :return: {キー: 休憩開始の区間の番号}。見つからない（max_nodes を超えた場合を含む）ときは None
+    """
+    size = len(capacity)
+    if any(value < 0 for value in capacity):
+        return None
+
+    # どこに置いても [a, b) に収まる休憩の長さの合計が、[a, b) で休憩できる量を超えれば置けない
+    prefix = [0]
+    for value in capacity:
+        prefix.append(prefix[-1] + value)
+    for a in range(size):
+        for b in range(a + 1, size + 1):
+            load = sum(length for _, length, candidates in breaks
+                       if candidates[0] >= a and candidates[-1] + length <= b)
+            if load > prefix[b] - prefix[a]:
+                return None
+
+    loads = [0] * size
+    positions = {}
+    nodes = 0
+
+    def fits(position, length):
+        return all(loads[i] < capacity[i] for i in range(position, position + length))
+
+    def solve(remaining):
+        nonlocal nodes
+        if not remaining:
+            return True
+        nodes += 1
+        if nodes > max_nodes:
+            return False
+        options = []
+        for index in remaining:
+            _, length, candidates = breaks[index]
+            feasible = [position for position in candidates if fits(position, length)]
+            if not feasible:
+                return False
+            options.append((len(feasible), index, feasible))
+        _, index, feasible = min(options)
+        key, length, _ = breaks[index]
+        # 休憩中の区間の余裕が大きい位置から試す
+        feasible.sort(key=lambda position: -min(capacity[i] - loads[i] for i in range(position, position + length)))
+        rest = [other for other in remaining if other != index]
+        for position in feasible:
+            for i in range(position, position + length):
+                loads[i] += 1
+            positions[key] = position
+            if solve(rest):
+                return True
+            for i in range(position, position + length):
+                loads[i] -= 1
+            del positions[key]
+        return False
+
+    return dict(positions) if solve(list(range(len(breaks)))) else None
+
+
+def improve_breaks(breaks, positions, surplus):
+    """
+    休憩を1つずつ動かして、区間ごとの余裕（surplus）を小さい順に並べたものが大きくなる限り改善する
+
+    動かす前後で値が変わるのは休憩の元の位置と新しい位置の区間だけなので、その区間の値だけを比べる。
+    最少の余裕を下げる移動はしないので、search_breaks で達成した最少人数はそのまま保たれる。
+
+    :param positions: {キー: 休憩開始の区間の番号}（書き換える）
+    :param surplus: 区間ごとの 売り場の人数 - 必要人数（書き換える）
+    """
+    improved = True
+    while improved:
+        improved = False
+        for key, length, candidates in breaks:
+            current = positions[key]
+            for position in candidates:
+                if position == current:
+                    continue
+                changed = sorted(set(range(current, current + length)) | set(range(position, position + length)))
+                before = sorted(surplus[i] for i in changed)
+                after = sorted(surplus[i] + (current <= i < current + length) - (position <= i < position + length)
+                               for i in changed)
+                if after > before:
+                    for i in range(current, current + length):
+                        surplus[i] += 1
+                    for i in range(position, position + length):
+                        surplus[i] -= 1
+                    positions[key] = current = position
+                    improved = True
+
+
+def place_breaks(shifts, day_start, day_end, bucket=BUCKET_MINUTES, margin=BREAK_MARGIN_MINUTES, demand=None):
+    """
+    各従業員の休憩をシフト内に配置し、実際に売り場にいる人数を求める
+
+    区間ごとの 売り場の人数 - 必要人数（demand、省略時は0）の最小値が最大になる位置に置く。
+    まず貪欲法（place_breaks_greedy）で置き、その最小値を1人ずつ上げられるかを search_breaks で調べたあと、
+    最小値を保ったまま improve_breaks で他の区間の余裕もできるだけ大きくする。
+    探索は目標ごとに SEARCH_NODES 回までで打ち切るので、シフトが多い日は最大にならないこともあるが、
+    返す配置はそのまま実行できるので、求めた人数は実際に確保できる人数の下限になる。
+
+    :param shifts: (キー, 開始分, 終了分, 休憩分) のリスト
+    :param day_start: 休憩を配置する時間帯の開始（0時からの分）
+    :param day_end: 休憩を配置する時間帯の終了（0時からの分）
+    :param bucket: 集計の単位（分）
+    :param margin: シフトの開始・終了から休憩までに空ける時間（分）
+    :param demand: 区間ごとの必要人数のリスト
+    :return: {キー: 休憩開始（0時からの分）}、区間ごとの売り場の人数のリスト
+    """
+    profile = coverage_profile([(start, end) for _, start, end, _ in shifts], day_start, day_end, bucket)
+    demand = demand or [0] * len(profile)
+    breaks = break_positions(shifts, day_start, len(profile), bucket, margin)
+
+    floor = list(profile)
+    positions = place_breaks_greedy(breaks, floor)
+    if profile:
+        best = min(value - need for value, need in zip(floor, demand))
+        # 休憩しても人数は0を下回らないので、必要人数が0の区間では余裕は0以上になる
+        upper = min(value - need for value, need in zip(profile, demand))
+        for target in range(best + 1, upper + 1):
+            found = search_breaks(breaks, [value - need - target for value, need in zip(profile, demand)])
+            if found is None:
+                break
+            positions = found
+
+    surplus = [value - need for value, need in zip(profile, demand)]
+    for key, length, _ in breaks:
+        for i in range(positions[key], positions[key] + length):
+            surplus[i] -= 1
+    improve_breaks(breaks, positions, surplus)
+    floor = [value + need for value, need in zip(surplus, demand)]
+    return {key: day_start + position * bucket for key, position in positions.items()}, floor
+
+
+@lru_cache(maxsize=256)
+def floor_profile(intervals, day_start, day_end, bucket=BUCKET_MINUTES, demand=None):
+    """
+    place_breaks で休憩を置いた後の区間ごとの売り場の人数（同じ日の時間帯ごとに何度も聞かれるのでキャッシュする）
+
+    :param intervals: (開始分, 終了分, 休憩分) のタプル
+    :param demand: 区間ごとの必要人数のタプル
+    :return: 区間ごとの人数のタプル
+    """
+    shifts = [(key, start, end, break_minutes) for key, (start, end, break_minutes) in enumerate(intervals)]
+    _, profile = place_breaks(shifts, day_start, day_end, bucket, demand=list(demand) if demand else None)
+    return tuple(profile)
+
+
+def minimum_on_floor(shifts, window_start, window_end, bucket=BUCKET_MINUTES, day_start=None, day_end=None,
+                     demand=None):
+    """
+    休憩を配置したうえで、指定した時間帯の売り場の最少人数を返す
+
+    休憩は day_start から day_end まで（省略時は指定した時間帯）をまとめて配置する。
+    時間帯の外まで続くシフトの休憩は、時間帯の外に置けるならそちらに置かれる。
+
+    :param shifts: place_breaks と同じ形式のリスト
+    :param day_start: 休憩を配置する範囲の開始（0時からの分）
+    :param day_end: 休憩を配置する範囲の終了（0時からの分）
+    :param demand: day_start から bucket 分ごとの必要人数（place_breaks に渡す）
+    :return: 最少人数
+    """
+    if window_end <= window_start:
+        return 0
+    day_start = window_start if day_start is None else min(day_start, window_start)
+    day_end = window_end if day_end is None else max(day_end, window_end)
+    # キーは人数に関係ないので、並び順をそろえてからキャッシュを引く（どの時間帯について聞いても同じ配置になる）
+    intervals = tuple(sorted((start, end, break_minutes) for _, start, end, break_minutes in shifts))
+    profile = floor_profile(intervals, day_start, day_end, bucket, tuple(demand) if demand else None)
+    first = (window_start - day_start) // bucket
+    last = -(-(window_end - day_start) // bucket)
+    window = profile[first:last]
+    return min(window) if window else 0
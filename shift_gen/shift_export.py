@@ -0,0 +1,180 @@
+import csv
+import datetime
+from collections import defaultdict
+
+import numpy as np
+
+from shift_auditor import MINUTES_PER_DAY, OFF, ScheduleArrays
+
+OFF_LABEL = '休み'
+HEADER = ['従業員ID', 'name', 'skills']
+# 0時からの分 → 'H:MM'（shift.csv と同じく時は0埋めしない）
+TIME_LABELS = np.array([f"{minute // 60}:{minute % 60:02d}" for minute in range(MINUTES_PER_DAY)], dtype=object)
+
+
+def date_label(date):
+    return f"{date.year}/{date.month}/{date.day}"
+
+
+def align_schedule(schedule, employee_ids, start_date, end_date):
+    """
+    ScheduleArrays を 従業員（employee_ids の順）×日付（start_date から end_date まで）の配列に並べ直す
+
+    シフト表にない従業員・日付は休み（OFF）になる。
+
+    :return: start, end（0時からの分、休みは OFF）
+    """
+    days = (end_date - start_date).days + 1
+    employee_ids = np.asarray(employee_ids)
+    start = np.full((len(employee_ids), days), OFF, dtype=np.int32)
+    end = np.full((len(employee_ids), days), OFF, dtype=np.int32)
+    if len(schedule.employee_ids) == 0 or days <= 0:
+        return start, end
+
+    # schedule.employee_ids は np.unique の結果なので昇順
+    positions = np.searchsorted(schedule.employee_ids, employee_ids)
+    positions = np.minimum(positions, len(schedule.employee_ids) - 1)
+    found = schedule.employee_ids[positions] == employee_ids
+    offset = schedule.start_date.toordinal() - start_date.toordinal()
+    first = max(0, offset)
+    last = min(days, offset + schedule.start.shape[1])
+    if first < last:
+        rows = positions[found]
+        start[found, first:last] = schedule.start[rows, first - offset:last - offset]
+        end[found, first:last] = schedule.end[rows, first - offset:last - offset]
+    return start, end
+
+
+def format_cells(start, end, off_label=OFF_LABEL):
+    """
+    start / end の配列を 'H:MM-H:MM'（休みは off_label）の文字列の配列にする
+
+    時刻の文字列は TIME_LABELS から引くので、セルごとの書式化はしない。
+    日付をまたぐシフトの終了時刻は翌日の時刻で書く。
+    """
+    worked = end != OFF
+    cells = np.full(start.shape, off_label, dtype=object)
+    cells[worked] = (TIME_LABELS[start[worked] % MINUTES_PER_DAY] + '-'
+                     + TIME_LABELS[end[worked] % MINUTES_PER_DAY])
+    return cells
+
+
+def split_cells(rows, employee_ids, start_date, days):
+    """
+    1日に離れた勤務が2つ以上ある従業員・日付のセルを 'H:MM-H:MM/H:MM-H:MM' の文字列にする
+
+    start / end の配列はその日の最初の出勤と最後の退勤しか持たないので、そのままでは間の休みが消える。
+    続いている勤務（次の開始が前の終了以前）は merge_shifts と同じく1つにまとめる。
+
+    :param rows: get_assignment_rows の形式の行
+    :param employee_ids: 出力する行の従業員ID（この順の添字で返す）
+    :param start_date: 最初の列の日付
+    :param days: 列の数
+    :return: {(行の添字, 列の添字): セルの文字列}（勤務が1つの日は含まない）
+    """
+    positions = {emp_id: i for i, emp_id in enumerate(employee_ids)}
+    intervals = defaultdict(list)
+    for date, emp_id, _, _, start, end, _ in rows:
+        column = (date - start_date).days
+        if emp_id in positions and 0 <= column < days:
+            intervals[(positions[emp_id], column)].append((start, end if end > start else end + MINUTES_PER_DAY))
+
+    cells = {}
+    for key, day_intervals in intervals.items():
+        merged = []
+        for start, end in sorted(day_intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        if len(merged) > 1:
+            cells[key] = '/'.join(TIME_LABELS[start % MINUTES_PER_DAY] + '-' + TIME_LABELS[end % MINUTES_PER_DAY]
+                                  for start, end in merged)
+    return cells
+
+
+def iter_wide_rows(roster, start, end, chunk_rows=512, off_label=OFF_LABEL, split=None):
+    """
+    従業員ごとの行（従業員ID, name, skills, 日付ごとのセル...）を chunk_rows 行ずつ返す
+
+    文字列にするのは chunk_rows 行分だけなので、従業員数・日数が多くてもメモリ使用量は一定になる。
+
+    :param roster: (従業員ID, 名前, スキルの文字列) のリスト（start / end の行と同じ順）
+    :param split: split_cells の戻り値。該当するセルは start / end の代わりにこちらを書く
+    :return: 行のリストを返すイテレータ
+    """
+    split_by_row = defaultdict(list)
+    for (row, column), label in (split or {}).items():
+        split_by_row[row].append((column, label))
+
+    for first in range(0, len(roster), chunk_rows):
+        cells = format_cells(start[first:first + chunk_rows], end[first:first + chunk_rows], off_label).tolist()
+        for offset, row_cells in enumerate(cells):
+            for column, label in split_by_row.get(first + offset, ()):
+                row_cells[column] = label
+        yield [[emp_id, name, skills, *row_cells]
+               for (emp_id, name, skills), row_cells in zip(roster[first:first + chunk_rows], cells)]
+
+
+def _prepare(generator, assignments, start_date, end_date):
+    rows = []
+    for date, day_shifts in assignments.items():
+        rows.extend(generator.get_assignment_rows(date, day_shifts))
+    schedule = ScheduleArrays.from_rows(rows)
+    if start_date is None:
+        start_date = min(assignments) if assignments else datetime.date.today()
+    if end_date is None:
+        end_date = max(assignments) if assignments else start_date
+    roster = generator.get_roster_rows()
+    employee_ids = [emp_id for emp_id, _, _ in roster]
+    start, end = align_schedule(schedule, employee_ids, start_date, end_date)
+    dates = [start_date + datetime.timedelta(days=i) for i in range(start.shape[1])]
+    return roster, dates, start, end, split_cells(rows, employee_ids, start_date, len(dates))
+
+
+def export_wide_csv(generator, assignments, file_path, start_date=None, end_date=None, chunk_rows=512):
+    """
+    生成したシフトを shift.csv と同じ横持ちの形式（従業員×日付、セルは H:MM-H:MM か 休み）で CSV に書き出す
+
+    1日に離れた勤務が2つ以上ある日は '9:00-14:00/17:00-20:00' のように / でつなぐ。
+    Excel でそのまま開けるように BOM 付きの UTF-8 で書く。
+
+    :param generator: get_assignment_rows と get_roster_rows を持つシフト生成クラスのインスタンス
+    :param assignments: generate_shifts の戻り値の1つ目（{日付: その日のシフト}）
+    :param file_path: 書き出す CSV ファイルのパス
+    :param start_date: 列の開始日（省略時は assignments の最初の日）
+    :param end_date: 列の終了日（省略時は assignments の最後の日）
+    :param chunk_rows: 1回に文字列にして書き出す行数
+    :return: 書き出した従業員の行数
+    """
+    roster, dates, start, end, split = _prepare(generator, assignments, start_date, end_date)
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER + [date_label(date) for date in dates])
+        for rows in iter_wide_rows(roster, start, end, chunk_rows, split=split):
+            writer.writerows(rows)
+    return len(roster)
+
+
+def export_wide_xlsx(generator, assignments, file_path, start_date=None, end_date=None, chunk_rows=512,
+                     sheet_name='シフト'):
+    """
+    export_wide_csv と同じ内容を XLSX に書き出す（openpyxl の write-only モードで1行ずつ書く）
+
+    :param sheet_name: シート名
+    :return: 書き出した従業員の行数
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise ImportError("XLSX で書き出すには openpyxl が必要です（pip install openpyxl）") from e
+
+    roster, dates, start, end, split = _prepare(generator, assignments, start_date, end_date)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(HEADER + [date_label(date) for date in dates])
+    for rows in iter_wide_rows(roster, start, end, chunk_rows, split=split):
+        for row in rows:
+            sheet.append(row)
+    workbook.save(file_path)
+    return len(roster)
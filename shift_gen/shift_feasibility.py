@@ -0,0 +1,166 @@
+from collections import deque
+
+
+def bipartite_max_flow(supply, demand, edges):
+    """
+    従業員→時間帯 の二部グラフの最大流（各辺の容量は1）
+
+    source→従業員 の容量が supply、時間帯→sink の容量が demand。
+    増加路は BFS で探す（入れ替えを含む経路も探すので結果は厳密な最大値）。
+
+    :param supply: {従業員: 担当できる時間帯の数}
+    :param demand: {時間帯: 必要人数}
+    :param edges: (従業員, 時間帯) の組（その従業員がその時間帯に入れる）
+    :return: 流量、{時間帯: [割り当てた従業員]}
+    """
+    adjacency = {}
+    for emp, slot in edges:
+        if supply.get(emp, 0) > 0 and demand.get(slot, 0) > 0:
+            adjacency.setdefault(emp, []).append(slot)
+    used = {emp: 0 for emp in adjacency}
+    assigned = {slot: [] for slot in demand}
+    matched = set()
+
+    flow = 0
+    for root in adjacency:
+        while used[root] < supply[root]:
+            # root から、空きのある時間帯まで（割り当て済みの人を押し出しながら）たどる
+            parent = {}
+            queue = deque([root])
+            seen_emps = {root}
+            end_slot = None
+            while queue and end_slot is None:
+                emp = queue.popleft()
+                for slot in adjacency[emp]:
+                    if (emp, slot) in matched or slot in parent:
+                        continue
+                    parent[slot] = emp
+                    if len(assigned[slot]) < demand[slot]:
+                        end_slot = slot
+                        break
+                    for other in assigned[slot]:
+                        if other not in seen_emps:
+                            seen_emps.add(other)
+                            parent[other] = slot
+                            queue.append(other)
+            if end_slot is None:
+                break
+
+            # 経路に沿って割り当てを入れ替える
+            slot = end_slot
+            while True:
+                emp = parent[slot]
+                matched.add((emp, slot))
+                assigned[slot].append(emp)
+                if emp == root:
+                    break
+                previous = parent[emp]
+                matched.discard((emp, previous))
+                assigned[previous].remove(emp)
+                slot = previous
+            used[root] += 1
+            flow += 1
+    return flow, assigned
+
+
+def slot_capacity(durations, max_hours):
+    """
+    1日に max_hours 時間までという条件で、1人が担当できる時間帯の数の上限
+
+    短い時間帯から詰めていったときに入る数なので、どの組み合わせでも超えない上限になる。
+    """
+    count = 0
+    total = 0
+    for duration in sorted(durations):
+        total += duration
+        if total > max_hours:
+            break
+        count += 1
+    return count
+
+
+class FeasibilityReport:
+    """
+    1日分の事前チェックの結果
+
+    total_shortage は必要人数の合計から最大流を引いた、どう割り当てても避けられない不足人数の合計。
+    slot_shortages は時間帯ごとに単独で見た避けられない不足（入れる人数が必要人数より少ない分）。
+    skill_shortages は (時間帯, スキル) ごとの同じ値で、total_skill_shortages はスキルごとの避けられない不足の合計。
+    achievable / skill_achievable は、スキルの必要人数を先に最大流で埋め、残りの人で人数を埋めた配分での
+    時間帯ごとの人数と (時間帯, スキル) ごとの人数。両方を同時に満たせる配分になっている
+    （スキルの取り合いがある場合、合計は最大流より少なくなることがある）。
+    """
+
+    def __init__(self, required, total_shortage, slot_shortages, achievable,
+                 skill_shortages, skill_achievable, total_skill_shortages):
+        self.required = required
+        self.total_shortage = total_shortage
+        self.slot_shortages = slot_shortages
+        self.achievable = achievable
+        self.skill_shortages = skill_shortages
+        self.skill_achievable = skill_achievable
+        self.total_skill_shortages = total_skill_shortages
+
+    @property
+    def feasible(self):
+        return self.total_shortage == 0 and not any(self.total_skill_shortages.values())
+
+
+def analyze_day(available, required, capacity=1, employee_skills=None, skill_required=None):
+    """
+    割り当てる前に、その日の避けられない不足人数を求める
+
+    人数は「従業員→時間帯」の最大流、スキルは（時間帯, スキル）の必要人数ごとに
+    スキルを持つ従業員だけで最大流を求める（Hall の条件を満たさない分が不足になる）。
+
+    :param available: {時間帯: 入れる従業員の集合}
+    :param required: {時間帯: 必要人数}
+    :param capacity: 1人が担当できる時間帯の数。{従業員: 数} または全員共通の整数
+    :param employee_skills: {従業員: スキルの集合}
+    :param skill_required: {(時間帯, スキル): 必要人数}
+    :return: FeasibilityReport
+    """
+    employees = set()
+    for emps in available.values():
+        employees.update(emps)
+    supply = capacity if isinstance(capacity, dict) else {emp: capacity for emp in employees}
+    edges = [(emp, slot) for slot, emps in available.items() for emp in emps]
+
+    flow, _ = bipartite_max_flow(supply, required, edges)
+    slot_shortages = {}
+    for slot, count in required.items():
+        reachable = sum(1 for emp in available.get(slot, ()) if supply.get(emp, 0) > 0)
+        slot_shortages[slot] = max(0, count - reachable)
+
+    skill_shortages = {}
+    total_skill_shortages = {}
+    skill_achievable = {}
+    # 配分用: スキルごとに残りの人で埋め、使った (従業員, 時間帯) は後から使わない
+    residual = dict(supply)
+    remaining_edges = set(edges)
+    placed = {slot: 0 for slot in required}
+    skills = sorted({skill for _, skill in (skill_required or {})})
+    for skill in skills:
+        demand = {slot: count for (slot, s), count in skill_required.items() if s == skill}
+        skilled = [(emp, slot) for emp, slot in edges if slot in demand and skill in employee_skills.get(emp, ())]
+        skill_flow, _ = bipartite_max_flow(supply, demand, skilled)
+        total_skill_shortages[skill] = sum(demand.values()) - skill_flow
+        for slot, count in demand.items():
+            reachable = sum(1 for emp, s in skilled if s == slot and supply.get(emp, 0) > 0)
+            skill_shortages[(slot, skill)] = max(0, count - reachable)
+
+        demand = {slot: min(count, max(0, required.get(slot, count) - placed.get(slot, 0))) for slot, count in demand.items()}
+        _, skill_assigned = bipartite_max_flow(residual, demand, [edge for edge in skilled if edge in remaining_edges])
+        for slot, emps in skill_assigned.items():
+            skill_achievable[(slot, skill)] = len(emps)
+            placed[slot] = placed.get(slot, 0) + len(emps)
+            for emp in emps:
+                residual[emp] -= 1
+                remaining_edges.discard((emp, slot))
+
+    demand = {slot: count - placed[slot] for slot, count in required.items()}
+    _, assigned = bipartite_max_flow(residual, demand, remaining_edges)
+    achievable = {slot: placed[slot] + len(assigned[slot]) for slot in required}
+
+    return FeasibilityReport(required, sum(required.values()) - flow, slot_shortages, achievable,
+                             skill_shortages, skill_achievable, total_skill_shortages)
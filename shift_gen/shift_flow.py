@@ -0,0 +1,144 @@
+from collections import deque
+
+SEAT_BONUS = 10 ** 6  # 1人分の席を埋めることの価値（どの点数の差よりも大きくする）
+QUOTA_BONUS = 10 ** 9  # スキルの必要人数を満たすことの価値（席を埋めるよりも優先する）
+
+
+class MinCostFlow:
+    """
+    最小費用流（逐次最短路法）
+
+    費用が負の辺があってもよいように、最短路は Bellman-Ford（キューを使う SPFA）で求める。
+    残余グラフに負閉路ができない（流すたびに最短路に沿って流す）ので、結果は最適になる。
+    """
+
+    def __init__(self):
+        self.graph = []  # 頂点ごとの辺の番号のリスト
+        self.to = []
+        self.capacity = []
+        self.cost = []
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, capacity, cost):
+        # 辺 e の逆辺は e ^ 1
+        self.graph[u].append(len(self.to))
+        self.to.append(v)
+        self.capacity.append(capacity)
+        self.cost.append(cost)
+        self.graph[v].append(len(self.to))
+        self.to.append(u)
+        self.capacity.append(0)
+        self.cost.append(-cost)
+        return len(self.to) - 2
+
+    def flow(self, edge):
+        return self.capacity[edge ^ 1]
+
+    def solve(self, source, sink):
+        """
+        費用が下がる限り流す（流量を最大にするのではなく、費用を最小にする）
+
+        :return: 流量、費用
+        """
+        total_flow = 0
+        total_cost = 0
+        n = len(self.graph)
+        while True:
+            distance = [None] * n
+            parent_edge = [-1] * n
+            in_queue = [False] * n
+            distance[source] = 0
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                in_queue[u] = False
+                for edge in self.graph[u]:
+                    if self.capacity[edge] <= 0:
+                        continue
+                    v = self.to[edge]
+                    candidate = distance[u] + self.cost[edge]
+                    if distance[v] is None or candidate < distance[v]:
+                        distance[v] = candidate
+                        parent_edge[v] = edge
+                        if not in_queue[v]:
+                            in_queue[v] = True
+                            queue.append(v)
+            if distance[sink] is None or distance[sink] >= 0:
+                break
+
+            amount = None
+            v = sink
+            while v != source:
+                edge = parent_edge[v]
+                amount = self.capacity[edge] if amount is None else min(amount, self.capacity[edge])
+                v = self.to[edge ^ 1]
+            v = sink
+            while v != source:
+                edge = parent_edge[v]
+                self.capacity[edge] -= amount
+                self.capacity[edge ^ 1] += amount
+                v = self.to[edge ^ 1]
+            total_flow += amount
+            total_cost += amount * distance[sink]
+        return total_flow, total_cost
+
+
+def assign_day(candidates, scores, required, capacity, employee_skills=None, quotas=None):
+    """
+    1日分の 従業員→時間帯 の割り当てを最小費用流で求める
+
+    優先順位は、スキルの必要人数 > 埋まる席の数 > 点数の合計。
+    従業員ごとに (従業員, 時間帯) の頂点を挟むので、同じ時間帯の席とスキルの枠を1人で二重には取らない。
+
+    :param candidates: {時間帯: [その時間帯に入れる従業員ID]}
+    :param scores: {(従業員ID, 時間帯): 点数}
+    :param required: {時間帯: 埋める席の数}
+    :param capacity: {従業員ID: 1日に担当できる時間帯の数}
+    :param employee_skills: {従業員ID: スキルの集合}
+    :param quotas: {(時間帯, スキル): 必要人数}
+    :return: {時間帯: [従業員ID]}（点数の高い順）
+    """
+    quotas = quotas or {}
+    flow = MinCostFlow()
+    source = flow.add_node()
+    sink = flow.add_node()
+    slot_nodes = {}
+    for slot, seats in required.items():
+        slot_nodes[slot] = flow.add_node()
+        flow.add_edge(slot_nodes[slot], sink, seats, -SEAT_BONUS)
+    quota_nodes = {}
+    for (slot, skill), count in quotas.items():
+        if slot in slot_nodes and count > 0:
+            quota_nodes[(slot, skill)] = flow.add_node()
+            flow.add_edge(quota_nodes[(slot, skill)], slot_nodes[slot], count, -QUOTA_BONUS)
+
+    employee_nodes = {}
+    pair_edges = []
+    for slot, emp_ids in candidates.items():
+        if slot not in slot_nodes:
+            continue
+        for emp_id in emp_ids:
+            if capacity.get(emp_id, 0) <= 0:
+                continue
+            if emp_id not in employee_nodes:
+                employee_nodes[emp_id] = flow.add_node()
+                flow.add_edge(source, employee_nodes[emp_id], capacity[emp_id], 0)
+            pair = flow.add_node()
+            flow.add_edge(employee_nodes[emp_id], pair, 1, 0)
+            cost = -scores[(emp_id, slot)]
+            pair_edges.append((emp_id, slot, flow.add_edge(pair, slot_nodes[slot], 1, cost)))
+            for (quota_slot, skill), node in quota_nodes.items():
+                if quota_slot == slot and skill in (employee_skills or {}).get(emp_id, ()):
+                    pair_edges.append((emp_id, slot, flow.add_edge(pair, node, 1, cost)))
+
+    flow.solve(source, sink)
+    assigned = {slot: [] for slot in required}
+    for emp_id, slot, edge in pair_edges:
+        if flow.flow(edge):
+            assigned[slot].append(emp_id)
+    for slot in assigned:
+        assigned[slot].sort(key=lambda emp_id: -scores[(emp_id, slot)])
+    return assigned
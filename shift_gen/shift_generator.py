@@ -3,7 +3,17 @@ import datetime
 import holidays
 from collections import defaultdict
 from typing import List, Dict, Tuple
-import random
+import numpy as np
+import copy
+from shift_store import shortage_rows
+from shift_matrix import DayAvailability, skill_mask
+from shift_calendar import get_calendar
+from shift_result import ShiftResult, ShiftReporter
+from shift_cache import LRUCache, new_version
+from shift_coverage import BUCKET_MINUTES, minimum_on_floor
+from shift_feasibility import analyze_day, slot_capacity
+from shift_flow import assign_day
+from shift_snapshot import load_snapshot
 
 '''
 pip したもの
@@ -13,11 +23,20 @@ holidays
 '''
 class ShiftGenerator:
     #最少人数と最大人数
-    def __init__(self, data_file: str):
-        self.employees, self.preferences = self.load_data(data_file)
+    def __init__(self, data_file: str, snapshot_file: str = None, shared_inputs=None):
+        # snapshot_file を指定すると CSV を解析せず、バイナリのスナップショットから読み込む（古ければ作り直す）
+        # shared_inputs（shift_shared.SharedInputs）を指定すると共有メモリの配列から読み込む
+        if shared_inputs is not None:
+            self.employees, self.preferences = self.load_data_arrays(shared_inputs)
+        elif snapshot_file:
+            self.employees, self.preferences = self.load_data_snapshot(data_file, snapshot_file)
+        else:
+            self.employees, self.preferences = self.load_data(data_file)
         self.shifts = defaultdict(lambda: defaultdict(list))
         self.preference_rates = {emp['id']: 100 for emp in self.employees}  # 初期値は100%
         self.min_shift_duration = 2  # 最小シフト時間（時間単位）
+        # 希望採用の抽選結果（set_preference_draws で設定）。None のときは希望を常に採用する
+        self.preference_draws = None
 
         self.min_employees = {
             '早朝': 0,
@@ -49,20 +68,64 @@ class ShiftGenerator:
         }
         # 日本の祝日を初期化
         self.jp_holidays = holidays.JP() 
+        # 生成期間の曜日・祝日をまとめたカレンダー（use_calendar で設定）
+        self.calendar = None
+        # 前回までの実行から引き継いだ従業員ごとの勤務状況（load_carry_over で読み込む）
+        self.carry_over = {}
+        # 店舗独自の休日（祝日以外の休業日・繁忙日など）
+        self.custom_holidays = set()
+        # 生成後に入力（希望・休日・必要人数）が変わった日付。regenerate_dirty で作り直す
+        self.dirty_dates = set()
+        # 生成済みの日ごとの (人員不足, スキル不足)
+        self.day_results = {}
+        # 生成済みの日ごとの check_shift_extension の警告（collect_warnings が True のときだけ集める）
+        self.day_warnings = {}
+        self.collect_warnings = False
+        # 表示の出力先（ShiftReporter）。None のときは何も表示しない
+        self.reporter = None
+        # True にすると候補者の判定を日ごとの 従業員×15分区間 の行列でまとめて行う。判定は従来と同じではない:
+        # 希望との重なりを分単位で見る（従来は時の単位に切り捨てるので、8:30-17:30 の希望は夜 17-20 に入れない）うえ、
+        # 1日の上限時間（MAX_DAILY_HOURS）を超える人と同じ時間帯に割り当て済みの人も候補から外す
+        self.use_availability_matrix = False
+        # True の場合、休憩回し用の補助は休憩を配置しても必要人数を割るときだけ追加する
+        # （休憩は従業員ごとに同じ日の枠を結合したシフトの長さで決まるので、1日分が決まった後にもう一度確認する）
+        self.break_aware_support = True
+        # True の場合、割り当てる前の事前チェックで冷蔵スキルを持つ人が誰も入れないと分かった夜シフトは割り当てを省く
+        self.skip_infeasible_slots = True
+        # 1日分の割り当て方法。'greedy' は時間帯ごとに点数の高い順、'flow' は最小費用流で1日分をまとめて最適化する
+        self.day_engine = 'greedy'
+        # True の場合、どちらの方法でも1日の勤務が MAX_DAILY_HOURS を超える割り当て（補助を含む）をしない。
+        # False にすると従来の貪欲法と同じく1日の時間は見ない（flow も時間帯の数だけ掛け持ちできる）
+        self.enforce_daily_hours = True
+        # copy_for_scenario の元・コピーと共有している希望シフトの従業員ID（書き換える前に複製する）
+        self.shared_preferences = set()
+        # 日付ごとの希望シフトの行列（use_availability_matrix のとき）。生成中の前後の日付だけ持てばよい
+        self.availability_cache = LRUCache(maxsize=31)
+        # (日付, 時間帯, 入力のバージョン) ごとの候補者と、割り当て状況に依存しない点数のキャッシュ
+        # 入力のバージョンは全体（preference_draws など）と日付ごと（希望シフトの変更）の組
+        self.candidate_cache = LRUCache(maxsize=4096)
+        self.inputs_version = new_version()
+        self.date_versions = {}
+        # 日付ごとのシフトのバージョン（割り当てが変わるたびに振り直す）と、それに基づく従業員別のまとめ
+        self.ledger_versions = {}
+        self.grouping_cache = LRUCache(maxsize=1024)
       
       
     def load_data(self, file_path: str):
         df = pd.read_csv(file_path)
         employees = []
         preferences = defaultdict(lambda: defaultdict(list))
+        seen_ids = set()
         
         for _, row in df.iterrows():
-            employee = {
-                'id': row['従業員ID'],
-                'name': row['name'],
-                'skills': row['skills'].split(',') if isinstance(row['skills'], str) else []
-            }
-            employees.append(employee)
+            # CSVは1行が従業員×希望日なので、従業員は最初の行だけ登録する
+            if row['従業員ID'] not in seen_ids:
+                seen_ids.add(row['従業員ID'])
+                employees.append({
+                    'id': row['従業員ID'],
+                    'name': row['name'],
+                    'skills': row['skills'].split(',') if isinstance(row['skills'], str) else []
+                })
             
             date = datetime.datetime.strptime(row['希望日'], '%Y-%m-%d').date()
             if pd.notna(row['出勤時間']) and pd.notna(row['退勤時間']):
@@ -73,6 +136,56 @@ class ShiftGenerator:
         return employees, preferences
 
     
+    def load_data_snapshot(self, file_path, snapshot_file):
+        snapshot = load_snapshot(file_path, snapshot_file)
+        try:
+            return self.load_data_arrays(snapshot)
+        finally:
+            snapshot.close()
+
+    def load_data_arrays(self, snapshot):
+        # load_data と同じ employees / preferences をスナップショット・共有メモリの配列から作る
+        employees = []
+        for index, emp_id in enumerate(snapshot.employee_ids.tolist()):
+            skills = snapshot.skills_text(index)
+            employees.append({
+                'id': emp_id,
+                'name': snapshot.name(index),
+                'skills': skills.split(',') if skills else []
+            })
+        preferences = defaultdict(lambda: defaultdict(list))
+        for index, date, start_time, end_time in snapshot.iter_preferences():
+            preferences[employees[index]['id']][date].append((start_time, end_time))
+        return employees, preferences
+
+    def copy_for_scenario(self):
+        # 読み込んだ従業員は共有したまま、必要人数の表・休日・生成結果を別に持つコピーを作る
+        # 希望シフトは従業員ごとの辞書を共有し、set_employee_preference で書き換えるときにその従業員の分だけ複製する
+        scenario = copy.copy(self)
+        scenario.preferences = defaultdict(lambda: defaultdict(list), self.preferences)
+        scenario.shared_preferences = set(self.preferences)
+        self.shared_preferences = set(self.preferences)
+        scenario.custom_holidays = set(self.custom_holidays)
+        scenario.min_employees = dict(self.min_employees)
+        scenario.max_employees = dict(self.max_employees)
+        scenario.strict_min_employees = dict(self.strict_min_employees)
+        scenario.strict_max_employees = dict(self.strict_max_employees)
+        scenario.preference_rates = dict(self.preference_rates)
+        scenario.shifts = defaultdict(lambda: defaultdict(list))
+        scenario.day_results = {}
+        scenario.day_warnings = {}
+        scenario.reporter = None
+        scenario.dirty_dates = set()
+        scenario.availability_cache = LRUCache(maxsize=self.availability_cache.maxsize)
+        # 候補者のキャッシュは入力が同じなので共有する（抽選結果を外す場合はバージョンを変える）
+        scenario.date_versions = dict(self.date_versions)
+        if self.preference_draws is not None:
+            scenario.inputs_version = new_version()
+        scenario.preference_draws = None
+        scenario.ledger_versions = {}
+        scenario.grouping_cache = LRUCache(maxsize=self.grouping_cache.maxsize)
+        return scenario
+
     def display_preference_rates(self):
         print("\n従業員別シフト希望反映率:")
         for emp in self.employees:
@@ -91,32 +204,63 @@ class ShiftGenerator:
                 if (pref_start.hour <= start_hour < pref_end.hour) or \
                     (pref_start.hour < end_hour <= pref_end.hour) or \
                     (start_hour <= pref_start.hour and pref_end.hour <= end_hour):
-                    # 希望反映率を考慮
-                    return random.randint(1, 100) <= self.preference_rates[employee['id']]
+                    # 希望反映率を考慮（draw_preference_acceptance で抽選済みの場合のみ）
+                    return self.is_preference_accepted(employee, date, start_hour)
         return False
+
+    def is_preference_accepted(self, employee, date, start_hour):
+        if self.preference_draws is None:
+            return True
+        draw_start, accepted, employee_index = self.preference_draws
+        day = (date - draw_start).days
+        shift_name = self.get_shift_name(start_hour)
+        if shift_name not in self.PREFERENCE_SLOTS or not 0 <= day < accepted.shape[1]:
+            return True
+        return bool(accepted[employee_index[employee['id']], day, self.PREFERENCE_SLOTS.index(shift_name)])
+
+    PREFERENCE_SLOTS = ['朝', '昼', '夜']
+
+    def draw_preference_acceptance(self, start_date, end_date, rng, replicates=1):
+        # 期間中の全従業員・全日・全シフトの希望採用の抽選を1回の NumPy 呼び出しでまとめて行う
+        # 戻り値は (replicates, 従業員, 日, シフト) の bool 配列
+        rates = np.array([self.preference_rates[emp['id']] for emp in self.employees])
+        days = (end_date - start_date).days + 1
+        draws = rng.integers(1, 101, size=(replicates, len(self.employees), days, len(self.PREFERENCE_SLOTS)))
+        return draws <= rates[None, :, None, None]
+
+    def set_preference_draws(self, start_date, accepted):
+        # draw_preference_acceptance の結果（1回分）を is_preferred_shift で使う。None で抽選なしに戻す
+        if accepted is None:
+            self.preference_draws = None
+        else:
+            self.preference_draws = (start_date, accepted, {emp['id']: i for i, emp in enumerate(self.employees)})
+        self.touch_inputs()
     # 他のメソッドは前回のコードと同じなので省略
     # 休日チェック関数
     def check_if_holiday(self, date):
+        # 期間のカレンダーがあればそれを引く
+        if self.calendar is not None and self.calendar.covers(date):
+            return self.calendar.is_busy(date) or date in self.custom_holidays
+
         # 土曜日（5）または日曜日（6）の場合
         if date.weekday() >= 5:
             return True
 
         # 祝日の場合
-        if date in self.jp_holidays:
+        if date in self.jp_holidays or date in self.custom_holidays:
             return True
 
         return False
 
     def assign_shift(self, date, shift_name, start_hour, end_hour):
-        available_employees = self.get_available_employees(date, start_hour, end_hour)
+        available_employees = [emp for emp in self.get_available_employees(date, start_hour, end_hour)
+                               if self.within_daily_hours(emp, date, start_hour, end_hour)]
         assigned_employees = []
 
-        required_cashiers = self.min_employees[shift_name]
-        if self.check_if_holiday(date):
-            required_cashiers += 2  # 土日祝は2人追加
+        required_cashiers = self.get_required_cashiers(date, shift_name)
 
         while len(assigned_employees) < required_cashiers and available_employees:
-            best_employee = self.select_best_employee(available_employees, date, start_hour, end_hour)
+            best_employee = self.select_best_employee(available_employees, date, start_hour, end_hour, len(assigned_employees))
             if best_employee:
                 assigned_employees.append({
                     'employee': best_employee,
@@ -125,12 +269,33 @@ class ShiftGenerator:
                     'break': self.calculate_break(start_hour, end_hour)
                 })
             available_employees.remove(best_employee)
-        
-            # 休憩回し用の追加従業員を割り当て
+
+        self.add_support_staff(date, start_hour, end_hour, assigned_employees, available_employees, required_cashiers)
+
+        if shift_name == '夜' and not any('冷蔵' in emp['employee']['skills'] for emp in assigned_employees):
+            return None, "夜シフトに冷蔵スキルを持つ従業員がいません"
+
+        return assigned_employees, None  # 警告メッセージがない場合はNone
+
+    def get_required_cashiers(self, date, shift_name):
+        required_cashiers = self.min_employees[shift_name]
+        if self.check_if_holiday(date):
+            required_cashiers += 2  # 土日祝は2人追加
+        return required_cashiers
+
+    def add_support_staff(self, date, start_hour, end_hour, assigned_employees, available_employees, required_cashiers,
+                          other_assignments=None):
+        # 休憩回し用の追加従業員を割り当て（assigned_employees に追加し、available_employees から除く）
+        # other_assignments はその日の他の枠の割り当て（省略時は self.shifts に記録済みのもの）
+        if other_assignments is None:
+            other_assignments = [emp for shift in self.shifts.get(date, {}).values() for emp in shift]
         additional_employees = min(2, len(available_employees))  # 最大2人まで追加
         for _ in range(additional_employees):
+            if self.break_aware_support and \
+                    self.count_on_floor(assigned_employees, start_hour, end_hour, other_assignments, date) >= required_cashiers:
+                break  # 休憩をずらして回せば必要人数を割らないので補助は不要
             if available_employees:
-                employee = self.select_best_employee(available_employees, date, start_hour, end_hour)
+                employee = self.select_best_employee(available_employees, date, start_hour, end_hour, len(assigned_employees))
                 assigned_employees.append({
                     'employee': employee,
                     'start': start_hour,
@@ -139,14 +304,148 @@ class ShiftGenerator:
                     'role': '補助'
                 })
                 available_employees.remove(employee)
-                
-        if shift_name == '夜' and not any('冷蔵' in emp['employee']['skills'] for emp in assigned_employees):
-            return None, "夜シフトに冷蔵スキルを持つ従業員がいません"
 
-        return assigned_employees, None  # 警告メッセージがない場合はNone
+    def assign_day_flow(self, date):
+        """
+        朝・昼・夜の割り当てを最小費用流でまとめて決める（day_engine='flow' の場合）
+
+        score_employee の点数を費用にし、夜の冷蔵スキル1人 > 埋まる席の数 > 点数の合計 の順に最適な割り当てを求める。
+        enforce_daily_hours の場合は1日の上限時間（MAX_DAILY_HOURS）に入る数までしか時間帯を掛け持ちさせない
+        （貪欲法も同じ上限で候補を絞るので、2つの方法は同じ問題を解く）。
+        休憩回し用の補助は、決まった割り当てに対して貪欲法と同じ方法で追加する。
+
+        :return: {シフト名: (割り当て, 警告)}（assign_shift と同じ形式）
+        """
+        slots = {shift_name: self.get_shift_hours(shift_name) for shift_name in ['朝', '昼', '夜']}
+        available = {shift_name: self.get_available_employees(date, start_hour, end_hour)
+                     for shift_name, (start_hour, end_hour) in slots.items()}
+        employees_by_id = {emp['id']: emp for emp in self.employees}
+
+        scores = {}
+        durations = defaultdict(list)
+        for shift_name, (start_hour, end_hour) in slots.items():
+            for emp in available[shift_name]:
+                # 人数による増減は同じ時間帯の全員に同じだけかかるので、0人として計算する
+                scores[(emp['id'], shift_name)] = self.score_employee(emp, date, start_hour, end_hour, 0)
+                durations[emp['id']].append(end_hour - start_hour)
+        capacity = {emp_id: slot_capacity(hours, self.MAX_DAILY_HOURS) if self.enforce_daily_hours else len(hours)
+                    for emp_id, hours in durations.items()}
+        required = {shift_name: self.get_required_cashiers(date, shift_name) for shift_name in slots}
+        chosen = assign_day({shift_name: [emp['id'] for emp in emps] for shift_name, emps in available.items()},
+                            scores, required, capacity,
+                            {emp['id']: set(emp['skills']) for emp in self.employees}, {('夜', '冷蔵'): 1})
+
+        daily_hours = defaultdict(int)
+        for shift_name, emp_ids in chosen.items():
+            start_hour, end_hour = slots[shift_name]
+            for emp_id in emp_ids:
+                daily_hours[emp_id] += end_hour - start_hour
+
+        assigned = {shift_name: [{
+            'employee': employees_by_id[emp_id],
+            'start': start_hour,
+            'end': end_hour,
+            'break': self.calculate_break(start_hour, end_hour)
+        } for emp_id in chosen[shift_name]] for shift_name, (start_hour, end_hour) in slots.items()}
+
+        results = {}
+        for shift_name, (start_hour, end_hour) in slots.items():
+            assigned_employees = assigned[shift_name]
+            remaining = [emp for emp in available[shift_name] if emp['id'] not in chosen[shift_name]
+                         and (not self.enforce_daily_hours
+                              or daily_hours[emp['id']] + (end_hour - start_hour) <= self.MAX_DAILY_HOURS)]
+            # 休憩は他の枠と結合したシフトで決まるので、他の枠の割り当て（先に足した補助も含む）も渡す
+            others = [emp for other, emps in assigned.items() if other != shift_name for emp in emps]
+            self.add_support_staff(date, start_hour, end_hour, assigned_employees, remaining, required[shift_name], others)
+            for emp in assigned_employees[len(chosen[shift_name]):]:
+                daily_hours[emp['employee']['id']] += end_hour - start_hour
+
+            if shift_name == '夜' and not any('冷蔵' in emp['employee']['skills'] for emp in assigned_employees):
+                results[shift_name] = (None, "夜シフトに冷蔵スキルを持つ従業員がいません")
+            else:
+                results[shift_name] = (assigned_employees, None)
+        return results
 
 
 
+    def add_break_cover(self, date, warnings):
+        # 1日の割り当てが決まった後で、結合したシフトの休憩を置くと必要人数を割る枠に補助を足す
+        # 枠ごとに判定した時点では後の枠で勤務が延びて休憩が長くなることがわからないので、最後にもう一度確認する。
+        # 枠ごとの補助は add_support_staff と合わせて2人まで。足した補助の警告は warnings に追加する
+        # 補助を足してその日の勤務が1日の上限時間（MAX_DAILY_HOURS）を超える人は候補にしない（within_daily_hours）
+        changed = True
+        while changed:
+            changed = False
+            for shift_name in ['朝', '昼', '夜']:
+                start_hour, end_hour = self.get_shift_hours(shift_name)
+                assigned_employees = self.shifts[date][shift_name]
+                if not assigned_employees:
+                    continue  # 割り当てなし（夜の冷蔵スキル不足）の枠はそのまま
+                support = sum(1 for emp in assigned_employees if emp.get('role') == '補助')
+                if support >= 2:
+                    continue
+                others = [emp for other, shift in self.shifts[date].items() if other != shift_name for emp in shift]
+                if self.count_on_floor(assigned_employees, start_hour, end_hour, others, date) >= \
+                        self.get_required_cashiers(date, shift_name):
+                    continue
+                assigned_ids = {emp['employee']['id'] for emp in assigned_employees}
+                candidates = [emp for emp in self.get_available_employees(date, start_hour, end_hour)
+                              if emp['id'] not in assigned_ids and self.within_daily_hours(emp, date, start_hour, end_hour)]
+                if not candidates:
+                    continue
+                employee = self.select_best_employee(candidates, date, start_hour, end_hour, len(assigned_employees))
+                support_staff = {
+                    'employee': employee,
+                    'start': start_hour,
+                    'end': end_hour,
+                    'break': self.calculate_break(start_hour, end_hour),
+                    'role': '補助'
+                }
+                if self.collect_warnings:
+                    warnings.extend(self.collect_shift_warnings(date, shift_name, [support_staff]))
+                assigned_employees.append(support_staff)
+                self.touch_ledger(date)
+                changed = True
+
+    def within_daily_hours(self, employee, date, start_hour, end_hour):
+        # enforce_daily_hours の場合、この枠を足してもその日の勤務が MAX_DAILY_HOURS 以内に収まるか
+        return not self.enforce_daily_hours or \
+            self.calculate_daily_hours(employee, date) + (end_hour - start_hour) <= self.MAX_DAILY_HOURS
+
+    def collect_shift_warnings(self, date, shift_name, assigned_employees):
+        start_hour, end_hour = self.get_shift_hours(shift_name)
+        warnings = []
+        for emp in assigned_employees:
+            messages = self.check_shift_extension(emp['employee'], date, start_hour, end_hour)
+            if messages:
+                warnings.append((date, shift_name, emp['employee']['id'], messages))
+        return warnings
+
+    def count_on_floor(self, assigned_employees, start_hour, end_hour, other_assignments=(), date=None):
+        # 休憩をずらして配置したときに、枠の時間帯を通して売り場に必ずいる人数
+        # 実際の休憩は枠ごとの 'break' ではなく、同じ日の枠を結合したシフトの長さで決まる
+        # （calculate_break_after_merge）。3時間の枠でも前後の枠と続けば休憩が入るので、
+        # 従業員ごとに結合したシフトで1日分の休憩を配置してから、この枠の時間帯の最少人数を求める
+        # date を指定した場合は、各枠の必要人数（get_required_cashiers）に対する余裕が最も少ない時間が
+        # できるだけ多くなるように置く。どの枠について聞いても同じ配置になる
+        by_employee = defaultdict(list)
+        for emp in [*other_assignments, *assigned_employees]:
+            by_employee[emp['employee']['id']].append(emp)
+        shifts = []
+        for emp_shifts in by_employee.values():
+            for merged in self.merge_shifts(emp_shifts):
+                shifts.append((len(shifts), merged['start'] * 60, merged['end'] * 60,
+                               self.calculate_break_after_merge(merged['start'], merged['end'])))
+        day_start = min([start for _, start, _, _ in shifts] + [start_hour * 60])
+        day_end = max([end for _, _, end, _ in shifts] + [end_hour * 60])
+        demand = None
+        if date is not None:
+            required = {shift_name: self.get_required_cashiers(date, shift_name) for shift_name in ['朝', '昼', '夜']}
+            demand = [required.get(self.get_shift_name(minute // 60), 0)
+                      for minute in range(day_start, day_end, BUCKET_MINUTES)]
+        return minimum_on_floor(shifts, start_hour * 60, end_hour * 60, day_start=day_start, day_end=day_end,
+                                demand=demand)
+
     def get_shift_name(self, hour):
           if 5 <= hour < 9:
               return '早朝'
@@ -159,10 +458,21 @@ class ShiftGenerator:
           else:
               return '深夜'
 
+    def get_shift_hours(self, shift_name):
+        # get_shift_name と同じ区切りで各シフトの開始・終了時刻を返す
+        shift_hours = {
+            '早朝': (5, 9),
+            '朝': (9, 14),
+            '昼': (14, 17),
+            '夜': (17, 20),
+        }
+        return shift_hours[shift_name]
+
     def get_employee_preferred_time(self, employee, date, start_hour, end_hour):
         if employee['id'] in self.preferences and date in self.preferences[employee['id']]:
             for pref_start, pref_end in self.preferences[employee['id']][date]:
-                print(f"Checking preference for {employee['name']} on {date}: {pref_start} - {pref_end}")
+                if self.reporter:
+                    self.reporter.write(f"Checking preference for {employee['name']} on {date}: {pref_start} - {pref_end}")
                 if pref_start.hour <= start_hour and pref_end.hour >= end_hour:
                     return start_hour, end_hour
                 elif pref_start.hour <= start_hour < pref_end.hour:
@@ -183,13 +493,74 @@ class ShiftGenerator:
                     return max(start_hour, pref_start.hour), end_hour
         return start_hour, end_hour
 
+    def get_input_version(self, date):
+        return (self.inputs_version, self.date_versions.get(date, 0))
+
+    def touch_inputs(self, date=None):
+        # 入力が変わったことを記録する。date を省略すると全日付のキャッシュが無効になる
+        if date is None:
+            self.inputs_version = new_version()
+        else:
+            self.date_versions[date] = new_version()
+
+    def touch_ledger(self, date):
+        # その日のシフトが変わったことを記録する
+        self.ledger_versions[date] = new_version()
+
     def get_available_employees(self, date, start_hour, end_hour):
-        available_employees = []
-        for emp in self.employees:
-            if self.is_employee_available(emp, date, start_hour, end_hour):
-                available_employees.append(emp)
-        return available_employees
+        # 呼び出し側がリストを書き換えるので、キャッシュには添字だけを持ち毎回新しいリストを返す
+        if self.use_availability_matrix:
+            # 行列での判定はその日の割り当てにも依存する
+            key = ('matrix', date, start_hour, end_hour, self.get_input_version(date), self.ledger_versions.get(date, 0))
+            indexes = self.candidate_cache.get_or_compute(key, lambda: tuple(self.get_day_availability(date).candidate_mask(
+                start_hour * 60, end_hour * 60, max_daily_minutes=self.MAX_DAILY_HOURS * 60).nonzero()[0]))
+        else:
+            key = ('available', date, start_hour, end_hour, self.get_input_version(date))
+            indexes = self.candidate_cache.get_or_compute(key, lambda: tuple(
+                i for i, emp in enumerate(self.employees) if self.is_employee_available(emp, date, start_hour, end_hour)))
+        return [self.employees[i] for i in indexes]
+
+    def get_static_scores(self, date, start_hour, end_hour):
+        # score_employee のうち割り当て状況に依存しない部分（希望度とスキル）を従業員IDごとに返す
+        key = ('static', date, start_hour, end_hour, self.get_input_version(date))
+        return self.candidate_cache.get_or_compute(key, lambda: {
+            emp['id']: self.calculate_static_score(emp, date, start_hour, end_hour) for emp in self.employees})
+
+    def calculate_static_score(self, employee, date, start_hour, end_hour):
+        score = 0
+
+        # シフト希望度のスコア
+        if self.is_preferred_shift(employee, date, start_hour, end_hour):
+            score += 100
+
+        # スキルマッチ度のスコア
+        if '冷蔵' in employee['skills']:
+            score += 30  # 冷蔵スキルを持つ従業員を優先
+        if 'レジ' in employee['skills']:
+            score += 20
+        if '品出し' in employee['skills']:
+            score += 20
+        return score
+
+
+    def get_day_availability(self, date):
+        # その日の希望シフトから行列を作り（日付ごとに直近のものだけキャッシュ）、割り当ては self.shifts から詰め直す
+        matrix = self.availability_cache.get_or_compute(date, lambda: self.build_day_availability(date))
+        matrix.clear_assignments()
+        if date in self.shifts:
+            for shift in self.shifts[date].values():
+                for emp in shift:
+                    matrix.assign(emp['employee']['id'], emp['start'] * 60, emp['end'] * 60)
+        return matrix
 
+    def build_day_availability(self, date):
+        matrix = DayAvailability([emp['id'] for emp in self.employees],
+                                 [skill_mask(emp['skills']) for emp in self.employees])
+        for emp in self.employees:
+            for pref_start, pref_end in self.preferences.get(emp['id'], {}).get(date, []):
+                matrix.set_available(emp['id'], pref_start.hour * 60 + pref_start.minute,
+                                     pref_end.hour * 60 + pref_end.minute)
+        return matrix
 
     def is_employee_available(self, employee, date, start_hour, end_hour):
         if employee['id'] in self.preferences and date in self.preferences[employee['id']]:
@@ -233,7 +604,7 @@ class ShiftGenerator:
     def check_minimum_rest(self, employee, date, start_hour, end_hour):
         previous_shift_end = self.get_previous_shift_end(employee, date)
         if previous_shift_end is not None:
-            rest_hours = start_hour - previous_shift_end
+            rest_hours = start_hour + 24 - previous_shift_end
             if rest_hours < 11:  # 最小11時間の休憩
                 return False
         return True
@@ -245,6 +616,8 @@ class ShiftGenerator:
                 for emp in shift:
                     if emp['employee']['id'] == employee['id']:
                         return emp['end']
+        elif employee['id'] in self.carry_over and self.carry_over[employee['id']]['last_date'] == previous_date:
+            return self.carry_over[employee['id']]['last_end']
         return None
 
     def check_employee_preference(self, employee, date, start_hour, end_hour):
@@ -266,30 +639,10 @@ class ShiftGenerator:
 
         return max(scored_employees, key=lambda x: x[1])[0] if scored_employees else None
 
-    def is_preferred_shift(self, employee, date, start_hour, end_hour):
-        if employee['id'] in self.preferences and date in self.preferences[employee['id']]:
-            for pref_start, pref_end in self.preferences[employee['id']][date]:
-                if (pref_start.hour <= start_hour < pref_end.hour) or \
-                    (pref_start.hour < end_hour <= pref_end.hour) or \
-                    (start_hour <= pref_start.hour and pref_end.hour <= end_hour):
-                    return True
-        return False
-
 
     def score_employee(self, employee, date, start_hour, end_hour, current_assigned):
-        score = 0
-
-        # シフト希望度のスコア
-        if self.is_preferred_shift(employee, date, start_hour, end_hour):
-            score += 100
-
-        # スキルマッチ度のスコア
-        if '冷蔵' in employee['skills']:
-            score += 30  # 冷蔵スキルを持つ従業員を優先
-        if 'レジ' in employee['skills']:
-            score += 20
-        if '品出し' in employee['skills']:
-            score += 20
+        # シフト希望度とスキルマッチ度のスコア
+        score = self.get_static_scores(date, start_hour, end_hour)[employee['id']]
 
         # 労働時間バランスのスコア
         weekly_hours = self.calculate_weekly_hours(employee, date)
@@ -383,20 +736,70 @@ class ShiftGenerator:
       while current_date in self.shifts and any(emp['employee']['id'] == employee['id'] for shift in self.shifts[current_date].values() for emp in shift):
           count += 1
           current_date -= datetime.timedelta(days=1)
+      # 今回生成していない日までさかのぼったら前回の実行から引き継いだ連続勤務日数を足す
+      if current_date not in self.shifts and employee['id'] in self.carry_over:
+          state = self.carry_over[employee['id']]
+          if state['last_date'] == current_date:
+              count += state['streak']
       return count
 
     def calculate_weekly_hours(self, employee, date):
+        # 週の初めから date までの勤務時間（date より後の日は、生成済みでも数えない。
+        # 後から1日だけ作り直した場合も、最初から順に生成した場合と同じ値になるようにする）
         hours = 0
         start_of_week = date - datetime.timedelta(days=date.weekday())
-        for day in range(7):
+        carried_hours = self.carry_over[employee['id']]['hours'] if employee['id'] in self.carry_over else {}
+        for day in range(date.weekday() + 1):
             current_date = start_of_week + datetime.timedelta(days=day)
             if current_date in self.shifts:
                 for shift in self.shifts[current_date].values():
                     for emp in shift:
                         if emp['employee']['id'] == employee['id']:
                             hours += emp['end'] - emp['start']
+            else:
+                hours += carried_hours.get(current_date, 0)
         return hours
 
+    def get_carry_over(self, end_date):
+        # end_date までの直近7日間の勤務時間・連続勤務日数・最終シフトの終了時刻を従業員ごとにまとめる
+        window = [end_date - datetime.timedelta(days=n) for n in range(6, -1, -1)]
+        hours = defaultdict(dict)
+        last_end = {}
+        for date in window:
+            if date not in self.shifts:
+                continue
+            for shift in self.shifts[date].values():
+                for emp in shift:
+                    emp_id = emp['employee']['id']
+                    hours[emp_id][date] = hours[emp_id].get(date, 0) + emp['end'] - emp['start']
+                    if date == end_date:
+                        last_end[emp_id] = max(last_end.get(emp_id, 0), emp['end'])
+
+        next_date = end_date + datetime.timedelta(days=1)
+        states = {}
+        for emp in self.employees:
+            emp_hours = hours.get(emp['id'], {})
+            # 期間内に勤務がなければ前回から引き継いだ分をそのまま残す
+            for date, carried in self.carry_over.get(emp['id'], {}).get('hours', {}).items():
+                if date not in self.shifts and date >= window[0]:
+                    emp_hours.setdefault(date, carried)
+            states[emp['id']] = {
+                'last_date': end_date,
+                'streak': self.count_consecutive_days(emp, next_date),
+                'last_end': last_end.get(emp['id']),
+                'hours': emp_hours,
+            }
+        return states
+
+    def save_carry_over(self, store, end_date):
+        # 次回の実行に引き継ぐ勤務状況を保存する
+        store.write_carry_over(self.get_carry_over(end_date))
+
+    def load_carry_over(self, store):
+        # 前回の実行で保存した勤務状況を読み込む（従業員数に比例する時間で済む）
+        self.carry_over = store.read_carry_over()
+        return self.carry_over
+
     MAX_DAILY_HOURS = 8
     MAX_WEEKLY_HOURS = 40
     MAX_CONSECUTIVE_DAYS = 5
@@ -430,6 +833,9 @@ class ShiftGenerator:
         else:
             return 0
 
+    def calculate_break(self, start_hour, end_hour):
+        return self.calculate_break_after_merge(start_hour, end_hour)
+
     def calculate_daily_hours(self, employee, date):
         hours = 0
         if date in self.shifts:
@@ -448,60 +854,304 @@ class ShiftGenerator:
                     all_preferences.add((start.hour, end.hour))
         return sorted(all_preferences)
 
+    def minimum_unavoidable_shortage(self, date, labor_rules=True):
+        """
+        割り当てる前に、朝・昼・夜でどう割り当てても避けられない不足人数を求める
+
+        希望シフトから各時間帯に入れる従業員を求め、最大流で必要人数（min_employees）と
+        夜の冷蔵スキル1人をどこまで満たせるかを調べる。
+        labor_rules=True の場合は1日・1週間の上限時間と連続勤務日数も守る前提で求める。
+        貪欲法はこれらを点数で扱うだけなので、generate_day の結果と比べる場合は False にする。
+
+        :param date: 日付（その日の割り当てを行う前に呼ぶ）
+        :return: FeasibilityReport
+        """
+        slots = {shift_name: self.get_shift_hours(shift_name) for shift_name in ['朝', '昼', '夜']}
+        available = {shift_name: {emp['id'] for emp in self.get_available_employees(date, start_hour, end_hour)}
+                     for shift_name, (start_hour, end_hour) in slots.items()}
+        capacity = {}
+        for emp in self.employees:
+            if not labor_rules:
+                capacity[emp['id']] = len(slots)
+            elif self.count_consecutive_days(emp, date) >= self.MAX_CONSECUTIVE_DAYS:
+                capacity[emp['id']] = 0
+            else:
+                budget = min(self.MAX_DAILY_HOURS, self.MAX_WEEKLY_HOURS - self.calculate_weekly_hours(emp, date))
+                durations = [end_hour - start_hour for shift_name, (start_hour, end_hour) in slots.items()
+                             if emp['id'] in available[shift_name]]
+                capacity[emp['id']] = slot_capacity(durations, budget)
+        required = {shift_name: self.min_employees[shift_name] for shift_name in slots}
+        return analyze_day(available, required, capacity,
+                           {emp['id']: set(emp['skills']) for emp in self.employees}, {('夜', '冷蔵'): 1})
+
     #シフト生成
-    def generate_shifts(self, start_date: datetime.date, end_date: datetime.date):
-        for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1)):
-            print(f"Date: {date}")
-            for shift_name in ['朝', '昼', '夜']:
-                start_hour, end_hour = self.get_shift_hours(shift_name)
+    def generate_day(self, date):
+        # 1日分のシフトを作り直して self.shifts と self.day_results に記録する
+        self.shifts[date] = defaultdict(list)
+        self.touch_ledger(date)
+        shortages = defaultdict(int)
+        skill_shortages = defaultdict(int)
+        warnings = []
+        report = self.minimum_unavoidable_shortage(date, labor_rules=False) if self.skip_infeasible_slots else None
+        day_assignments = self.assign_day_flow(date) if self.day_engine == 'flow' else None
+        for shift_name in ['朝', '昼', '夜']:
+            start_hour, end_hour = self.get_shift_hours(shift_name)
+            if report and report.skill_shortages.get((shift_name, '冷蔵')):
+                # 冷蔵スキルを持つ人が誰も入れないので、割り当てても結果は割り当てなしになる
+                assigned_employees, warning = [], "夜シフトに冷蔵スキルを持つ従業員がいません"
+            elif day_assignments is not None:
+                assigned_employees, warning = day_assignments[shift_name]
+            else:
                 assigned_employees, warning = self.assign_shift(date, shift_name, start_hour, end_hour)
-                
-                if warning:
-                    print(f"  {shift_name}の警告: {warning}")
-                elif len(assigned_employees) < self.min_employees[shift_name]:
-                    shortage = self.min_employees[shift_name] - len(assigned_employees)
-                    print(f"  {shift_name}の警告: {shortage}人不足しています")
-                
-                # シフトの表示
-                print(f"  {shift_name} shift: {len(assigned_employees)} employees assigned")
-                for emp in assigned_employees:
-                    print(f"    {emp['employee']['name']}: {emp['start']}:00 - {emp['end']}:00 (休憩: {emp['break']}分)")
-            print()
-
+            if warning:
+                # 夜シフトに冷蔵スキル持ちがいない場合は割り当てなしになる
+                assigned_employees = []
+                skill_shortages[f'{shift_name}_冷蔵'] = 1
+            if self.collect_warnings:
+                # 労働時間・連続勤務・休憩間隔の警告（この枠を入れる前の状態で判定する）
+                warnings.extend(self.collect_shift_warnings(date, shift_name, assigned_employees))
+            self.shifts[date][shift_name] = assigned_employees
+            self.touch_ledger(date)
+        if self.break_aware_support:
+            self.add_break_cover(date, warnings)
+        for shift_name in ['朝', '昼', '夜']:
+            assigned_count = len(self.shifts[date][shift_name])
+            if assigned_count < self.min_employees[shift_name]:
+                shortages[shift_name] = self.min_employees[shift_name] - assigned_count
+        self.day_results[date] = (shortages, skill_shortages)
+        self.day_warnings[date] = warnings
+        self.dirty_dates.discard(date)
+        return self.shifts[date], shortages, skill_shortages
+
+    def iter_shifts(self, start_date: datetime.date, end_date: datetime.date, window_days=7):
+        # 1日ずつシフトを確定させて (日付, その日のシフト, 人員不足, スキル不足) を順に返す
+        # window_days 日より前の割り当ては self.shifts から捨てる（連続勤務日数と勤務時間は carry_over に残すので
+        # 結果は全期間を保持した場合と同じになる）。window_days=None の場合は全期間を保持する
+        self.use_calendar(start_date, end_date)
+        for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1)):
+            day_shifts, shortages, skill_shortages = self.generate_day(date)
+
+            yield date, day_shifts, shortages, skill_shortages
+
+            if window_days is not None:
+                self.trim_history(date - datetime.timedelta(days=window_days - 1))
+
+    def trim_history(self, oldest):
+        # oldest より前の日付の割り当てと、日付ごとのバージョン・キャッシュを捨てる
+        # 捨てる日までの連続勤務日数・直近7日間の勤務時間・最終シフトの終了時刻は carry_over にまとめておく
+        old_dates = [d for d in self.shifts if d < oldest]
+        if not old_dates:
+            return
+        self.carry_over = self.get_carry_over(oldest - datetime.timedelta(days=1))
+        for old_date in old_dates:
+            del self.shifts[old_date]
+            self.day_results.pop(old_date, None)
+            self.day_warnings.pop(old_date, None)
+            self.ledger_versions.pop(old_date, None)
+            self.date_versions.pop(old_date, None)
+            self.availability_cache.discard(old_date)
+            self.dirty_dates.discard(old_date)
+        # バージョンを捨てた日付のキャッシュが後で同じバージョン（0）として引かれないように一緒に捨てる
+        self.candidate_cache.discard_if(lambda key: key[1] < oldest)
+        self.grouping_cache.discard_if(lambda key: key[0] < oldest)
+
+    def mark_dirty(self, date):
+        # 生成済みの日付なら再生成の対象にする
+        if date in self.shifts:
+            self.dirty_dates.add(date)
+
+    def set_employee_preference(self, employee_id, date, intervals):
+        # 従業員の希望シフトを差し替える。intervals は (開始time, 終了time) のリスト
+        if employee_id in self.shared_preferences:
+            # copy_for_scenario の元と共有している辞書は書き換えずに複製する
+            self.preferences[employee_id] = defaultdict(list, self.preferences[employee_id])
+            self.shared_preferences.discard(employee_id)
+        self.preferences[employee_id][date] = list(intervals)
+        self.availability_cache.discard(date)
+        self.touch_inputs(date)
+        self.mark_dirty(date)
+
+    def add_holiday(self, date):
+        self.custom_holidays.add(date)
+        self.mark_dirty(date)
+
+    def remove_holiday(self, date):
+        self.custom_holidays.discard(date)
+        self.mark_dirty(date)
+
+    def set_staffing(self, shift_name, min_employees=None, max_employees=None):
+        # 必要人数の表を変更する。全ての生成済みの日に影響する
+        if min_employees is not None:
+            self.min_employees[shift_name] = min_employees
+        if max_employees is not None:
+            self.max_employees[shift_name] = max_employees
+        for date in self.shifts:
+            self.mark_dirty(date)
+
+    def get_day_work(self, date):
+        # その日の従業員ごとの (シフト名, 開始, 終了) の並び（regenerate_dirty で前後の割り当てを比べる）
+        work = defaultdict(list)
+        for shift_name, shift in self.shifts[date].items():
+            for emp in shift:
+                work[emp['employee']['id']].append((shift_name, emp['start'], emp['end']))
+        return dict(work)
+
+    def regenerate_dirty(self):
+        # 入力が変わった日を作り直し、結果が最初から順に生成した場合と同じになるように後ろの日へ伝える
+        # 各日の割り当ては、その日の入力と「前日までの週間労働時間・連続勤務日数・前日の終了時刻」だけで決まる。
+        # 作り直した日より後ろは日付順に見ていき、これらが変わった従業員がいる日だけを作り直す。
+        # どの従業員も変わらなくなり、後ろに入力が変わった日もなければそこで止める
+        regenerated = []
+        if not self.dirty_dates:
+            return regenerated
+        first_dirty, last_dirty = min(self.dirty_dates), max(self.dirty_dates)
+        week_changed = set()  # この週の勤務時間が作り直す前と違う従業員
+        streak_changed = set()  # 連続勤務日数が作り直す前と違う従業員
+        rest_changed = set()  # 前日の終了時刻が作り直す前と違う従業員
+        week = None
+        previous = None
+        for date in sorted(d for d in self.shifts if d >= first_dirty):
+            monday = date - datetime.timedelta(days=date.weekday())
+            if monday != week:
+                week = monday
+                week_changed = set()
+            if previous is None or date - previous != datetime.timedelta(days=1):
+                # 間の日が生成されていなければ連続勤務・休憩間隔は前の日とつながらない
+                streak_changed = set()
+                rest_changed = set()
+            previous = date
+
+            if date not in self.dirty_dates and not (week_changed or streak_changed or rest_changed):
+                if date > last_dirty:
+                    break
+                continue
+
+            before = self.get_day_work(date)
+            self.generate_day(date)
+            after = self.get_day_work(date)
+            regenerated.append(date)
+
+            rest_changed = set()
+            for emp_id in before.keys() | after.keys():
+                old, new = before.get(emp_id, []), after.get(emp_id, [])
+                if old == new:
+                    continue
+                rest_changed.add(emp_id)
+                if sum(end - start for _, start, end in old) != sum(end - start for _, start, end in new):
+                    week_changed.add(emp_id)
+                if bool(old) != bool(new):
+                    streak_changed.add(emp_id)
+            # 作り直す前後ともこの日に勤務のない従業員は、連続勤務日数がどちらも0に戻る
+            streak_changed &= before.keys() | after.keys()
+        return regenerated
+
+    def generate_shifts(self, start_date: datetime.date, end_date: datetime.date, reporter=None, quiet=False, check_warnings=True):
+        # 期間のシフトを生成して ShiftResult で返す
+        # quiet=True かつ reporter なしの場合は表示用の文字列を一切作らない
+        if reporter is None and not quiet:
+            reporter = ShiftReporter()
+        self.reporter = reporter
+        self.collect_warnings = check_warnings
+        result = ShiftResult()
+        try:
+            for date, day_shifts, day_shortages, day_skill_shortages in self.iter_shifts(start_date, end_date, window_days=None):
+                warnings = self.day_warnings.get(date, [])
+                result.add_day(date, day_shifts, day_shortages, day_skill_shortages, warnings)
+                if reporter:
+                    reporter.report_day(date, day_shifts, day_shortages, day_skill_shortages, warnings)
+        finally:
+            self.collect_warnings = False
+            if reporter:
+                reporter.flush()
+        return result
+
+    def get_assignment_rows(self, date, day_shifts):
+        # 1日分のシフトを (日付, 従業員ID, 名前, シフト名, 開始分, 終了分, 休憩分) の行に変換する
+        rows = []
+        for shift_name, employees in day_shifts.items():
+            for emp in employees:
+                rows.append((date, emp['employee']['id'], emp['employee']['name'], shift_name,
+                             emp['start'] * 60, emp['end'] * 60, emp['break']))
+        return rows
+
+    def get_roster_rows(self):
+        # 従業員を (従業員ID, 名前, スキルの文字列) の行にする（CSV の skills 列と同じカンマ区切り）
+        return [(emp['id'], emp['name'], ','.join(emp['skills'])) for emp in self.employees]
+
+    def save_schedule(self, store, start_date, end_date, shortages, skill_shortages):
+        # 生成済みのシフトを ScheduleStore に1トランザクションで保存する
+        days = ((date, self.get_assignment_rows(date, self.shifts[date]),
+                 shortage_rows(shortages.get(date, {}), skill_shortages.get(date, {})))
+                for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1))
+                if date in self.shifts)
+        return store.write_run(start_date, end_date, days)
+
+    def load_schedule(self, store, start_date, end_date):
+        # ScheduleStore から self.shifts を復元する（再生成はしない）
+        employees_by_id = {emp['id']: emp for emp in self.employees}
+        for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1)):
+            self.shifts.pop(date, None)
+        for date, emp_id, name, shift_name, start, end, break_time in store.read_assignments(start_date, end_date):
+            employee = employees_by_id.get(emp_id, {'id': emp_id, 'name': name, 'skills': []})
+            self.shifts[date][shift_name].append({
+                'employee': employee,
+                'start': start // 60,
+                'end': end // 60,
+                'break': break_time
+            })
+        for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1)):
+            self.touch_ledger(date)
+        shortages, skill_shortages = store.read_shortages(start_date, end_date)
+        return self.shifts, shortages, skill_shortages
 
     def get_day_of_week(self, date):
         days = ["月", "火", "水", "木", "金", "土", "日"]
+        if self.calendar is not None and self.calendar.covers(date):
+            return days[self.calendar.get_weekday(date)]
         return days[date.weekday()]
 
-    def display_shifts(self, start_date, end_date):
-        print("\n生成されたシフト:")
+    def use_calendar(self, start_date, end_date):
+        # 期間を含むカレンダーがなければ作る（同じ年の範囲なら前回の実行のものを使い回す）
+        if self.calendar is None or not (self.calendar.covers(start_date) and self.calendar.covers(end_date)):
+            self.calendar = get_calendar(start_date, end_date)
+        return self.calendar
+
+    def display_shifts(self, start_date, end_date, reporter=None):
+        reporter = reporter or ShiftReporter()
+        reporter.write("\n生成されたシフト:")
         for date in (start_date + datetime.timedelta(n) for n in range((end_date - start_date).days + 1)):
             if date in self.shifts:
-                print(f"\n日付: {date.strftime('%Y-%m-%d')} ({self.get_day_of_week(date)})")
-
-                all_shifts = []
-                for shift_name in ['朝', '昼', '夜']:
-                    if shift_name in self.shifts[date]:
-                        all_shifts.extend(self.shifts[date][shift_name])
-
-                employee_shifts = {}
-                for shift in all_shifts:
-                    emp_id = shift['employee']['id']
-                    if emp_id not in employee_shifts:
-                        employee_shifts[emp_id] = []
-                    employee_shifts[emp_id].append(shift)
+                reporter.write(f"\n日付: {date.strftime('%Y-%m-%d')} ({self.get_day_of_week(date)})")
 
-                for emp_id, shifts in employee_shifts.items():
-                    emp_name = shifts[0]['employee']['name']
-                    print(f"  {emp_name}:")
-
-                    merged_shifts = self.merge_shifts(shifts)
+                for emp_name, merged_shifts in self.get_employee_day_shifts(date):
+                    reporter.write(f"  {emp_name}:")
                     for shift in merged_shifts:
                         break_time = self.calculate_break_after_merge(shift['start'], shift['end'])
-                        print(f"    {shift['start']:02d}:00 - {shift['end']:02d}:00 (休憩: {break_time}分)")
+                        reporter.write(f"    {shift['start']:02d}:00 - {shift['end']:02d}:00 (休憩: {break_time}分)")
             else:
-                print(f"\n日付: {date.strftime('%Y-%m-%d')} ({self.get_day_of_week(date)}) - シフトなし")           
-    
+                reporter.write(f"\n日付: {date.strftime('%Y-%m-%d')} ({self.get_day_of_week(date)}) - シフトなし")
+        reporter.flush()
+
+    def get_employee_day_shifts(self, date):
+        # その日のシフトを従業員ごとにまとめて結合したもの。シフトが変わるまでキャッシュする
+        key = (date, self.ledger_versions.get(date, 0))
+        return self.grouping_cache.get_or_compute(key, lambda: self.group_employee_shifts(date))
+
+    def group_employee_shifts(self, date):
+        all_shifts = []
+        for shift_name in ['朝', '昼', '夜']:
+            if shift_name in self.shifts[date]:
+                all_shifts.extend(self.shifts[date][shift_name])
+
+        employee_shifts = {}
+        for shift in all_shifts:
+            emp_id = shift['employee']['id']
+            if emp_id not in employee_shifts:
+                employee_shifts[emp_id] = []
+            employee_shifts[emp_id].append(shift)
+
+        return [(shifts[0]['employee']['name'], self.merge_shifts(shifts)) for shifts in employee_shifts.values()]
+
     def merge_shifts(self, shifts):
         if not shifts:
             return []
@@ -1,8 +1,13 @@
 import pandas as pd
 import csv
+import copy
 import datetime
 from collections import defaultdict
 import holidays
+from shift_store import shortage_rows
+from shift_calendar import get_calendar
+from shift_coverage import place_breaks
+from shift_snapshot import load_snapshot
 
 class Employee:
     def __init__(self, id, name, register_skill, refrigeration_skill, stocking_skill, preferences):
@@ -38,11 +43,17 @@ class Shift:
             return 45
 
 class ShiftGenerator:
-    def __init__(self, csv_file):
+    def __init__(self, csv_file, snapshot_file=None, shared_inputs=None):
         self.employees = []  # 従業員リスト
         self.preferences = defaultdict(lambda: defaultdict(list))  # 従業員の希望シフト
-        self.load_data(csv_file)  # CSVファイルからデータを読み込む
+        if shared_inputs is not None:
+            self.load_data_arrays(shared_inputs)  # 共有メモリの配列（shift_shared.SharedInputs）から読み込む
+        elif snapshot_file:
+            self.load_data_snapshot(csv_file, snapshot_file)  # バイナリのスナップショットから読み込む（古ければ作り直す）
+        else:
+            self.load_data(csv_file)  # CSVファイルからデータを読み込む
         self.jp_holidays = holidays.JP()  # 日本の祝日カレンダー
+        self.calendar = None  # 生成期間の曜日・祝日をまとめたカレンダー（use_calendar で設定）
         
         # 時間帯ごとの必要人数（平日, 土日祝）
         self.required_staff = {
@@ -65,6 +76,19 @@ class ShiftGenerator:
             'evening': (1, 1)  # 平日, 土日祝
         }
 
+    def copy_for_scenario(self):
+        """
+        読み込んだ従業員・希望シフトは共有したまま、必要人数の表と生成結果だけを別に持つコピーを作る
+        
+        :return: ShiftGenerator のコピー
+        """
+        scenario = copy.copy(self)
+        scenario.required_staff = dict(self.required_staff)
+        scenario.required_register_staff = dict(self.required_register_staff)
+        scenario.required_refrigeration_staff = dict(self.required_refrigeration_staff)
+        scenario.schedule = {}
+        return scenario
+
     def load_data(self, file_path):
         """
         CSVファイルから従業員データを読み込む
@@ -74,17 +98,20 @@ class ShiftGenerator:
         df = pd.read_csv(file_path, quoting=csv.QUOTE_ALL)
         
         for _, row in df.iterrows():
-            skills = row['skills'].split(',')  # カンマで分割
-            skills = [skill.strip() for skill in skills]  # 各スキルの前後の空白を削除
-            employee = Employee(
-                id=row['従業員ID'],
-                name=row['name'],
-                register_skill='レジ' in skills,
-                refrigeration_skill='冷蔵' in skills,
-                stocking_skill='品出し' in skills,
-                preferences={}
-            )
-            self.employees.append(employee)
+            # CSVは1行が従業員×希望日なので、同じ従業員は1つの Employee にまとめる
+            employee = next((emp for emp in self.employees if emp.id == row['従業員ID']), None)
+            if employee is None:
+                skills = row['skills'].split(',')  # カンマで分割
+                skills = [skill.strip() for skill in skills]  # 各スキルの前後の空白を削除
+                employee = Employee(
+                    id=row['従業員ID'],
+                    name=row['name'],
+                    register_skill='レジ' in skills,
+                    refrigeration_skill='冷蔵' in skills,
+                    stocking_skill='品出し' in skills,
+                    preferences={}
+                )
+                self.employees.append(employee)
             
             date = datetime.datetime.strptime(row['希望日'], '%Y-%m-%d').date()
             
@@ -96,6 +123,40 @@ class ShiftGenerator:
                 employee.preferences[date] = [(start_time, end_time)]
         
 
+    def load_data_snapshot(self, file_path, snapshot_file):
+        """
+        load_data と同じ内容をスナップショット（shift_snapshot）の配列から読み込む
+
+        :param file_path: 元のCSVファイルのパス
+        :param snapshot_file: スナップショットのパス
+        """
+        snapshot = load_snapshot(file_path, snapshot_file)
+        try:
+            self.load_data_arrays(snapshot)
+        finally:
+            snapshot.close()
+
+    def load_data_arrays(self, snapshot):
+        """
+        load_data と同じ内容を Snapshot・SharedInputs の配列から読み込む
+
+        :param snapshot: shift_snapshot.Snapshot または shift_shared.SharedInputs
+        """
+        for index, emp_id in enumerate(snapshot.employee_ids.tolist()):
+            skills = [skill.strip() for skill in snapshot.skills_text(index).split(',')]
+            self.employees.append(Employee(
+                id=emp_id,
+                name=snapshot.name(index),
+                register_skill='レジ' in skills,
+                refrigeration_skill='冷蔵' in skills,
+                stocking_skill='品出し' in skills,
+                preferences={}
+            ))
+        for index, date, start_time, end_time in snapshot.iter_preferences():
+            employee = self.employees[index]
+            self.preferences[employee.id][date] = [(start_time, end_time)]
+            employee.preferences[date] = [(start_time, end_time)]
+
     def generate_shifts(self, start_date, end_date):
         """
         指定された期間のシフトを生成する
@@ -112,18 +173,110 @@ class ShiftGenerator:
         :param end_date: シフト生成終了日
         :return: 生成されたシフト、人員不足情報、スキル（レジ）不足情報
         """
-        current_date = start_date
         shortages = defaultdict(lambda: defaultdict(int))
         skill_shortages = defaultdict(lambda: defaultdict(int))
 
+        for current_date, day_shifts, day_shortages, day_skill_shortages in self.iter_shifts(start_date, end_date, window_days=None):
+            shortages[current_date] = day_shortages
+            skill_shortages[current_date] = day_skill_shortages
+
+        return self.schedule, shortages, skill_shortages
+
+    def iter_shifts(self, start_date, end_date, window_days=0):
+        """
+        指定された期間のシフトを1日ずつ生成し、確定した順に返す
+        
+        このクラスのシフトは日をまたぐ制約を持たないため、既定では self.schedule に何も残さない。
+        
+        :param start_date: シフト生成開始日
+        :param end_date: シフト生成終了日
+        :param window_days: self.schedule に残す直近の日数（None の場合は全期間を残す）
+        :return: (日付, その日のシフト, 人員不足情報, スキル不足情報) のイテレータ
+        """
+        self.use_calendar(start_date, end_date)
+        current_date = start_date
         while current_date <= end_date:
             is_busy = self.check_if_busy_day(current_date)
             day_shifts, day_shortages, day_skill_shortages = self.generate_day_shifts(current_date, is_busy)
             self.schedule[current_date] = day_shifts
-            shortages[current_date] = day_shortages
-            skill_shortages[current_date] = day_skill_shortages
+
+            yield current_date, day_shifts, day_shortages, day_skill_shortages
+
+            if window_days is not None:
+                oldest = current_date - datetime.timedelta(days=window_days - 1)
+                for old_date in [d for d in self.schedule if d < oldest]:
+                    del self.schedule[old_date]
             current_date += datetime.timedelta(days=1)
 
+    def get_assignment_rows(self, date, day_shifts):
+        """
+        1日分のシフトを (日付, 従業員ID, 名前, シフト名, 開始分, 終了分, 休憩分) の行に変換する
+        
+        :param date: 日付
+        :param day_shifts: その日のシフトリスト
+        :return: 行のリスト
+        """
+        return [(date, shift.employee.id, shift.employee.name, None,
+                 shift.start_time.hour * 60 + shift.start_time.minute,
+                 shift.end_time.hour * 60 + shift.end_time.minute,
+                 shift.break_time)
+                for shift in day_shifts]
+
+    def get_roster_rows(self):
+        """
+        従業員を (従業員ID, 名前, スキルの文字列) の行に変換する
+        
+        :return: 行のリスト（スキルはカンマ区切り）
+        """
+        return [(emp.id, emp.name, ','.join(skill for skill, has_skill in (('レジ', emp.register_skill),
+                                                                           ('冷蔵', emp.refrigeration_skill),
+                                                                           ('品出し', emp.stocking_skill))
+                                            if has_skill))
+                for emp in self.employees]
+
+    def save_schedule(self, store, start_date, end_date, shortages, skill_shortages):
+        """
+        生成済みのシフトを ScheduleStore に1トランザクションで保存する
+        
+        :param store: ScheduleStore のインスタンス
+        :param start_date: 保存開始日
+        :param end_date: 保存終了日
+        :param shortages: generate_shifts が返した人員不足情報
+        :param skill_shortages: generate_shifts が返したスキル不足情報
+        :return: 保存した割り当ての件数
+        """
+        days = ((date, self.get_assignment_rows(date, day_shifts),
+                 shortage_rows(shortages.get(date, {}), skill_shortages.get(date, {})))
+                for date, day_shifts in sorted(self.schedule.items())
+                if start_date <= date <= end_date)
+        return store.write_run(start_date, end_date, days)
+
+    def load_schedule(self, store, start_date, end_date):
+        """
+        ScheduleStore から self.schedule を復元する（再生成はしない）
+        
+        復元後は display_shifts や希望反映率の計算がそのまま使える。
+        
+        :param store: ScheduleStore のインスタンス
+        :param start_date: 読み込み開始日
+        :param end_date: 読み込み終了日
+        :return: シフト、人員不足情報、スキル不足情報（generate_shifts と同じ形式）
+        """
+        employees_by_id = {employee.id: employee for employee in self.employees}
+        current_date = start_date
+        while current_date <= end_date:
+            self.schedule[current_date] = []
+            current_date += datetime.timedelta(days=1)
+        for date, emp_id, name, shift_name, start, end, break_time in store.read_assignments(start_date, end_date):
+            employee = employees_by_id.get(emp_id)
+            if employee is None:
+                employee = Employee(emp_id, name, False, False, False, {})
+            self.schedule[date].append(Shift(
+                datetime.datetime.combine(date, datetime.time(start // 60, start % 60)),
+                datetime.datetime.combine(date, datetime.time(end // 60, end % 60)),
+                employee
+            ))
+        shortages, skill_shortages = store.read_shortages(start_date, end_date)
         return self.schedule, shortages, skill_shortages
 
     def check_if_busy_day(self, date):
@@ -133,8 +286,22 @@ class ShiftGenerator:
         :param date: 判定する日付
         :return: 混雑日の場合True、そうでない場合False
         """
+        if self.calendar is not None and self.calendar.covers(date):
+            return self.calendar.is_busy(date)
         return date.weekday() >= 5 or date in self.jp_holidays
 
+    def use_calendar(self, start_date, end_date):
+        """
+        期間を含むカレンダーがなければ作る（同じ年の範囲なら前回の実行のものを使い回す）
+        
+        :param start_date: 期間の開始日
+        :param end_date: 期間の終了日
+        :return: CalendarContext
+        """
+        if self.calendar is None or not (self.calendar.covers(start_date) and self.calendar.covers(end_date)):
+            self.calendar = get_calendar(start_date, end_date)
+        return self.calendar
+
     def generate_day_shifts(self, date, is_busy):
         """
         1日分のシフトを生成する
@@ -228,6 +395,25 @@ class ShiftGenerator:
                     and shift.end_time.time() > start_time 
                     and shift.employee.refrigeration_skill)
     
+    def calculate_on_floor_staff(self, shifts, store_open=datetime.time(9, 0), store_close=datetime.time(20, 0)):
+        """
+        各スタッフの休憩をシフト内に配置し、15分ごとに実際に売り場にいる人数を求める
+        
+        休憩は売り場の最少人数が最大になるようにずらして配置する（shift_coverage.place_breaks）。
+        
+        :param shifts: その日のシフトリスト
+        :param store_open: 集計開始時刻
+        :param store_close: 集計終了時刻
+        :return: {シフト: 休憩開始時刻}、15分ごとの売り場の人数のリスト
+        """
+        def to_minutes(value):
+            return value.hour * 60 + value.minute
+
+        break_starts, profile = place_breaks(
+            [(shift, to_minutes(shift.start_time), to_minutes(shift.end_time), shift.break_time) for shift in shifts],
+            to_minutes(store_open), to_minutes(store_close))
+        return ({shift: datetime.time(minute // 60, minute % 60) for shift, minute in break_starts.items()}, profile)
+
     def display_employee_skills(self):
         print("\n従業員のスキル情報:")
         for employee in self.employees:
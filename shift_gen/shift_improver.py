@@ -0,0 +1,310 @@
+import datetime
+import math
+import random
+import time
+from collections import defaultdict
+
+
+class ShiftImprover:
+    """
+    shift_generator.ShiftGenerator の貪欲法の結果を焼きなまし法で改善するクラス
+
+    近傍は「追加」「削除」「入れ替え（同じ枠で別の従業員に交代）」「交換（同じ日の別の枠と従業員を交換）」。
+    枠ごとの人数・冷蔵スキル持ちの人数、従業員ごとの日・週の労働時間と勤務日をカウンタで持ち、
+    1回の移動の評価はそのカウンタの差分だけで行う（check_* は呼び直さない）。
+    貪欲法と同じく、夜シフトは冷蔵スキル持ちが1人もいない顔ぶれにはしない。
+    期間の前から続く連続勤務と、期間と同じ週の期間外の勤務時間は固定の値として数える。
+    """
+
+    SHORTAGE_PENALTY = 200  # 目安の最小人数に1人足りないごとの減点
+    REFRIGERATION_PENALTY = 300  # 夜シフトに冷蔵スキル持ちがいない場合の減点
+    DAILY_OVER_PENALTY = 50  # 1日の上限を1時間超えるごとの減点
+    WEEKLY_OVER_PENALTY = 10  # 週の上限を1時間超えるごとの減点
+    CONSECUTIVE_PENALTY = 20  # 連続勤務日数の上限を1日超えるごとの減点
+
+    def __init__(self, generator, start_date, end_date, seed=None):
+        self.generator = generator
+        self.random = random.Random(seed)
+        self.employees = {emp['id']: emp for emp in generator.employees}
+
+        self.slots = []  # (日付, シフト名)
+        self.slot_hours = {}
+        self.candidates = {}  # 枠に入れる従業員IDのリスト
+        self.required = {}  # 補助を除いた必要人数
+        self.capacity = {}  # 補助を含めた最大人数
+        self.members = {}
+        self.fridge_count = defaultdict(int)
+        self.day_hours = defaultdict(int)  # (従業員ID, 日付) -> 時間
+        self.week_hours = defaultdict(int)  # (従業員ID, 週の月曜日) -> 時間
+        self.outside_days = set()  # 期間外で、期間の勤務とつながる勤務日 (従業員ID, 日付)
+        self.values = {}  # (従業員ID, 日付, シフト名) -> 割り当て自体の点数
+        self.score = 0
+
+        self.load_context(start_date, end_date)
+        date = start_date
+        while date <= end_date:
+            if date in generator.shifts:
+                for shift_name in ['朝', '昼', '夜']:
+                    self.add_slot(date, shift_name)
+            date += datetime.timedelta(days=1)
+        self.score = self.full_score()
+
+    def load_context(self, start_date, end_date):
+        # 期間の前後の勤務（前回の実行から引き継いだ分を含む）を固定の値として読み込む
+        gen = self.generator
+        first_monday = start_date - datetime.timedelta(days=start_date.weekday())
+        last_sunday = end_date + datetime.timedelta(days=6 - end_date.weekday())
+        for emp in gen.employees:
+            emp_id = emp['id']
+            # 期間の前日まで続いている連続勤務
+            for n in range(1, gen.count_consecutive_days(emp, start_date) + 1):
+                self.outside_days.add((emp_id, start_date - datetime.timedelta(days=n)))
+            # 期間の翌日から続いている生成済みの勤務
+            date = end_date + datetime.timedelta(days=1)
+            while date in gen.shifts and gen.calculate_daily_hours(emp, date) > 0:
+                self.outside_days.add((emp_id, date))
+                date += datetime.timedelta(days=1)
+            # 期間の最初の週の、期間より前の勤務時間
+            if start_date > first_monday:
+                self.week_hours[(emp_id, first_monday)] += gen.calculate_weekly_hours(emp, start_date - datetime.timedelta(days=1))
+            # 期間の最後の週の、期間より後の勤務時間
+            date = end_date + datetime.timedelta(days=1)
+            while date <= last_sunday:
+                if date in gen.shifts:
+                    monday = date - datetime.timedelta(days=date.weekday())
+                    self.week_hours[(emp_id, monday)] += gen.calculate_daily_hours(emp, date)
+                date += datetime.timedelta(days=1)
+
+    def add_slot(self, date, shift_name):
+        gen = self.generator
+        start_hour, end_hour = gen.get_shift_hours(shift_name)
+        key = (date, shift_name)
+        required = gen.get_required_cashiers(date, shift_name)
+        self.slots.append(key)
+        self.slot_hours[key] = end_hour - start_hour
+        self.required[key] = required
+        self.capacity[key] = required + 2
+        self.candidates[key] = [emp['id'] for emp in gen.get_available_employees(date, start_hour, end_hour)]
+        for emp_id in self.candidates[key]:
+            self.values[(emp_id, date, shift_name)] = self.assignment_value(self.employees[emp_id], date, start_hour, end_hour)
+        self.members[key] = set()
+        for assigned in gen.shifts[date].get(shift_name, []):
+            emp_id = assigned['employee']['id']
+            if (emp_id, date, shift_name) not in self.values:
+                self.values[(emp_id, date, shift_name)] = self.assignment_value(self.employees[emp_id], date, start_hour, end_hour)
+            self.apply(key, emp_id, 1)
+
+    def assignment_value(self, employee, date, start_hour, end_hour):
+        # score_employee のうち、他の割り当てに依存しない部分
+        return self.generator.get_static_scores(date, start_hour, end_hour)[employee['id']]
+
+    # --- 点数 -------------------------------------------------------------
+
+    def slot_penalty(self, key, count, fridge):
+        date, shift_name = key
+        penalty = max(0, self.generator.min_employees[shift_name] - count) * self.SHORTAGE_PENALTY
+        if shift_name == '夜' and fridge == 0:
+            penalty += self.REFRIGERATION_PENALTY
+        return penalty
+
+    def daily_penalty(self, hours):
+        return max(0, hours - self.generator.MAX_DAILY_HOURS) * self.DAILY_OVER_PENALTY
+
+    def weekly_penalty(self, hours):
+        return max(0, hours - self.generator.MAX_WEEKLY_HOURS) * self.WEEKLY_OVER_PENALTY
+
+    def streak_penalty(self, length):
+        return max(0, length - self.generator.MAX_CONSECUTIVE_DAYS) * self.CONSECUTIVE_PENALTY
+
+    def worked(self, emp_id, date):
+        return self.day_hours.get((emp_id, date), 0) > 0 or (emp_id, date) in self.outside_days
+
+    def run_length(self, emp_id, date, step):
+        # date の隣から step 方向に続く勤務日数（連続勤務の長さ分しか見ないので実質 O(1)）
+        length = 0
+        current = date + datetime.timedelta(days=step)
+        while self.worked(emp_id, current):
+            length += 1
+            current += datetime.timedelta(days=step)
+        return length
+
+    def full_score(self):
+        score = 0
+        for key in self.slots:
+            date, shift_name = key
+            score += sum(self.values[(emp_id, date, shift_name)] for emp_id in self.members[key])
+            score -= self.slot_penalty(key, len(self.members[key]), self.fridge_count[key])
+        score -= sum(self.daily_penalty(hours) for hours in self.day_hours.values())
+        score -= sum(self.weekly_penalty(hours) for hours in self.week_hours.values())
+        worked_dates = defaultdict(set)
+        for (emp_id, date), hours in self.day_hours.items():
+            if hours > 0:
+                worked_dates[emp_id].add(date)
+        for emp_id, date in self.outside_days:
+            worked_dates[emp_id].add(date)
+        for emp_id, dates in worked_dates.items():
+            for date in dates:
+                if date - datetime.timedelta(days=1) not in dates:
+                    score -= self.streak_penalty(1 + self.run_length(emp_id, date, 1))
+        return score
+
+    def apply(self, key, emp_id, sign):
+        """
+        枠 key に emp_id を追加(sign=1)・削除(sign=-1)し、点数の変化量を返す
+
+        :return: 点数の差分
+        """
+        date, shift_name = key
+        hours = self.slot_hours[key]
+        has_fridge = '冷蔵' in self.employees[emp_id]['skills']
+        delta = 0
+
+        count = len(self.members[key])
+        fridge = self.fridge_count[key]
+        new_fridge = fridge + sign if has_fridge else fridge
+        delta += self.slot_penalty(key, count, fridge) - self.slot_penalty(key, count + sign, new_fridge)
+        delta += sign * self.values[(emp_id, date, shift_name)]
+
+        day_key = (emp_id, date)
+        old_day = self.day_hours[day_key]
+        new_day = old_day + sign * hours
+        delta += self.daily_penalty(old_day) - self.daily_penalty(new_day)
+
+        week_key = (emp_id, date - datetime.timedelta(days=date.weekday()))
+        old_week = self.week_hours[week_key]
+        delta += self.weekly_penalty(old_week) - self.weekly_penalty(old_week + sign * hours)
+
+        if (old_day > 0) != (new_day > 0):
+            before = self.run_length(emp_id, date, -1)
+            after = self.run_length(emp_id, date, 1)
+            joined = self.streak_penalty(before + 1 + after)
+            split = self.streak_penalty(before) + self.streak_penalty(after)
+            delta += (split - joined) if sign > 0 else (joined - split)
+
+        if sign > 0:
+            self.members[key].add(emp_id)
+        else:
+            self.members[key].discard(emp_id)
+        self.fridge_count[key] = new_fridge
+        self.day_hours[day_key] = new_day
+        self.week_hours[week_key] = old_week + sign * hours
+        self.score += delta
+        return delta
+
+    def is_allowed(self, move):
+        # 貪欲法と同じく、冷蔵スキル持ちのいない夜シフトの顔ぶれは認めない（誰もいない場合は不足として扱う）
+        return all(self.fridge_count[key] > 0 or not self.members[key]
+                   for key in {key for key, _, _ in move} if key[1] == '夜')
+
+    # --- 近傍 -------------------------------------------------------------
+
+    def random_move(self):
+        # 実行可能な移動を (枠, 従業員ID, 符号) の列として返す
+        key = self.random.choice(self.slots)
+        members = self.members[key]
+        outside = [emp_id for emp_id in self.candidates[key] if emp_id not in members]
+        kind = self.random.random()
+        if kind < 0.25:
+            if outside and len(members) < self.capacity[key]:
+                return [(key, self.random.choice(outside), 1)]
+        elif kind < 0.4:
+            if members:
+                return [(key, self.random.choice(list(members)), -1)]
+        elif kind < 0.8:
+            if members and outside:
+                return [(key, self.random.choice(list(members)), -1), (key, self.random.choice(outside), 1)]
+        else:
+            date, shift_name = key
+            other = (date, self.random.choice([name for name in ['朝', '昼', '夜'] if name != shift_name]))
+            if other in self.members:
+                a_choices = [emp_id for emp_id in members
+                             if emp_id not in self.members[other] and emp_id in self.candidates[other]]
+                b_choices = [emp_id for emp_id in self.members[other]
+                             if emp_id not in members and emp_id in self.candidates[key]]
+                if a_choices and b_choices:
+                    a = self.random.choice(a_choices)
+                    b = self.random.choice(b_choices)
+                    return [(key, a, -1), (other, b, -1), (key, b, 1), (other, a, 1)]
+        return None
+
+    def improve(self, time_budget=1.0, initial_temperature=50.0, final_temperature=0.5):
+        """
+        時間の許す限り焼きなまし法で改善し、最良の結果を generator.shifts に書き戻す
+
+        :param time_budget: 使ってよい秒数
+        :param initial_temperature: 開始時の温度
+        :param final_temperature: 終了時の温度
+        :return: 改善前後の点数などをまとめた辞書
+        """
+        initial_score = self.score
+        best_score = self.score
+        best_members = {key: set(members) for key, members in self.members.items()}
+        iterations = 0
+        accepted = 0
+
+        started = time.perf_counter()
+        elapsed = 0.0
+        temperature = initial_temperature
+        while elapsed < time_budget and self.slots:
+            iterations += 1
+            move = self.random_move()
+            if move is not None:
+                delta = sum(self.apply(key, emp_id, sign) for key, emp_id, sign in move)
+                if self.is_allowed(move) and (delta >= 0 or self.random.random() < math.exp(delta / temperature)):
+                    accepted += 1
+                    if self.score > best_score:
+                        best_score = self.score
+                        best_members = {key: set(members) for key, members in self.members.items()}
+                else:
+                    for key, emp_id, sign in reversed(move):
+                        self.apply(key, emp_id, -sign)
+            if iterations % 100 == 0:
+                elapsed = time.perf_counter() - started
+                progress = min(elapsed / time_budget, 1.0)
+                temperature = initial_temperature * (final_temperature / initial_temperature) ** progress
+
+        self.write_back(best_members)
+        return {
+            'greedy_score': initial_score,
+            'improved_score': best_score,
+            'improvement': best_score - initial_score,
+            'iterations': iterations,
+            'accepted': accepted,
+            'seconds': time.perf_counter() - started,
+        }
+
+    def write_back(self, members_by_slot):
+        # generate_shifts が返した ShiftResult と中身を共有しているので、日ごとの辞書は書き換えずに作り直す
+        gen = self.generator
+        for date in sorted({date for date, _ in self.slots}):
+            shortages, skill_shortages = gen.day_results.get(date, ({}, {}))
+            gen.day_results[date] = (defaultdict(int, shortages), defaultdict(int, skill_shortages))
+            day_shifts = defaultdict(list)
+            day_shifts.update(gen.shifts[date])
+            gen.shifts[date] = day_shifts
+        for key in self.slots:
+            date, shift_name = key
+            start_hour, end_hour = gen.get_shift_hours(shift_name)
+            # 点数の高い順に並べ、必要人数を超えた分は休憩回し用の補助とする
+            ordered = sorted(members_by_slot[key], key=lambda emp_id: -self.values[(emp_id, date, shift_name)])
+            assigned = []
+            for i, emp_id in enumerate(ordered):
+                entry = {
+                    'employee': self.employees[emp_id],
+                    'start': start_hour,
+                    'end': end_hour,
+                    'break': gen.calculate_break(start_hour, end_hour)
+                }
+                if i >= self.required[key]:
+                    entry['role'] = '補助'
+                assigned.append(entry)
+            gen.shifts[date][shift_name] = assigned
+            gen.touch_ledger(date)
+
+            shortages, skill_shortages = gen.day_results[date]
+            shortages.pop(shift_name, None)
+            skill_shortages.pop(f'{shift_name}_冷蔵', None)
+            if len(assigned) < gen.min_employees[shift_name]:
+                shortages[shift_name] = gen.min_employees[shift_name] - len(assigned)
+            if shift_name == '夜' and not any('冷蔵' in emp['employee']['skills'] for emp in assigned):
+                skill_shortages[f'{shift_name}_冷蔵'] = 1
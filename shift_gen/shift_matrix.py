@@ -0,0 +1,94 @@
+import numpy as np
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+# スキルごとのビット
+SKILL_BITS = {
+    'レジ': 1,
+    '冷蔵': 2,
+    '品出し': 4,
+}
+
+
+def skill_mask(skills):
+    '''
+    スキル名のリストをビットマスクにする
+    '''
+    mask = 0
+    for skill in skills:
+        mask |= SKILL_BITS.get(skill.strip(), 0)
+    return mask
+
+
+def to_bucket(minutes, round_up=False):
+    '''
+    0時からの分数を15分単位の区間番号にする
+    '''
+    if round_up:
+        return -(-minutes // BUCKET_MINUTES)
+    return minutes // BUCKET_MINUTES
+
+
+class DayAvailability:
+    """
+    1日分の「従業員 × 15分区間」の行列
+
+    available は希望シフトの時間帯、assigned はその日すでに割り当てた時間帯。
+    候補者の判定（希望との重なり・1日の上限時間・割り当ての重複・スキル）を
+    全従業員まとめて NumPy の演算で行う。
+    """
+
+    def __init__(self, employee_ids, skill_masks):
+        self.employee_ids = list(employee_ids)
+        self.index = {emp_id: i for i, emp_id in enumerate(self.employee_ids)}
+        self.skills = np.asarray(skill_masks, dtype=np.uint8)
+        self.available = np.zeros((len(self.employee_ids), BUCKETS_PER_DAY), dtype=bool)
+        self.assigned = np.zeros((len(self.employee_ids), BUCKETS_PER_DAY), dtype=bool)
+
+    def set_available(self, emp_id, start_minute, end_minute):
+        self.available[self.index[emp_id], to_bucket(start_minute):to_bucket(end_minute, round_up=True)] = True
+
+    def assign(self, emp_id, start_minute, end_minute):
+        self.assigned[self.index[emp_id], to_bucket(start_minute):to_bucket(end_minute, round_up=True)] = True
+
+    def unassign(self, emp_id, start_minute, end_minute):
+        self.assigned[self.index[emp_id], to_bucket(start_minute):to_bucket(end_minute, round_up=True)] = False
+
+    def clear_assignments(self):
+        self.assigned[:] = False
+
+    def assigned_minutes(self):
+        return self.assigned.sum(axis=1) * BUCKET_MINUTES
+
+    def candidate_mask(self, start_minute, end_minute, required_skills=0, max_daily_minutes=None):
+        """
+        指定した時間帯に入れる従業員を全員分まとめて判定する
+
+        :param start_minute: 枠の開始（0時からの分）
+        :param end_minute: 枠の終了（0時からの分）
+        :param required_skills: 必須スキルのビットマスク（0なら問わない）
+        :param max_daily_minutes: 1日の労働時間の上限（分）。None なら判定しない
+        :return: 従業員ごとの bool 配列
+        """
+        start = to_bucket(start_minute)
+        end = to_bucket(end_minute, round_up=True)
+        mask = self.available[:, start:end].any(axis=1)
+        mask &= ~self.assigned[:, start:end].any(axis=1)
+        if max_daily_minutes is not None:
+            mask &= self.assigned_minutes() + (end - start) * BUCKET_MINUTES <= max_daily_minutes
+        if required_skills:
+            mask &= (self.skills & required_skills) == required_skills
+        return mask
+
+    def coverage(self, required_skills=0):
+        """
+        15分区間ごとの割り当て人数
+
+        :param required_skills: 数えるスキルのビットマスク（0なら全員）
+        :return: 区間ごとの人数の配列
+        """
+        rows = self.assigned
+        if required_skills:
+            rows = rows[(self.skills & required_skills) == required_skills]
+        return rows.sum(axis=0)
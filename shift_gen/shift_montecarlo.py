@@ -0,0 +1,101 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from shift_scenarios import generator_pool, get_base_generator
+
+
+def run_replicates(generator, rates, start_date, end_date, seed_sequence, replicates):
+    """
+    同じ希望反映率の設定でシフト生成を replicates 回繰り返す
+
+    抽選は replicates 回分をまとめて draw_preference_acceptance で1回だけ行う。
+
+    :param generator: copy_for_scenario を持つ shift_generator.ShiftGenerator
+    :param rates: {従業員ID: 反映率} の辞書
+    :param seed_sequence: np.random.SeedSequence
+    :return: 試行ごとの (不足人数, スキル不足, 全体の反映率, {従業員ID: 反映率}) のリスト
+    """
+    base = generator.copy_for_scenario()
+    base.preference_rates.update(rates)
+    accepted = base.draw_preference_acceptance(start_date, end_date, np.random.default_rng(seed_sequence), replicates)
+
+    results = []
+    for replicate in range(replicates):
+        scenario = base.copy_for_scenario()
+        scenario.set_preference_draws(start_date, accepted[replicate])
+        total_shortages = 0
+        total_skill_shortages = 0
+        for date, day_shifts, shortages, skill_shortages in scenario.iter_shifts(start_date, end_date, window_days=None):
+            total_shortages += sum(shortages.values())
+            total_skill_shortages += sum(skill_shortages.values())
+        employee_rates = {emp['id']: scenario.calculate_employee_preference_reflection_rate(emp['id'], start_date, end_date)
+                          for emp in scenario.employees}
+        overall = sum(employee_rates.values()) / len(employee_rates) if employee_rates else 0
+        results.append((total_shortages, total_skill_shortages, overall, employee_rates))
+    return results
+
+
+def _replicates_in_worker(rates, start_date, end_date, seed_sequence, replicates):
+    return run_replicates(get_base_generator(), rates, start_date, end_date, seed_sequence, replicates)
+
+
+def confidence_interval(values, z=1.96):
+    '''
+    平均と95%信頼区間（正規近似）を返す
+    '''
+    values = np.asarray(values, dtype=float)
+    mean = values.mean()
+    if len(values) < 2:
+        return mean, mean, mean
+    half_width = z * values.std(ddof=1) / math.sqrt(len(values))
+    return mean, mean - half_width, mean + half_width
+
+
+def study_preference_rates(data_file, rate_settings, start_date, end_date, replicates=30, seed=0,
+                           batch_size=10, max_workers=None):
+    """
+    希望反映率の設定ごとにシフト生成を繰り返し、不足人数と希望反映率の平均と信頼区間を求める
+
+    同じ seed なら同じ結果になる。試行は batch_size 回ずつまとめてプロセスプールで並列に実行する。
+
+    :param data_file: 希望シフトのCSVファイル（shift_generator の形式）
+    :param rate_settings: {'name': 設定名, 'rates': {従業員ID: 反映率}} のリスト
+    :param start_date: シフト生成開始日
+    :param end_date: シフト生成終了日
+    :param replicates: 設定ごとの試行回数
+    :param seed: 乱数のシード
+    :param batch_size: 1タスクで実行する試行回数
+    :param max_workers: プロセス数（省略時はCPU数）
+    :return: 設定ごとの集計の DataFrame、設定×従業員ごとの反映率の DataFrame
+    """
+    tasks = []
+    for setting in rate_settings:
+        for first in range(0, replicates, batch_size):
+            tasks.append((setting['name'], setting.get('rates', {}), min(batch_size, replicates - first)))
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(tasks))
+
+    with generator_pool('shift_generator', data_file, max_workers) as executor:
+        futures = [executor.submit(_replicates_in_worker, rates, start_date, end_date, seed_sequence, count)
+                   for (name, rates, count), seed_sequence in zip(tasks, seed_sequences)]
+        outcomes = {}
+        for (name, rates, count), future in zip(tasks, futures):
+            outcomes.setdefault(name, []).extend(future.result())
+
+    summary_rows = []
+    employee_rows = []
+    for name, results in outcomes.items():
+        row = {'setting': name, 'replicates': len(results)}
+        for column, values in (('shortages', [r[0] for r in results]),
+                               ('skill_shortages', [r[1] for r in results]),
+                               ('reflection_rate', [r[2] for r in results])):
+            row[column], row[f'{column}_ci_low'], row[f'{column}_ci_high'] = confidence_interval(values)
+        summary_rows.append(row)
+
+        for emp_id in results[0][3]:
+            mean, low, high = confidence_interval([r[3][emp_id] for r in results])
+            employee_rows.append({'setting': name, 'employee_id': emp_id, 'reflection_rate': mean,
+                                  'ci_low': low, 'ci_high': high})
+
+    return pd.DataFrame(summary_rows).set_index('setting'), pd.DataFrame(employee_rows)
@@ -0,0 +1,71 @@
+import sys
+from collections import defaultdict
+
+
+class ShiftResult:
+    """
+    generate_shifts の結果
+
+    assignments は {日付: {シフト名: [割り当て]}}、shortages / skill_shortages は {日付: {時間帯: 不足人数}}、
+    warnings は check_shift_extension の警告を (日付, シフト名, 従業員ID, [警告]) で並べたもの。
+    従来どおり `shifts, shortages, skill_shortages = generator.generate_shifts(...)` と展開もできる。
+    """
+
+    def __init__(self):
+        self.assignments = {}
+        self.shortages = defaultdict(lambda: defaultdict(int))
+        self.skill_shortages = defaultdict(lambda: defaultdict(int))
+        self.warnings = []
+
+    def add_day(self, date, day_shifts, shortages, skill_shortages, warnings=()):
+        self.assignments[date] = day_shifts
+        self.shortages[date] = shortages
+        self.skill_shortages[date] = skill_shortages
+        self.warnings.extend(warnings)
+
+    def total_shortage(self):
+        return sum(sum(shifts.values()) for shifts in self.shortages.values())
+
+    def __iter__(self):
+        return iter((self.assignments, self.shortages, self.skill_shortages))
+
+
+class ShiftReporter:
+    """
+    シフトの表示をまとめて書き出すクラス
+
+    行はいったんメモリにためて buffer_lines 行ごとに stream に書く。
+    reporter を渡さない（quiet な）実行では文字列の組み立て自体を行わない。
+    """
+
+    def __init__(self, stream=None, buffer_lines=1000):
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    def write(self, line=''):
+        self.lines.append(line)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.stream.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+        self.stream.flush()
+
+    def report_day(self, date, day_shifts, shortages, skill_shortages, warnings=()):
+        self.write(f"Date: {date}")
+        for shift_name, assigned_employees in day_shifts.items():
+            if f'{shift_name}_冷蔵' in skill_shortages:
+                self.write(f"  {shift_name}の警告: {shift_name}シフトに冷蔵スキルを持つ従業員がいません")
+            elif shift_name in shortages:
+                self.write(f"  {shift_name}の警告: {shortages[shift_name]}人不足しています")
+
+            # シフトの表示
+            self.write(f"  {shift_name} shift: {len(assigned_employees)} employees assigned")
+            for emp in assigned_employees:
+                self.write(f"    {emp['employee']['name']}: {emp['start']}:00 - {emp['end']}:00 (休憩: {emp['break']}分)")
+        for warning_date, shift_name, emp_id, messages in warnings:
+            self.write(f"  {shift_name} 従業員ID {emp_id}: {'、'.join(messages)}")
+        self.write()
@@ -0,0 +1,159 @@
+import contextlib
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from shift_shared import SharedInputs
+
+# ワーカープロセスごとに1回だけ読み込むシフト生成クラスのインスタンス
+_base_generator = None
+# ワーカープロセスが開いた共有メモリ（カレンダーの配列が参照するのでプロセスの終了まで持っておく）
+_shared_inputs = None
+
+
+def load_generator(generator_module, data_file, snapshot_file=None, shared_inputs=None):
+    '''
+    generator_module（'shift_generator' または 'shift_generator2'）の ShiftGenerator を作る
+    snapshot_file を指定すると CSV の代わりにスナップショット（shift_snapshot）から、
+    shared_inputs（shift_shared.SharedInputs）を指定すると共有メモリの配列から読み込む
+    '''
+    module = importlib.import_module(generator_module)
+    if shared_inputs is not None:
+        generator = module.ShiftGenerator(data_file, shared_inputs=shared_inputs)
+        calendar = shared_inputs.get_calendar()
+        if calendar is not None:
+            generator.calendar = calendar
+        return generator
+    if snapshot_file:
+        return module.ShiftGenerator(data_file, snapshot_file=snapshot_file)
+    return module.ShiftGenerator(data_file)
+
+
+def _init_worker(generator_module, data_file, snapshot_file=None, shared_handle=None):
+    global _base_generator, _shared_inputs
+    # fork で起動した場合は親プロセスで読み込んだものをそのまま使う
+    if _base_generator is None:
+        if shared_handle is not None:
+            _shared_inputs = shared_handle.attach()
+        _base_generator = load_generator(generator_module, data_file, snapshot_file, _shared_inputs)
+
+
+def get_base_generator():
+    '''
+    ワーカープロセス内で共有している読み込み済みのシフト生成クラスのインスタンスを返す
+    '''
+    return _base_generator
+
+
+@contextlib.contextmanager
+def generator_pool(generator_module, data_file, max_workers=None, snapshot_file=None, use_shared_memory=False,
+                   calendar=None):
+    """
+    読み込み済みのシフト生成クラスを共有するプロセスプールを作る
+
+    fork が使える環境では親プロセスで1回だけ読み込み、子プロセスはそれを引き継ぐ。
+    それ以外の環境では各ワーカーが起動時に1回だけ読み込む。
+    use_shared_memory が True の場合は、親プロセスが従業員・スキル・希望シフト（と calendar）を
+    共有メモリに置き、ワーカーには共有メモリの名前だけを渡して、各ワーカーはそこから読み込む。
+
+    :param generator_module: 使うシフト生成モジュール名
+    :param data_file: 希望シフトのCSVファイル
+    :param max_workers: プロセス数（省略時はCPU数）
+    :param snapshot_file: スナップショットのパス。fork できない環境でも各ワーカーは CSV を解析せずに読み込める
+    :param use_shared_memory: True の場合は共有メモリ（shift_shared）経由でワーカーに渡す
+    :param calendar: 共有メモリに一緒に置く CalendarContext（use_shared_memory が True のときだけ使う）
+    :return: ProcessPoolExecutor
+    """
+    global _base_generator
+    shared_inputs = None
+    if use_shared_memory:
+        context = multiprocessing.get_context()
+        shared_inputs = SharedInputs.from_file(data_file, snapshot_file, calendar)
+    elif 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        _base_generator = load_generator(generator_module, data_file, snapshot_file)
+    else:
+        context = multiprocessing.get_context()
+
+    initargs = (generator_module, data_file, snapshot_file, shared_inputs.handle if shared_inputs else None)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                 initializer=_init_worker, initargs=initargs) as executor:
+            yield executor
+    finally:
+        _base_generator = None
+        if shared_inputs is not None:
+            shared_inputs.unlink()
+
+
+def apply_scenario(generator, scenario):
+    """
+    シナリオの必要人数の設定をシフト生成クラスに反映する
+
+    :param generator: copy_for_scenario で作ったコピー
+    :param scenario: {'name': シナリオ名, 設定名: {時間帯: 人数}} の辞書
+                     設定名は min_employees / max_employees / strict_min_employees / strict_max_employees
+                     （shift_generator）や required_staff / required_register_staff /
+                     required_refrigeration_staff（shift_generator2）
+    """
+    for key, values in scenario.items():
+        if key == 'name':
+            continue
+        table = getattr(generator, key, None)
+        if not isinstance(table, dict):
+            raise ValueError(f"シナリオ {scenario.get('name')} の設定 {key} はこのシフト生成クラスにありません")
+        table.update(values)
+
+
+def evaluate_scenario(base_generator, scenario, start_date, end_date):
+    """
+    1つのシナリオでシフトを生成し、不足人数と希望反映率を集計する
+
+    :return: 集計結果の辞書
+    """
+    started = time.perf_counter()
+    generator = base_generator.copy_for_scenario()
+    apply_scenario(generator, scenario)
+
+    total_shortages = 0
+    total_skill_shortages = 0
+    for date, day_shifts, shortages, skill_shortages in generator.iter_shifts(start_date, end_date, window_days=None):
+        total_shortages += sum(shortages.values())
+        total_skill_shortages += sum(skill_shortages.values())
+
+    return {
+        'scenario': scenario.get('name'),
+        'shortages': total_shortages,
+        'skill_shortages': total_skill_shortages,
+        'reflection_rate': generator.calculate_overall_preference_reflection_rate(start_date, end_date),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _evaluate_in_worker(scenario, start_date, end_date):
+    return evaluate_scenario(_base_generator, scenario, start_date, end_date)
+
+
+def compare_scenarios(data_file, scenarios, start_date, end_date, generator_module='shift_generator2', max_workers=None):
+    """
+    複数の必要人数の設定を並列に評価して比較表を返す
+
+    データの読み込みはプロセスごとに1回だけ行い、各シナリオは読み込んだ従業員・希望シフトを
+    読み取り専用で共有する（fork が使える環境では親プロセスで1回だけ読み込む）。
+
+    :param data_file: 希望シフトのCSVファイル
+    :param scenarios: apply_scenario に渡すシナリオのリスト
+    :param start_date: シフト生成開始日
+    :param end_date: シフト生成終了日
+    :param generator_module: 使うシフト生成モジュール名
+    :param max_workers: プロセス数（省略時はCPU数）
+    :return: シナリオごとの不足人数・スキル不足・希望反映率の DataFrame
+    """
+    with generator_pool(generator_module, data_file, max_workers) as executor:
+        futures = [executor.submit(_evaluate_in_worker, scenario, start_date, end_date) for scenario in scenarios]
+        results = [future.result() for future in futures]
+
+    return pd.DataFrame(results).set_index('scenario')
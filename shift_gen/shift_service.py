@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import datetime
+import importlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from shift_stream import format_minutes
+
+
+class ShiftService:
+    """
+    シフト生成をローカルの HTTP で提供する asyncio のサービス
+
+    読み込み済みのデータ（ShiftAI の場合は学習済みのモデルも）をメモリに置いたまま、
+    生成はスレッドプールで実行する。同じ期間への同時リクエストは1回の計算にまとめる。
+    iter_shifts を持たない生成クラス（ShiftAI）はインスタンスを共有するので、ロックで1つずつ計算する。
+
+    GET /shifts?start=YYYY-MM-DD&end=YYYY-MM-DD
+    """
+
+    def __init__(self, generator, max_workers=1):
+        self.generator = generator
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # ShiftAI は cp_template の CpModel を日付ごとに書き換えるので、同時に generate_shifts できない
+        self.generator_lock = threading.Lock()
+        self.pending = {}  # (開始日, 終了日) -> 計算中の Future
+        self.computations = 0  # 実際に計算した回数
+        self.coalesced = 0  # 計算中の結果を待つだけで済んだリクエストの数
+        self.server = None
+
+    def compute(self, start_date, end_date):
+        """
+        期間のシフトを生成して JSON にできる辞書で返す（スレッドプールで実行）
+        """
+        self.computations += 1
+        days = {}
+        if hasattr(self.generator, 'iter_shifts'):
+            # 読み込んだデータと候補者のキャッシュ（ロックつき）は共有し、生成結果はリクエストごとに別にする
+            generator = self.generator.copy_for_scenario()
+            for date, day_shifts, shortages, skill_shortages in generator.iter_shifts(start_date, end_date):
+                days[date.isoformat()] = {
+                    'assignments': [self.format_row(row) for row in generator.get_assignment_rows(date, day_shifts)],
+                    'shortages': dict(shortages),
+                    'skill_shortages': dict(skill_shortages),
+                }
+        else:
+            # ShiftAI は1日ずつ generate_shifts する
+            date = start_date
+            while date <= end_date:
+                with self.generator_lock:
+                    solution = self.generator.generate_shifts(date)
+                days[date.isoformat()] = {
+                    'assignments': [{'employee_id': emp_id, 'start': shift[0].strftime('%H:%M'), 'end': shift[1].strftime('%H:%M')}
+                                    for emp_id, assignment in solution.items()
+                                    for shift, assigned in assignment.items() if assigned],
+                }
+                date += datetime.timedelta(days=1)
+        return {'start': start_date.isoformat(), 'end': end_date.isoformat(), 'days': days}
+
+    @staticmethod
+    def format_row(row):
+        date, emp_id, name, shift_name, start, end, break_time = row
+        return {'employee_id': int(emp_id), 'name': name, 'shift': shift_name,
+                'start': format_minutes(start), 'end': format_minutes(end), 'break': break_time}
+
+    async def get_schedule(self, start_date, end_date):
+        """
+        期間のシフトを返す。同じ期間を計算中ならその結果を待つ
+
+        :return: compute の戻り値
+        """
+        key = (start_date, end_date)
+        if key in self.pending:
+            self.coalesced += 1
+            return await asyncio.shield(self.pending[key])
+
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self.compute, start_date, end_date)
+        self.pending[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # ヘッダーは使わない
+            status, body = await self.route(request_line)
+        except Exception as e:
+            status, body = 500, {'error': f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + payload)
+        await writer.drain()
+        writer.close()
+
+    async def route(self, request_line):
+        parts = request_line.split()
+        if len(parts) < 2 or parts[0] != 'GET':
+            return 400, {'error': 'GET のみ対応しています'}
+        url = urlsplit(parts[1])
+        if url.path != '/shifts':
+            return 404, {'error': f'{url.path} はありません'}
+        query = parse_qs(url.query)
+        try:
+            start_date = datetime.date.fromisoformat(query['start'][0])
+            end_date = datetime.date.fromisoformat(query.get('end', query['start'])[0])
+        except (KeyError, ValueError):
+            return 400, {'error': 'start と end を YYYY-MM-DD で指定してください'}
+        if end_date < start_date:
+            return 400, {'error': 'end は start 以降にしてください'}
+        return 200, await self.get_schedule(start_date, end_date)
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """
+        サーバーを起動する。path を指定した場合は Unix ソケットで待ち受ける
+
+        :return: 待ち受けているポート番号（Unix ソケットの場合は path）
+        """
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+            return path
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+
+async def request_shifts(start_date, end_date, host='127.0.0.1', port=None, path=None):
+    """
+    ShiftService にリクエストを送るローカル用のクライアント
+
+    :return: (ステータスコード, レスポンスの JSON)
+    """
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /shifts?start={start_date.isoformat()}&end={end_date.isoformat()} HTTP/1.1\r\n"
+                 f"Host: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    return status, json.loads(body.decode('utf-8'))
+
+
+async def serve(data_file, generator_module='shift_generator2', host='127.0.0.1', port=8765):
+    module = importlib.import_module(generator_module)
+    service = ShiftService(module.ShiftGenerator(data_file))
+    await service.start(host, port)
+    print(f"http://{host}:{port}/shifts?start=YYYY-MM-DD&end=YYYY-MM-DD で待ち受けています")
+    await service.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='シフト生成をローカルの HTTP で提供する')
+    # shift.csv（横持ち）は読めないので、1行1希望の縦持ちの CSV を指定する
+    parser.add_argument('data_file', help='希望シフトの CSV ファイル（従業員ID, name, skills, 希望日, 出勤時間, 退勤時間）')
+    parser.add_argument('--generator', default='shift_generator2', help='シフト生成のモジュール')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(serve(args.data_file, args.generator, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
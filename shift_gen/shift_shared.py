@@ -0,0 +1,188 @@
+import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from shift_calendar import CalendarContext
+from shift_snapshot import load_snapshot
+
+ALIGN = 8
+
+
+class SharedArraysHandle:
+    """
+    共有メモリの名前と配列の並び（名前, dtype, 形, 開始位置）だけを持つ、pickle できる目印
+
+    プロセスプールのワーカーには配列そのものではなくこれを渡し、attach で同じメモリを開く。
+    """
+
+    def __init__(self, name, layout, metadata=None):
+        self.name = name
+        self.layout = layout
+        self.metadata = metadata or {}
+
+    def attach(self):
+        return SharedArrays(shared_memory.SharedMemory(name=self.name), self.layout, self.metadata, owner=False)
+
+
+class SharedArrays:
+    """
+    名前付きの NumPy 配列を1つの multiprocessing.shared_memory にまとめたもの
+
+    配列は共有メモリを直接参照する（コピーしない）ので、attach したプロセス同士で同じページを使う。
+    書き込みもできるので、ワーカーが結果を書き込む台帳（日付×時間帯の不足人数など）にも使える。
+    作ったプロセス（owner）が最後に unlink する。
+    """
+
+    def __init__(self, memory, layout, metadata=None, owner=False):
+        self.memory = memory
+        self.layout = layout
+        self.metadata = metadata or {}
+        self.owner = owner
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+                       for key, dtype, shape, offset in layout}
+
+    @classmethod
+    def create(cls, arrays, metadata=None):
+        """
+        配列をコピーした共有メモリを作る
+
+        :param arrays: {名前: 配列}
+        :param metadata: handle と一緒に渡す小さな値（日付など）
+        :return: SharedArrays（owner）
+        """
+        layout = []
+        position = 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            position += -position % ALIGN
+            layout.append((key, array.dtype.str, array.shape, position))
+            position += array.nbytes
+        # 大きさ0の共有メモリは作れない
+        memory = shared_memory.SharedMemory(create=True, size=max(position, 1))
+        shared = cls(memory, tuple(layout), metadata, owner=True)
+        for key, array in arrays.items():
+            shared.arrays[key][...] = array
+        return shared
+
+    @property
+    def handle(self):
+        return SharedArraysHandle(self.memory.name, self.layout, self.metadata)
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        # 配列が共有メモリを参照している間は閉じられないので先に手放す
+        self.arrays = {}
+        self.memory.close()
+
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink() if self.owner else self.close()
+
+
+class SharedInputs(SharedArrays):
+    """
+    読み込み済みの従業員・スキル・希望シフト・カレンダーを共有メモリに置いたもの
+
+    shift_snapshot.Snapshot と同じ employee_ids / skill_masks / preferences / name / skills_text /
+    iter_preferences を持つので、シフト生成クラスはスナップショットと同じ方法で読み込める。
+    """
+
+    @classmethod
+    def from_snapshot(cls, snapshot, calendar=None):
+        """
+        :param snapshot: shift_snapshot.Snapshot
+        :param calendar: 一緒に共有する CalendarContext（省略可）
+        :return: SharedInputs（owner）
+        """
+        arrays = {
+            'employee_ids': snapshot.employee_ids,
+            'skill_masks': snapshot.skill_masks,
+            'name_offsets': snapshot.name_offsets,
+            'names': np.frombuffer(snapshot.buffer, dtype=np.uint8, count=int(snapshot.name_offsets[-1]),
+                                   offset=snapshot.names_start),
+            'skill_offsets': snapshot.skill_offsets,
+            'skills': np.frombuffer(snapshot.buffer, dtype=np.uint8, count=int(snapshot.skill_offsets[-1]),
+                                    offset=snapshot.skills_start),
+            'preferences': snapshot.preferences,
+        }
+        metadata = {}
+        if calendar is not None:
+            arrays['calendar_weekday'] = calendar.weekday
+            arrays['calendar_holiday'] = calendar.holiday
+            metadata['calendar'] = (calendar.start_date, calendar.end_date)
+        return cls.create(arrays, metadata)
+
+    @classmethod
+    def from_file(cls, source_file, snapshot_file=None, calendar=None):
+        """
+        希望シフトの CSV をスナップショット経由で読み込んで共有メモリに置く
+
+        :param source_file: 希望シフトの CSV ファイル
+        :param snapshot_file: スナップショットのパス（省略時は source_file + '.snap'）
+        :param calendar: 一緒に共有する CalendarContext（省略可）
+        :return: SharedInputs（owner）
+        """
+        snapshot = load_snapshot(source_file, snapshot_file)
+        try:
+            return cls.from_snapshot(snapshot, calendar)
+        finally:
+            snapshot.close()
+
+    @property
+    def handle(self):
+        return SharedInputsHandle(self.memory.name, self.layout, self.metadata)
+
+    @property
+    def employee_ids(self):
+        return self.arrays['employee_ids']
+
+    @property
+    def skill_masks(self):
+        return self.arrays['skill_masks']
+
+    @property
+    def preferences(self):
+        return self.arrays['preferences']
+
+    def _string(self, key, offsets, index):
+        return self.arrays[key][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def name(self, index):
+        return self._string('names', self.arrays['name_offsets'], index)
+
+    def skills_text(self, index):
+        return self._string('skills', self.arrays['skill_offsets'], index)
+
+    def iter_preferences(self):
+        """
+        希望を CSV の順に (従業員の番号, 日付, 開始 time, 終了 time) で返す
+        """
+        for index, ordinal, start, end in self.preferences.tolist():
+            yield (index, datetime.date.fromordinal(ordinal),
+                   datetime.time(start // 60, start % 60), datetime.time(end // 60, end % 60))
+
+    def get_calendar(self):
+        """
+        共有しているカレンダーを CalendarContext にして返す（共有していない場合は None）
+
+        曜日・祝日の配列は共有メモリをそのまま参照する。
+        """
+        if 'calendar' not in self.metadata:
+            return None
+        start_date, end_date = self.metadata['calendar']
+        return CalendarContext(start_date, end_date, self.arrays['calendar_weekday'], self.arrays['calendar_holiday'])
+
+
+class SharedInputsHandle(SharedArraysHandle):
+    def attach(self):
+        return SharedInputs(shared_memory.SharedMemory(name=self.name), self.layout, self.metadata, owner=False)
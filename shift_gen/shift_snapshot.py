@@ -0,0 +1,186 @@
+import csv
+import datetime
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from shift_matrix import skill_mask
+
+MAGIC = b'SHFTSNP1'
+FORMAT_VERSION = 1
+# マジック, 版, 元ファイルの sha256, 更新時刻(ns), サイズ, 従業員数, 希望の行数, 各領域の開始位置 x 7
+HEADER = struct.Struct('<8sI32sqqII7Q')
+ALIGN = 8
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def _pack_strings(values):
+    # 文字列を UTF-8 でつなげ、(開始位置の配列, 本体) にする
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b''.join(encoded)
+
+
+def _minutes(times):
+    # 'H:MM' の Series を 0時からの分にする（欠損は -1）
+    parts = times.str.extract(r'^\s*(\d{1,2}):(\d{2})')
+    minutes = pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])
+    return minutes.fillna(-1).to_numpy(dtype='<i4')
+
+
+def build_snapshot(source_file, snapshot_file):
+    """
+    希望シフトの CSV（従業員ID,name,skills,希望日,出勤時間,退勤時間）をバイナリのスナップショットにする
+
+    従業員は CSV に初めて出てきた順に並べ、ID・スキルのビットマスク・名前・スキルの元の文字列を持つ。
+    希望は出勤・退勤のある行だけを CSV の順に (従業員の番号, 日付の序数, 開始分, 終了分) で持つ。
+
+    :param source_file: 元の CSV ファイル
+    :param snapshot_file: 書き出すスナップショットのパス
+    :return: snapshot_file
+    """
+    stat = os.stat(source_file)
+    df = pd.read_csv(source_file, quoting=csv.QUOTE_ALL, dtype=str, keep_default_na=False)
+
+    codes, ids = pd.factorize(pd.to_numeric(df['従業員ID']), sort=False)
+    first_rows = df.groupby(codes, sort=True).head(1)
+    names = first_rows['name'].tolist()
+    skills = first_rows['skills'].tolist()
+
+    starts = _minutes(df['出勤時間'])
+    ends = _minutes(df['退勤時間'])
+    valid = (starts >= 0) & (ends >= 0)
+    dates = pd.to_datetime(df['希望日'], format='%Y-%m-%d').to_numpy(dtype='datetime64[D]')
+    ordinals = (dates.astype('<i8') + datetime.date(1970, 1, 1).toordinal()).astype('<i4')
+
+    name_offsets, name_blob = _pack_strings(names)
+    skill_offsets, skill_blob = _pack_strings(skills)
+    sections = [
+        np.asarray(ids, dtype='<i8').tobytes(),
+        np.array([skill_mask(text.split(',')) for text in skills], dtype='<u4').tobytes(),
+        name_offsets.tobytes(), name_blob,
+        skill_offsets.tobytes(), skill_blob,
+        np.ascontiguousarray(np.stack([codes[valid], ordinals[valid], starts[valid], ends[valid]], axis=1),
+                             dtype='<i4').tobytes(),
+    ]
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % ALIGN
+        offsets.append(position)
+        position += len(section)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, file_digest(source_file), stat.st_mtime_ns, stat.st_size,
+                         len(ids), int(valid.sum()), *offsets)
+    temp_file = f"{snapshot_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'wb') as file:
+        file.write(header)
+        for offset, section in zip(offsets, sections):
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(section)
+    # 読み込み中の他のプロセスが壊れたファイルを見ないように置き換える
+    os.replace(temp_file, snapshot_file)
+    return snapshot_file
+
+
+class Snapshot:
+    """
+    build_snapshot で作ったファイルを mmap で開いたもの
+
+    配列は np.frombuffer でファイルの領域をそのまま参照する（コピーしない）。
+    読み取り専用の mmap なので、同じファイルを開いた複数のプロセスはページを共有する。
+
+    employee_ids / skill_masks は従業員ごと、preferences は (従業員の番号, 日付の序数, 開始分, 終了分) の行。
+    """
+
+    def __init__(self, snapshot_file):
+        self.snapshot_file = snapshot_file
+        with open(snapshot_file, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.source_digest, self.source_mtime_ns, self.source_size,
+         n_employees, n_preferences, *offsets) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.buffer.close()
+            raise ValueError(f"{snapshot_file} はシフトのスナップショットではありません")
+
+        def array(index, dtype, count):
+            return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offsets[index])
+
+        self.employee_ids = array(0, '<i8', n_employees)
+        self.skill_masks = array(1, '<u4', n_employees)
+        self.name_offsets = array(2, '<i8', n_employees + 1)
+        self.names_start = offsets[3]
+        self.skill_offsets = array(4, '<i8', n_employees + 1)
+        self.skills_start = offsets[5]
+        self.preferences = array(6, '<i4', n_preferences * 4).reshape(n_preferences, 4)
+
+    def _string(self, start, offsets, index):
+        return self.buffer[start + offsets[index]:start + offsets[index + 1]].decode('utf-8')
+
+    def name(self, index):
+        return self._string(self.names_start, self.name_offsets, index)
+
+    def skills_text(self, index):
+        # CSV の skills 列そのまま（区切り方は読み込む側に合わせる）
+        return self._string(self.skills_start, self.skill_offsets, index)
+
+    def matches(self, source_file):
+        """
+        スナップショットが元のファイルから作られたものかどうか
+
+        サイズと更新時刻が同じならそのまま使い、更新時刻だけ違う場合は sha256 で確かめる。
+        """
+        stat = os.stat(source_file)
+        if stat.st_size != self.source_size:
+            return False
+        if stat.st_mtime_ns == self.source_mtime_ns:
+            return True
+        return file_digest(source_file) == self.source_digest
+
+    def iter_preferences(self):
+        """
+        希望を CSV の順に (従業員の番号, 日付, 開始 time, 終了 time) で返す
+        """
+        for index, ordinal, start, end in self.preferences.tolist():
+            yield (index, datetime.date.fromordinal(ordinal),
+                   datetime.time(start // 60, start % 60), datetime.time(end // 60, end % 60))
+
+    def close(self):
+        # 配列が mmap を参照している間は閉じられないので先に手放す
+        self.employee_ids = self.skill_masks = self.name_offsets = self.skill_offsets = self.preferences = None
+        self.buffer.close()
+
+
+def load_snapshot(source_file, snapshot_file=None):
+    """
+    元のファイルに対応するスナップショットを開く。ない・古い場合は作り直す
+
+    :param source_file: 元の CSV ファイル
+    :param snapshot_file: スナップショットのパス（省略時は source_file + '.snap'）
+    :return: Snapshot
+    """
+    snapshot_file = snapshot_file or f"{source_file}.snap"
+    if os.path.exists(snapshot_file):
+        try:
+            snapshot = Snapshot(snapshot_file)
+        except (ValueError, struct.error):
+            snapshot = None
+        if snapshot is not None:
+            if snapshot.matches(source_file):
+                return snapshot
+            snapshot.close()
+    build_snapshot(source_file, snapshot_file)
+    return Snapshot(snapshot_file)
@@ -0,0 +1,180 @@
+import sqlite3
+import json
+import datetime
+from collections import defaultdict
+
+
+class ScheduleStore:
+    """
+    生成したシフトを SQLite に保存・読み込みするクラス
+
+    assignments テーブルに割り当て、shortages テーブルに人員・スキル不足を保存する。
+    時刻は 0時からの分数で保存する。
+    """
+
+    def __init__(self, db_file='shiftlist.db'):
+        self.conn = sqlite3.connect(db_file)
+        self.create_tables()
+
+    def create_tables(self):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            work_date TEXT NOT NULL,
+            employee_id INTEGER NOT NULL,
+            name TEXT,
+            shift_name TEXT,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            break_minutes INTEGER
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shortages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            work_date TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            period TEXT NOT NULL,
+            shortage INTEGER NOT NULL
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS carry_over (
+            employee_id INTEGER PRIMARY KEY,
+            last_date TEXT NOT NULL,
+            streak INTEGER NOT NULL,
+            last_end INTEGER,
+            hours TEXT NOT NULL
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_date ON assignments (work_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_employee ON assignments (employee_id, work_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_shortages_date ON shortages (work_date)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def write_run(self, start_date, end_date, days):
+        """
+        1回分の生成結果を1トランザクションで保存する
+
+        期間内に保存済みの結果は削除してから書き込む。days はイテレータでもよいので、
+        iter_shifts の結果をそのまま流し込める。
+
+        :param start_date: 期間の開始日
+        :param end_date: 期間の終了日
+        :param days: (日付, 割り当て行のリスト, 不足行のリスト) のイテラブル
+                     割り当て行は get_assignment_rows の形式、不足行は (種別, 時間帯, 不足人数)
+        :return: 保存した割り当ての件数
+        """
+        count = 0
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM assignments WHERE work_date BETWEEN ? AND ?",
+                           (start_date.isoformat(), end_date.isoformat()))
+            cursor.execute("DELETE FROM shortages WHERE work_date BETWEEN ? AND ?",
+                           (start_date.isoformat(), end_date.isoformat()))
+            for date, assignment_rows, shortage_rows in days:
+                cursor.executemany("""
+                INSERT INTO assignments (work_date, employee_id, name, shift_name, start_minute, end_minute, break_minutes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [(row_date.isoformat(), emp_id, name, shift_name, start, end, break_time)
+                      for row_date, emp_id, name, shift_name, start, end, break_time in assignment_rows])
+                cursor.executemany("""
+                INSERT INTO shortages (work_date, kind, period, shortage)
+                VALUES (?, ?, ?, ?)
+                """, [(date.isoformat(), kind, period, shortage) for kind, period, shortage in shortage_rows])
+                count += len(assignment_rows)
+        return count
+
+    def save_generated(self, generator, start_date, end_date):
+        """
+        generator.iter_shifts でシフトを生成しながら保存する
+
+        :param generator: iter_shifts と get_assignment_rows を持つシフト生成クラスのインスタンス
+        :return: 保存した割り当ての件数
+        """
+        days = ((date, generator.get_assignment_rows(date, day_shifts), shortage_rows(shortages, skill_shortages))
+                for date, day_shifts, shortages, skill_shortages in generator.iter_shifts(start_date, end_date))
+        count = self.write_run(start_date, end_date, days)
+        if hasattr(generator, 'get_carry_over'):
+            self.write_carry_over(generator.get_carry_over(end_date))
+        return count
+
+    def write_carry_over(self, states):
+        """
+        従業員ごとの引き継ぎ状態を保存する
+
+        :param states: {従業員ID: {'last_date', 'streak', 'last_end', 'hours'}} の辞書
+                       hours は {日付: 勤務時間} で、last_date までの直近7日分
+        """
+        with self.conn:
+            self.conn.executemany("""
+            INSERT OR REPLACE INTO carry_over (employee_id, last_date, streak, last_end, hours)
+            VALUES (?, ?, ?, ?, ?)
+            """, [(emp_id, state['last_date'].isoformat(), state['streak'], state['last_end'],
+                   json.dumps({date.isoformat(): hours for date, hours in state['hours'].items()}))
+                  for emp_id, state in states.items()])
+
+    def read_carry_over(self):
+        """
+        保存済みの引き継ぎ状態を読み込む
+
+        :return: write_carry_over に渡したものと同じ形式の辞書
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT employee_id, last_date, streak, last_end, hours FROM carry_over")
+        states = {}
+        for emp_id, last_date, streak, last_end, hours in cursor.fetchall():
+            states[emp_id] = {
+                'last_date': datetime.date.fromisoformat(last_date),
+                'streak': streak,
+                'last_end': last_end,
+                'hours': {datetime.date.fromisoformat(date): value for date, value in json.loads(hours).items()},
+            }
+        return states
+
+    def read_assignments(self, start_date, end_date):
+        """
+        期間内の割り当てを日付順に読み込む
+
+        :return: get_assignment_rows と同じ形式の行のリスト
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT work_date, employee_id, name, shift_name, start_minute, end_minute, break_minutes
+        FROM assignments
+        WHERE work_date BETWEEN ? AND ?
+        ORDER BY work_date, id
+        """, (start_date.isoformat(), end_date.isoformat()))
+        return [(datetime.date.fromisoformat(row[0]),) + tuple(row[1:]) for row in cursor.fetchall()]
+
+    def read_shortages(self, start_date, end_date):
+        """
+        期間内の不足情報を読み込む
+
+        :return: 人員不足情報、スキル不足情報（generate_shifts の戻り値と同じ形式）
+        """
+        shortages = defaultdict(lambda: defaultdict(int))
+        skill_shortages = defaultdict(lambda: defaultdict(int))
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT work_date, kind, period, shortage
+        FROM shortages
+        WHERE work_date BETWEEN ? AND ?
+        ORDER BY work_date, id
+        """, (start_date.isoformat(), end_date.isoformat()))
+        for work_date, kind, period, shortage in cursor.fetchall():
+            target = skill_shortages if kind == 'skill' else shortages
+            target[datetime.date.fromisoformat(work_date)][period] = shortage
+        return shortages, skill_shortages
+
+
+def shortage_rows(shortages, skill_shortages):
+    '''
+    1日分の不足情報を (種別, 時間帯, 不足人数) の行にする
+    '''
+    return ([('staff', period, shortage) for period, shortage in shortages.items()] +
+            [('skill', period, shortage) for period, shortage in skill_shortages.items()])
@@ -0,0 +1,48 @@
+import csv
+
+
+def format_minutes(minutes):
+    '''
+    0時からの分数を HH:MM 形式の文字列にする
+    '''
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def stream_shifts_to_csv(generator, start_date, end_date, shifts_file, shortages_file=None):
+    """
+    シフトを1日ずつ生成しながら CSV ファイルに書き出す
+
+    generator.iter_shifts が返す日ごとの結果をその場で書き出すため、期間が長くてもメモリ使用量は一定になる。
+
+    :param generator: iter_shifts と get_assignment_rows を持つシフト生成クラスのインスタンス
+    :param start_date: シフト生成開始日
+    :param end_date: シフト生成終了日
+    :param shifts_file: 割り当てを書き出す CSV ファイルのパス
+    :param shortages_file: 人員・スキル不足を書き出す CSV ファイルのパス（省略可）
+    :return: 書き出した日数
+    """
+    days = 0
+    with open(shifts_file, 'w', newline='', encoding='utf-8') as sf:
+        shift_writer = csv.writer(sf)
+        shift_writer.writerow(['日付', '従業員ID', 'name', 'シフト', '出勤時間', '退勤時間', '休憩'])
+
+        shortage_out = open(shortages_file, 'w', newline='', encoding='utf-8') if shortages_file else None
+        try:
+            shortage_writer = csv.writer(shortage_out) if shortage_out else None
+            if shortage_writer:
+                shortage_writer.writerow(['日付', '種別', '時間帯', '不足人数'])
+
+            for date, day_shifts, shortages, skill_shortages in generator.iter_shifts(start_date, end_date):
+                for row_date, emp_id, name, shift_name, start, end, break_time in generator.get_assignment_rows(date, day_shifts):
+                    shift_writer.writerow([row_date.isoformat(), emp_id, name, shift_name or '',
+                                           format_minutes(start), format_minutes(end), break_time])
+                if shortage_writer:
+                    for period, shortage in shortages.items():
+                        shortage_writer.writerow([date.isoformat(), 'staff', period, shortage])
+                    for skill, shortage in skill_shortages.items():
+                        shortage_writer.writerow([date.isoformat(), 'skill', skill, shortage])
+                days += 1
+        finally:
+            if shortage_out:
+                shortage_out.close()
+    return days
@@ -0,0 +1,36 @@
+import csv
+import datetime
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+START_DATE = datetime.date(2024, 7, 1)
+END_DATE = datetime.date(2024, 7, 28)
+SKILLS = ['レジ,品出し', 'レジ,品出し,冷蔵', 'レジ', '品出し,冷蔵']
+INTERVALS = [('09:00', '17:00'), ('12:00', '20:00'), ('09:00', '20:00'), ('14:00', '20:00'), ('09:00', '14:00')]
+
+
+def write_preferences(file_path, employees=20, days=28, seed=0):
+    """
+    shift_generator の形式（従業員ID,name,skills,希望日,出勤時間,退勤時間）の希望シフトを作る
+    """
+    rng = random.Random(seed)
+    with open(file_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(['従業員ID', 'name', 'skills', '希望日', '出勤時間', '退勤時間'])
+        for emp_id in range(1, employees + 1):
+            skills = rng.choice(SKILLS)
+            for day in range(days):
+                if rng.random() < 0.8:
+                    date = START_DATE + datetime.timedelta(days=day)
+                    writer.writerow([emp_id, f'従業員{emp_id}', skills, date.isoformat(), *rng.choice(INTERVALS)])
+    return file_path
+
+
+@pytest.fixture(scope='session')
+def preference_file(tmp_path_factory):
+    return str(write_preferences(tmp_path_factory.mktemp('data') / 'preferences.csv'))
@@ -0,0 +1,53 @@
+import csv
+import datetime
+
+import pytest
+
+from shift_generator import ShiftGenerator
+
+DATE = datetime.date(2024, 7, 2)
+
+
+@pytest.fixture
+def generator(tmp_path):
+    file_path = tmp_path / 'preferences.csv'
+    with open(file_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(['従業員ID', 'name', 'skills', '希望日', '出勤時間', '退勤時間'])
+        writer.writerow([1, '半端', 'レジ', DATE.isoformat(), '08:30', '17:30'])
+        writer.writerow([2, '通し', 'レジ,冷蔵', DATE.isoformat(), '09:00', '20:00'])
+    return ShiftGenerator(str(file_path))
+
+
+def candidate_ids(generator, start_hour, end_hour):
+    return [emp['id'] for emp in generator.get_available_employees(DATE, start_hour, end_hour)]
+
+
+def assign(generator, emp_id, shift_name):
+    start_hour, end_hour = generator.get_shift_hours(shift_name)
+    employee = next(emp for emp in generator.employees if emp['id'] == emp_id)
+    generator.shifts[DATE][shift_name].append({'employee': employee, 'start': start_hour, 'end': end_hour, 'break': 0})
+    generator.touch_ledger(DATE)
+
+
+@pytest.mark.parametrize('use_matrix, expected', [(False, [2]), (True, [1, 2])])
+def test_matrix_checks_overlap_in_minutes(generator, use_matrix, expected):
+    # 8:30-17:30 の希望は、従来の判定（時の単位）では夜 17-20 と重ならない
+    generator.use_availability_matrix = use_matrix
+    assert candidate_ids(generator, 17, 20) == expected
+
+
+@pytest.mark.parametrize('use_matrix, expected', [(False, [2]), (True, [])])
+def test_matrix_enforces_daily_cap(generator, use_matrix, expected):
+    # 朝 5時間 + 昼 3時間 で上限の8時間に達しているので、行列での判定では夜の候補にならない
+    generator.use_availability_matrix = use_matrix
+    assign(generator, 2, '朝')
+    assign(generator, 2, '昼')
+    assert [emp_id for emp_id in candidate_ids(generator, 17, 20) if emp_id == 2] == expected
+
+
+def test_availability_cache_is_bounded(generator):
+    generator.use_availability_matrix = True
+    for n in range(100):
+        generator.get_day_availability(DATE + datetime.timedelta(days=n))
+    assert len(generator.availability_cache) <= generator.availability_cache.maxsize
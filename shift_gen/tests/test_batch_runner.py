@@ -0,0 +1,28 @@
+import datetime
+
+import batch_runner
+
+CRASHING_MODULE = '''import os
+
+
+class ShiftGenerator:
+    def __init__(self, data_file):
+        os._exit(1)  # ワーカープロセスごと落ちる
+'''
+
+
+def test_worker_crash_fails_only_that_store(tmp_path, preference_file, monkeypatch):
+    (tmp_path / 'crashing_generator.py').write_text(CRASHING_MODULE, encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def store(name, generator='shift_generator'):
+        return {'name': name, 'data_file': preference_file, 'generator': generator,
+                'start_date': datetime.date(2024, 7, 1), 'end_date': datetime.date(2024, 7, 3)}
+
+    stores = [store('a'), store('crash', 'crashing_generator'), store('c'), store('d'), store('e', 'shift_generator2')]
+    results = batch_runner.run_batch(stores, str(tmp_path / 'out'), max_workers=2)
+
+    status = {result['store']: result['status'] for result in results}
+    assert status == {'a': 'ok', 'crash': 'error', 'c': 'ok', 'd': 'ok', 'e': 'ok'}
+    summary = (tmp_path / 'out' / 'summary.jsonl').read_text(encoding='utf-8').splitlines()
+    assert len(summary) == len(stores)
@@ -0,0 +1,99 @@
+import itertools
+import random
+from collections import defaultdict
+
+from conftest import END_DATE, START_DATE, write_preferences
+from shift_coverage import break_positions, coverage_profile, place_breaks
+from shift_generator import ShiftGenerator
+
+
+def entry(employee_id, start_hour, end_hour):
+    return {'employee': {'id': employee_id, 'name': str(employee_id), 'skills': []},
+            'start': start_hour, 'end': end_hour, 'break': 0}
+
+
+def test_count_on_floor_uses_breaks_of_merged_shifts(preference_file):
+    generator = ShiftGenerator(preference_file)
+    evening = [entry(1, 17, 20), entry(2, 17, 20)]
+    # 3時間の枠だけなら休憩はない
+    assert generator.count_on_floor(evening, 17, 20) == 2
+    # 1人目が昼から続けて入ると 14:00-20:00 で30分の休憩があり、1人しかいない昼には置けないので夜にかかる
+    assert generator.count_on_floor(evening, 17, 20, [entry(1, 14, 17)]) == 1
+
+
+def test_generated_slots_keep_required_staff_on_floor(preference_file):
+    generator = ShiftGenerator(preference_file)
+    result = generator.generate_shifts(START_DATE, END_DATE, quiet=True)
+    for date, day_shifts in result.assignments.items():
+        for shift_name in ['朝', '昼', '夜']:
+            assigned_employees = day_shifts[shift_name]
+            if not assigned_employees:
+                continue
+            start_hour, end_hour = generator.get_shift_hours(shift_name)
+            others = [emp for other, shift in day_shifts.items() if other != shift_name for emp in shift]
+            if generator.count_on_floor(assigned_employees, start_hour, end_hour, others, date) >= \
+                    generator.get_required_cashiers(date, shift_name):
+                continue
+            # 休憩を置くと必要人数を割る枠は、補助が上限に達しているか、入れる人がもういない場合だけ
+            assigned_ids = {emp['employee']['id'] for emp in assigned_employees}
+            support = sum(1 for emp in assigned_employees if emp.get('role') == '補助')
+            candidates = [emp for emp in generator.get_available_employees(date, start_hour, end_hour)
+                          if emp['id'] not in assigned_ids and generator.calculate_daily_hours(emp, date)
+                          + (end_hour - start_hour) <= generator.MAX_DAILY_HOURS]
+            assert support >= 2 or not candidates, (date, shift_name)
+
+
+def test_break_cover_keeps_flow_within_daily_hours(tmp_path):
+    # 人の少ない店では休憩回しの補助が足りなくなりやすく、最後の補助の追加が上限時間を超えやすい
+    generator = ShiftGenerator(str(write_preferences(tmp_path / 'preferences.csv', employees=8, seed=8)))
+    generator.day_engine = 'flow'
+    result = generator.generate_shifts(START_DATE, END_DATE, quiet=True)
+    for date, day_shifts in result.assignments.items():
+        daily_hours = defaultdict(int)
+        for shift in day_shifts.values():
+            for emp in shift:
+                daily_hours[emp['employee']['id']] += emp['end'] - emp['start']
+        assert max(daily_hours.values(), default=0) <= generator.MAX_DAILY_HOURS, date
+
+
+def best_minimum(shifts, day_start, day_end, demand):
+    # 置ける位置をすべて試したときの 売り場の人数 - 必要人数 の最小値の最大
+    profile = coverage_profile([(start, end) for _, start, end, _ in shifts], day_start, day_end)
+    breaks = break_positions(shifts, day_start, len(profile))
+    best = None
+    for combination in itertools.product(*[candidates for _, _, candidates in breaks]):
+        floor = list(profile)
+        for (_, length, _), position in zip(breaks, combination):
+            for i in range(position, position + length):
+                floor[i] -= 1
+        value = min(count - need for count, need in zip(floor, demand))
+        best = value if best is None else max(best, value)
+    return best
+
+
+def test_place_breaks_maximises_minimum_on_floor():
+    # 長い休憩から順に置くだけの貪欲法では、後から置く短いシフトの休憩が重なって0人になる
+    _, floor = place_breaks([(0, 15, 345, 45), (1, 0, 180, 30)], 0, 345)
+    assert min(floor) == 1
+
+    rng = random.Random(0)
+    for _ in range(300):
+        shifts = []
+        for key in range(rng.randint(1, 5)):
+            start = rng.randrange(0, 300, 15)
+            shifts.append((key, start, start + rng.randrange(60, 420, 15), rng.choice([0, 30, 45, 60])))
+        day_start = min(start for _, start, _, _ in shifts)
+        day_end = max(end for _, _, end, _ in shifts)
+        size = len(coverage_profile([], day_start, day_end))
+        demand = [0] * size if rng.random() < 0.5 else [rng.randint(0, 2) for _ in range(size)]
+        breaks, floor = place_breaks(shifts, day_start, day_end, demand=demand)
+        assert min(count - need for count, need in zip(floor, demand)) == \
+            best_minimum(shifts, day_start, day_end, demand), shifts
+        # 返した休憩開始から数え直しても同じ人数になる
+        recount = coverage_profile([(start, end) for _, start, end, _ in shifts], day_start, day_end)
+        for key, start, end, break_minutes in shifts:
+            if key in breaks:
+                first = (breaks[key] - day_start) // 15
+                for i in range(first, first + -(-break_minutes // 15)):
+                    recount[i] -= 1
+        assert recount == floor
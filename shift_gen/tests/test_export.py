@@ -0,0 +1,40 @@
+import csv
+import datetime
+from collections import defaultdict
+
+from conftest import START_DATE
+from shift_auditor import ScheduleArrays
+from shift_export import export_wide_csv
+from shift_generator import ShiftGenerator
+
+
+def test_split_day_is_exported_as_separate_intervals(preference_file, tmp_path):
+    generator = ShiftGenerator(preference_file)
+    split_employee, full_employee = generator.employees[0], generator.employees[1]
+    next_day = START_DATE + datetime.timedelta(days=1)
+
+    def entry(employee, shift_name):
+        start_hour, end_hour = generator.get_shift_hours(shift_name)
+        return {'employee': employee, 'start': start_hour, 'end': end_hour, 'break': 0}
+
+    # 1人目は朝と夜（間の昼は休み）、2人目は朝から夜まで続けて入る
+    assignments = {
+        START_DATE: defaultdict(list, {
+            '朝': [entry(split_employee, '朝'), entry(full_employee, '朝')],
+            '昼': [entry(full_employee, '昼')],
+            '夜': [entry(split_employee, '夜'), entry(full_employee, '夜')],
+        }),
+        next_day: defaultdict(list, {'昼': [entry(split_employee, '昼')]}),
+    }
+    file_path = tmp_path / 'wide.csv'
+    export_wide_csv(generator, assignments, file_path)
+
+    with open(file_path, encoding='utf-8-sig') as file:
+        rows = {row[0]: row[3:] for row in csv.reader(file)}
+    assert rows[str(split_employee['id'])] == ['9:00-14:00/17:00-20:00', '14:00-17:00']
+    assert rows[str(full_employee['id'])] == ['9:00-20:00', '休み']
+
+    # 書き出したファイルを読み直しても間の休みは勤務時間に入らない
+    schedule = ScheduleArrays.from_wide_csv(file_path)
+    row = list(schedule.employee_ids).index(split_employee['id'])
+    assert (schedule.start[row, 0], schedule.end[row, 0], schedule.work[row, 0]) == (9 * 60, 20 * 60, 8 * 60)
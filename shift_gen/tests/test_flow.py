@@ -0,0 +1,78 @@
+import datetime
+import itertools
+import random
+
+import pytest
+
+from conftest import START_DATE, write_preferences
+from shift_flow import assign_day
+from shift_generator import ShiftGenerator
+
+SLOTS = ['朝', '昼', '夜']
+QUOTAS = {('夜', '冷蔵'): 1}
+
+
+def objective(assigned, scores, employee_skills):
+    # assign_day の優先順位（スキルの必要人数 > 埋まる席の数 > 点数の合計）を比べられる形にする
+    quota = sum(min(count, sum(1 for emp_id in assigned[slot] if skill in employee_skills[emp_id]))
+                for (slot, skill), count in QUOTAS.items())
+    seats = sum(len(emp_ids) for emp_ids in assigned.values())
+    score = sum(scores[(emp_id, slot)] for slot, emp_ids in assigned.items() for emp_id in emp_ids)
+    return quota, seats, score
+
+
+def brute_force(candidates, scores, required, capacity, employee_skills):
+    # 従業員ごとに入る時間帯の組み合わせをすべて試す
+    employees = sorted({emp_id for emp_ids in candidates.values() for emp_id in emp_ids})
+    choices = []
+    for emp_id in employees:
+        slots = [slot for slot in SLOTS if emp_id in candidates[slot]]
+        choices.append([subset for size in range(min(capacity[emp_id], len(slots)) + 1)
+                        for subset in itertools.combinations(slots, size)])
+    best = None
+    for combination in itertools.product(*choices):
+        assigned = {slot: [] for slot in SLOTS}
+        for emp_id, subset in zip(employees, combination):
+            for slot in subset:
+                assigned[slot].append(emp_id)
+        if any(len(assigned[slot]) > required[slot] for slot in SLOTS):
+            continue
+        value = objective(assigned, scores, employee_skills)
+        best = value if best is None else max(best, value)
+    return best
+
+
+def test_assign_day_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        employees = list(range(1, rng.randint(2, 5) + 1))
+        candidates = {slot: [emp_id for emp_id in employees if rng.random() < 0.6] for slot in SLOTS}
+        scores = {(emp_id, slot): rng.randint(-50, 150) for emp_id in employees for slot in SLOTS}
+        required = {slot: rng.randint(1, 3) for slot in SLOTS}
+        capacity = {emp_id: rng.randint(1, 3) for emp_id in employees}
+        employee_skills = {emp_id: {'冷蔵'} if rng.random() < 0.4 else set() for emp_id in employees}
+
+        assigned = assign_day(candidates, scores, required, capacity, employee_skills, QUOTAS)
+        for slot, emp_ids in assigned.items():
+            assert len(emp_ids) <= required[slot]
+            assert set(emp_ids) <= set(candidates[slot])
+        for emp_id in employees:
+            assert sum(emp_id in emp_ids for emp_ids in assigned.values()) <= capacity[emp_id]
+        assert objective(assigned, scores, employee_skills) == \
+            brute_force(candidates, scores, required, capacity, employee_skills)
+
+
+@pytest.mark.parametrize('enforce_daily_hours', [True, False])
+def test_flow_engine_shortage_not_worse_than_greedy(tmp_path, enforce_daily_hours):
+    end_date = START_DATE + datetime.timedelta(days=13)
+    for employees in (6, 8, 10):
+        for seed in range(3):
+            file_path = str(write_preferences(tmp_path / f'{employees}_{seed}.csv', employees, days=14, seed=seed))
+            shortage = {}
+            for day_engine in ('greedy', 'flow'):
+                generator = ShiftGenerator(file_path)
+                generator.day_engine = day_engine
+                generator.enforce_daily_hours = enforce_daily_hours
+                result = generator.generate_shifts(START_DATE, end_date, quiet=True)
+                shortage[day_engine] = sum(sum(day.values()) for day in result.shortages.values())
+            assert shortage['flow'] <= shortage['greedy'], (employees, seed, shortage)
@@ -0,0 +1,71 @@
+import datetime
+import sqlite3
+
+import pytest
+
+# ortools は tensorflow より先に読み込む（逆の順だと CP-SAT の求解中に落ちる）
+pytest.importorskip('ortools.sat.python.cp_model')
+pytest.importorskip('tensorflow')
+
+from shift_AIgenerator import Employee, ShiftAI  # noqa: E402
+
+SHIFTS = [(datetime.time(9), datetime.time(14)), (datetime.time(14), datetime.time(20))]
+FIRST_DATE = datetime.date(2024, 7, 1)
+
+
+def write_history(db_file, days):
+    conn = sqlite3.connect(db_file)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS shifts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER,
+        name TEXT NOT NULL,
+        skills TEXT,
+        desired_date DATE,
+        clock_in TEXT,
+        clock_out TEXT
+    )
+    """)
+    conn.execute("DELETE FROM shifts")
+    for day in range(days):
+        date = (FIRST_DATE + datetime.timedelta(days=day)).isoformat()
+        for emp_id in range(1, 4):
+            clock_in, clock_out = ('09:00', '14:00') if (emp_id + day) % 2 else ('14:00', '20:00')
+            conn.execute("INSERT INTO shifts (employee_id, name, skills, desired_date, clock_in, clock_out) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (emp_id, f'従業員{emp_id}', 'レジ,冷蔵', date, clock_in, clock_out))
+    conn.commit()
+    conn.close()
+
+
+def test_refresh_model_validates_on_days_it_did_not_fit(tmp_path):
+    db_file = str(tmp_path / 'history.db')
+    checkpoint_dir = str(tmp_path / 'checkpoint')
+    employees = [Employee(emp_id, f'従業員{emp_id}', ['レジ', '冷蔵'], None, None, None) for emp_id in range(1, 4)]
+    shift_ai = ShiftAI(employees, SHIFTS, {'required_staff': 2}, {}, train=False)
+    datasets, evaluated = [], []
+    make_dataset, evaluate_range = shift_ai.make_dataset, shift_ai.evaluate_range
+
+    def record_dataset(db, date_range=None, *args, **kwargs):
+        datasets.append(date_range)
+        return make_dataset(db, date_range, *args, **kwargs)
+
+    def record_evaluation(db, date_range, *args, **kwargs):
+        evaluated.append(date_range)
+        return evaluate_range(db, date_range, *args, **kwargs)
+
+    shift_ai.make_dataset = record_dataset
+    shift_ai.evaluate_range = record_evaluation
+
+    write_history(db_file, 10)
+    assert shift_ai.refresh_model(db_file, checkpoint_dir, full_epochs=1)['mode'] == 'full'
+
+    write_history(db_file, 15)
+    datasets.clear()
+    evaluated.clear()
+    result = shift_ai.refresh_model(db_file, checkpoint_dir, drift_tolerance=100)
+    assert result['mode'] == 'fine_tune'
+    assert evaluated == [(datetime.date(2024, 7, 9), datetime.date(2024, 7, 15))]
+    # 追加学習に使うのは前回検証用に残した日から、今回の検証の期間の前日まで
+    assert [date_range for date_range in datasets if date_range not in evaluated] == \
+        [(datetime.date(2024, 7, 4), datetime.date(2024, 7, 8))]
+    assert result['days'] == 5
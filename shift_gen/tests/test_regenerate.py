@@ -0,0 +1,74 @@
+import datetime
+import random
+
+import pytest
+
+from conftest import END_DATE, START_DATE
+from shift_generator import ShiftGenerator
+
+
+def snapshot(generator):
+    return {date: {shift_name: [(emp['employee']['id'], emp['start'], emp['end']) for emp in shift]
+                   for shift_name, shift in generator.shifts[date].items()}
+            for date in sorted(generator.shifts)}
+
+
+def random_edits(generator, rng, count):
+    ids = [emp['id'] for emp in generator.employees]
+    edits = []
+    for _ in range(count):
+        emp_id = rng.choice(ids)
+        date = START_DATE + datetime.timedelta(days=rng.randint(0, (END_DATE - START_DATE).days))
+        intervals = rng.choice([
+            [],
+            [(datetime.time(9), datetime.time(14))],
+            [(datetime.time(12), datetime.time(20))],
+            list(generator.preferences[emp_id].get(date, [])),
+        ])
+        edits.append((emp_id, date, intervals))
+    return edits
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_regenerate_dirty_matches_full_run(preference_file, seed):
+    rng = random.Random(seed)
+    generator = ShiftGenerator(preference_file)
+    generator.generate_shifts(START_DATE, END_DATE, quiet=True)
+    edits = random_edits(generator, rng, rng.randint(1, 4))
+    for emp_id, date, intervals in edits:
+        generator.set_employee_preference(emp_id, date, intervals)
+    generator.regenerate_dirty()
+
+    expected = ShiftGenerator(preference_file)
+    for emp_id, date, intervals in edits:
+        expected.set_employee_preference(emp_id, date, intervals)
+    expected.generate_shifts(START_DATE, END_DATE, quiet=True)
+
+    assert snapshot(generator) == snapshot(expected)
+    assert generator.day_results == expected.day_results
+    assert not generator.dirty_dates
+
+
+def test_unchanged_preference_regenerates_only_that_day(preference_file):
+    generator = ShiftGenerator(preference_file)
+    generator.generate_shifts(START_DATE, END_DATE, quiet=True)
+    before = snapshot(generator)
+    date = START_DATE + datetime.timedelta(days=2)
+    emp_id = generator.employees[0]['id']
+    generator.set_employee_preference(emp_id, date, list(generator.preferences[emp_id].get(date, [])))
+
+    assert generator.regenerate_dirty() == [date]
+    assert snapshot(generator) == before
+
+@pytest.mark.parametrize('window_days', [1, 3, 7])
+def test_iter_shifts_window_matches_full_run(preference_file, window_days):
+    full = ShiftGenerator(preference_file)
+    expected = {date: {name: [emp['employee']['id'] for emp in shift] for name, shift in day_shifts.items()}
+                for date, day_shifts, _, _ in full.iter_shifts(START_DATE, END_DATE, window_days=None)}
+    windowed = ShiftGenerator(preference_file)
+    actual = {date: {name: [emp['employee']['id'] for emp in shift] for name, shift in day_shifts.items()}
+              for date, day_shifts, _, _ in windowed.iter_shifts(START_DATE, END_DATE, window_days=window_days)}
+
+    assert actual == expected
+    assert len(windowed.shifts) <= window_days
+    assert len(windowed.ledger_versions) <= window_days
@@ -0,0 +1,45 @@
+import datetime
+
+from conftest import END_DATE, START_DATE
+from shift_generator import ShiftGenerator
+
+
+def assignments(generator):
+    return {date: {shift_name: [emp['employee']['id'] for emp in shift] for shift_name, shift in day_shifts.items()}
+            for date, day_shifts in generator.shifts.items()}
+
+
+def test_scenario_edits_do_not_leak_into_base(preference_file):
+    base = ShiftGenerator(preference_file)
+    emp_id = base.employees[0]['id']
+    date = START_DATE + datetime.timedelta(days=3)
+    original = list(base.preferences[emp_id].get(date, []))
+
+    scenario = base.copy_for_scenario()
+    scenario.set_employee_preference(emp_id, date, [(datetime.time(9), datetime.time(12))])
+    scenario.add_holiday(date)
+    scenario.set_staffing('朝', min_employees=7)
+    scenario.generate_shifts(START_DATE, END_DATE, quiet=True)
+
+    assert base.preferences[emp_id].get(date, []) == original
+    assert base.custom_holidays == set()
+    assert base.min_employees['朝'] == 5
+
+    # 後から作るシナリオにも元のままの入力が渡る
+    later = base.copy_for_scenario()
+    later.generate_shifts(START_DATE, END_DATE, quiet=True)
+    fresh = ShiftGenerator(preference_file)
+    fresh.generate_shifts(START_DATE, END_DATE, quiet=True)
+    assert assignments(later) == assignments(fresh)
+
+
+def test_base_edits_do_not_leak_into_existing_scenario(preference_file):
+    base = ShiftGenerator(preference_file)
+    emp_id = base.employees[0]['id']
+    date = START_DATE + datetime.timedelta(days=3)
+    original = list(base.preferences[emp_id].get(date, []))
+
+    scenario = base.copy_for_scenario()
+    base.set_employee_preference(emp_id, date, [])
+
+    assert scenario.preferences[emp_id].get(date, []) == original
@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+import sys
+import threading
+import time
+
+from conftest import START_DATE
+from shift_cache import LRUCache
+from shift_generator import ShiftGenerator
+from shift_service import ShiftService, request_shifts
+
+
+class SharedGenerator:
+    """
+    iter_shifts を持たない（ShiftAI と同じ経路を通る）生成クラス。同時に呼ばれた数を数える
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def generate_shifts(self, date):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return {}
+
+
+def test_shared_generator_is_not_called_concurrently():
+    generator = SharedGenerator()
+    service = ShiftService(generator, max_workers=4)
+    start_date = datetime.date(2024, 7, 1)
+
+    async def request_all():
+        return await asyncio.gather(*[service.get_schedule(start_date, start_date + datetime.timedelta(days=i))
+                                      for i in range(4)])
+
+    try:
+        responses = asyncio.run(request_all())
+    finally:
+        service.executor.shutdown()
+    assert [len(response['days']) for response in responses] == [1, 2, 3, 4]
+    assert generator.peak == 1
+
+
+def test_scenario_generators_share_cache_across_workers(preference_file):
+    generator = ShiftGenerator(preference_file)
+    ranges = [(START_DATE + datetime.timedelta(days=i), START_DATE + datetime.timedelta(days=i + 13)) for i in range(8)]
+    expected = [ShiftService(ShiftGenerator(preference_file)).compute(*date_range) for date_range in ranges]
+
+    # 候補者のキャッシュは全リクエストで共有されるので、小さくして追い出しと読み書きを同時に起こす
+    generator.candidate_cache.maxsize = 16
+    service = ShiftService(generator, max_workers=4)
+
+    async def request_all():
+        return await asyncio.gather(*[service.get_schedule(*date_range) for date_range in ranges])
+
+    # スレッドの切り替えを細かくして、キャッシュの操作の途中で切り替わるようにする
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        responses = asyncio.run(request_all())
+    finally:
+        sys.setswitchinterval(switch_interval)
+        service.executor.shutdown()
+    assert service.computations == len(ranges)
+    assert responses == expected
+
+
+
+def test_lru_cache_can_be_shared_between_threads():
+    # ロックがないと discard_if の走査中に他のスレッドが put して RuntimeError になる
+    cache = LRUCache(maxsize=8)
+    errors = []
+
+    def work(seed):
+        try:
+            for i in range(20000):
+                key = (seed * 7 + i) % 24
+                assert cache.get_or_compute(key, lambda: key) == key
+                if i % 50 == 0:
+                    cache.discard_if(lambda cached: cached % 4 == seed)
+        except Exception as e:
+            errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert len(cache) == 8
+
+def test_request_shifts_round_trip(preference_file):
+    service = ShiftService(ShiftGenerator(preference_file))
+    end_date = START_DATE + datetime.timedelta(days=2)
+
+    async def round_trip():
+        port = await service.start()
+        try:
+            return (await request_shifts(START_DATE, end_date, port=port),
+                    await request_shifts(end_date, START_DATE, port=port))
+        finally:
+            await service.stop()
+
+    (status, body), (error_status, error_body) = asyncio.run(round_trip())
+    assert status == 200
+    assert body == ShiftService(ShiftGenerator(preference_file)).compute(START_DATE, end_date)
+    assert list(body['days']) == ['2024-07-01', '2024-07-02', '2024-07-03']
+    assert all(day['assignments'] for day in body['days'].values())
+    assert error_status == 400 and 'error' in error_body
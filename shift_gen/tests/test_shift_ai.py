@@ -0,0 +1,148 @@
+import datetime
+
+import pytest
+
+# ortools は tensorflow より先に読み込む（逆の順だと CP-SAT の求解中に落ちる）
+pytest.importorskip('ortools.sat.python.cp_model')
+pytest.importorskip('tensorflow')
+
+from ortools.sat.python import cp_model  # noqa: E402
+
+from shift_AIgenerator import Employee, ShiftAI  # noqa: E402
+
+MORNING = (datetime.time(9), datetime.time(14))
+EVENING = (datetime.time(14), datetime.time(20))
+SHIFTS = [MORNING, EVENING]
+WEEKDAY = datetime.date(2024, 7, 3)
+SATURDAY = datetime.date(2024, 7, 6)
+
+
+def employee(emp_id, shift=None, date=WEEKDAY, skills=('レジ',)):
+    # shift を指定した場合はその日にそのシフトを希望する
+    if shift is None:
+        return Employee(emp_id, f'従業員{emp_id}', list(skills), None, None, None)
+    return Employee(emp_id, f'従業員{emp_id}', list(skills), date.isoformat(),
+                    shift[0].strftime('%H:%M'), shift[1].strftime('%H:%M'))
+
+
+def make_ai(employees, constraints=None, **kwargs):
+    return ShiftAI(employees, SHIFTS, constraints or {'required_staff': 2}, {}, train=False, **kwargs)
+
+
+def optimize(shift_ai, date=WEEKDAY):
+    initial = {e.id: {s: False for s in SHIFTS} for e in shift_ai.employees}
+    return shift_ai.optimize_shifts(date, initial)
+
+
+def solve_fresh(shift_ai, date):
+    # テンプレートを使わず、その日の必要人数で制約を作ったモデルを解く（人数が足りている日用）
+    model = cp_model.CpModel()
+    shifts = {(e.id, s): model.NewBoolVar(f'e{e.id}_s{i}') for e in shift_ai.employees for i, s in enumerate(SHIFTS)}
+    shift_ai.add_constraints(model, shifts, date)
+    model.Maximize(sum(shifts[(e.id, s)] for e in shift_ai.employees if date in e.preferences
+                       for s in SHIFTS if shift_ai.shift_overlaps(s, *e.preferences[date])))
+    solver = cp_model.CpSolver()
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    return shift_ai.extract_solution(solver, shifts)
+
+
+def staffed(solution):
+    return {s: sorted(emp_id for emp_id, assignment in solution.items() if assignment[s]) for s in SHIFTS}
+
+
+@pytest.mark.parametrize('crowded', [MORNING, EVENING])
+def test_short_day_splits_staff_by_preferences(crowded):
+    # 3人で必要人数 2+2 は満たせない。事前チェックの最大流はどちらかのシフトに2人を割り当てるが、
+    # その配分に固定すると、もう一方のシフトを希望する2人のどちらかが希望外のシフトに回される
+    other = EVENING if crowded == MORNING else MORNING
+    shift_ai = make_ai([employee(1, other), employee(2, crowded), employee(3, crowded)])
+    assert shift_ai.check_feasibility(WEEKDAY).total_shortage == 1
+
+    assert staffed(optimize(shift_ai)) == {other: [1], crowded: [2, 3]}
+
+
+def test_full_day_keeps_required_staff_per_shift():
+    shift_ai = make_ai([employee(1, MORNING), employee(2, MORNING), employee(3, MORNING), employee(4, EVENING)])
+    assignment = staffed(optimize(shift_ai))
+    assert [len(assignment[s]) for s in SHIFTS] == [2, 2]
+    assert 4 in assignment[EVENING]
+
+
+def test_template_matches_fresh_model_across_required_staff():
+    # 平日は1人ずつ、土曜は2人ずつ。どちらの日も希望者が多いシフトがあり、希望どおりに入れる
+    # heuristic_adjustment（求解に失敗した場合）の結果とは人数が変わる。
+    # 土曜は希望者だけでは朝が埋まらないので、合計の下限が書き換わっていないと人数が足りなくなる
+    employees = [employee(1, MORNING), employee(2, EVENING), employee(3, EVENING), employee(4), employee(5)]
+    for emp_id, shift in ((1, EVENING), (2, EVENING), (3, MORNING), (5, EVENING)):
+        employees[emp_id - 1].preferences[SATURDAY] = shift
+    constraints = {'required_staff': 1, 'busy_required_staff': 2}
+    shift_ai = make_ai(employees, constraints)
+
+    def summary(date, solution):
+        # シフトごとの人数と、満たした希望の数
+        met = sum(solution[e.id][s] for e in employees if date in e.preferences
+                  for s in SHIFTS if shift_ai.shift_overlaps(s, *e.preferences[date]))
+        return [len(emp_ids) for emp_ids in staffed(solution).values()], met
+
+    # 同じテンプレートの範囲を 1人 → 2人 → 1人 と書き換えても、その日の人数で作ったモデルと同じ結果になる
+    template = shift_ai.get_cp_template()
+    for date, expected in ((WEEKDAY, ([1, 1], 2)), (SATURDAY, ([2, 2], 3)), (WEEKDAY, ([1, 1], 2))):
+        solution = optimize(shift_ai, date)
+        assert shift_ai.get_cp_template() is template
+        assert summary(date, solution) == summary(date, solve_fresh(shift_ai, date)) == expected
+
+
+def roster():
+    return [employee(1, MORNING), employee(2, EVENING), employee(3, EVENING), employee(4)]
+
+
+def test_solution_cache_returns_copies_of_hits():
+    shift_ai = make_ai(roster(), {'required_staff': 1})
+    first = shift_ai.generate_shifts(WEEKDAY)
+    expected = staffed(first)
+    first[4][MORNING] = not first[4][MORNING]
+
+    assert staffed(shift_ai.generate_shifts(WEEKDAY)) == expected
+    stats = shift_ai.solution_cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_solution_cache_is_invalidated_by_model_and_constraints(tmp_path):
+    shift_ai = make_ai(roster(), {'required_staff': 1})
+    shift_ai.generate_shifts(WEEKDAY)
+    key = shift_ai.solution_key(WEEKDAY)
+
+    # 学習し直した（別の重みを読み込んだ）モデルでは、前のモデルの結果を返さない
+    make_ai(roster()).save_checkpoint(str(tmp_path), WEEKDAY, 0.0, 0.0)
+    assert shift_ai.load_checkpoint(str(tmp_path)) is not None
+    assert shift_ai.solution_key(WEEKDAY) != key
+    shift_ai.generate_shifts(WEEKDAY)
+    assert shift_ai.solution_cache_stats()['misses'] == 2
+
+    # 必要人数を変えたら、前の人数の結果ではなく新しい人数で解き直す
+    shift_ai.constraints['required_staff'] = 2
+    assert [len(emp_ids) for emp_ids in staffed(shift_ai.generate_shifts(WEEKDAY)).values()] == [2, 2]
+    stats = shift_ai.solution_cache_stats()
+    assert (stats['hits'], stats['misses']) == (0, 3)
+
+
+def test_solution_cache_is_saved_to_file(tmp_path):
+    cache_file = str(tmp_path / 'solutions.pickle')
+    checkpoint_dir = str(tmp_path / 'checkpoint')
+    shift_ai = make_ai(roster(), {'required_staff': 1}, solution_cache_file=cache_file)
+    expected = staffed(shift_ai.generate_shifts(WEEKDAY))
+    shift_ai.save_solution_cache()
+    shift_ai.save_checkpoint(checkpoint_dir, WEEKDAY, 0.0, 0.0)
+
+    # 同じ重みを読み込んだ別のインスタンスは、ファイルから読み込んだ結果を使う
+    restored = make_ai(roster(), {'required_staff': 1}, solution_cache_file=cache_file)
+    restored.load_checkpoint(checkpoint_dir)
+    assert staffed(restored.generate_shifts(WEEKDAY)) == expected
+    stats = restored.solution_cache_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (1, 1, 0)
+
+    # 重みが違うインスタンスはファイルの結果を使わない
+    retrained = make_ai(roster(), {'required_staff': 1}, solution_cache_file=cache_file)
+    retrained.generate_shifts(WEEKDAY)
+    stats = retrained.solution_cache_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (2, 0, 1)